@@ -0,0 +1,179 @@
+import io
+import os
+import sys
+import time
+import socket
+import asyncio
+import hashlib
+import tarfile
+import argparse
+import subprocess
+from aiohttp import web
+
+
+def blob_sha(data):
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def load_files(root):
+    """Reading every file under root, keyed by its "/"-separated relative path"""
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            with open(path, "rb") as f:
+                files[os.path.relpath(path, root).replace(os.sep, "/")] = f.read()
+    return files
+
+
+def build_app(files, latency=0.0):
+    """
+    An aiohttp application serving the GitHub API endpoints the scanner uses
+    (repository, git tree, blobs, contents, raw downloads and tarball) for one
+    in-memory repository. Every request waits `latency` seconds first.
+    """
+    by_sha = {blob_sha(data): data for data in files.values()}
+    counts = {}
+    archive = []
+
+    @web.middleware
+    async def delay(request, handler):
+        parts = request.path.split("/")
+        if parts[1] == "repos" and len(parts) > 4:
+            endpoint = parts[5] if parts[4] == "git" and len(parts) > 5 else parts[4]
+        else:
+            endpoint = parts[1] or "repos"
+        counts[endpoint] = counts.get(endpoint, 0) + 1
+        if latency:
+            await asyncio.sleep(latency)
+        return await handler(request)
+
+    async def repository(request):
+        return web.json_response({"default_branch": "main"})
+
+    async def tree(request):
+        entries = [{"path": path, "type": "blob", "sha": blob_sha(data), "size": len(data)}
+                   for path, data in sorted(files.items())]
+        return web.json_response({"tree": entries, "truncated": False})
+
+    async def blob(request):
+        data = by_sha.get(request.match_info["sha"])
+        if data is None:
+            raise web.HTTPNotFound()
+        return web.Response(body=data)
+
+    async def contents(request):
+        path = request.match_info["path"].strip("/")
+        base = f"{request.scheme}://{request.host}"
+        if path in files:
+            return web.json_response({"type": "file", "name": path.rsplit("/", 1)[-1], "path": path,
+                                      "size": len(files[path]), "download_url": f"{base}/raw/{path}"})
+        items = {}
+        for file_path, data in files.items():
+            if path and not file_path.startswith(path + "/"):
+                continue
+            rest = file_path[len(path) + 1:] if path else file_path
+            name = rest.split("/", 1)[0]
+            full_path = f"{path}/{name}" if path else name
+            if "/" in rest:
+                items[name] = {"type": "dir", "name": name, "path": full_path}
+            else:
+                items[name] = {"type": "file", "name": name, "path": full_path, "size": len(data),
+                               "download_url": f"{base}/raw/{full_path}"}
+        if not items:
+            raise web.HTTPNotFound()
+        return web.json_response(list(items.values()))
+
+    async def raw(request):
+        data = files.get(request.match_info["path"])
+        if data is None:
+            raise web.HTTPNotFound()
+        return web.Response(body=data)
+
+    async def tarball(request):
+        if not archive:
+            buffer = io.BytesIO()
+            with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+                for path, data in sorted(files.items()):
+                    info = tarfile.TarInfo(f"owner-repo-main/{path}")
+                    info.size = len(data)
+                    tar.addfile(info, io.BytesIO(data))
+            archive.append(buffer.getvalue())
+        return web.Response(body=archive[0])
+
+    async def stats(request):
+        return web.json_response(counts)
+
+    app = web.Application(middlewares=[delay])
+    app.router.add_get("/stats", stats)
+    app.router.add_get("/repos/{owner}/{repo}", repository)
+    app.router.add_get("/repos/{owner}/{repo}/git/trees/{ref}", tree)
+    app.router.add_get("/repos/{owner}/{repo}/git/blobs/{sha}", blob)
+    app.router.add_get("/repos/{owner}/{repo}/contents/{path:.*}", contents)
+    app.router.add_get("/repos/{owner}/{repo}/tarball/{ref}", tarball)
+    app.router.add_get("/raw/{path:.*}", raw)
+    return app
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class MockGitHubServer:
+    """
+    Runs the mock API over a directory in a separate process, so serving does
+    not compete with the scanner for the interpreter lock.
+
+        with MockGitHubServer(corpus) as api_url:
+            ...  # detect_secrets.py -r owner/repo --api-url {api_url}
+    """
+
+    def __init__(self, root, latency=0.0, port=None, startup_timeout=30):
+        self.root = root
+        self.latency = latency
+        self.port = port or free_port()
+        self.startup_timeout = startup_timeout
+        self.process = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        command = [sys.executable, "-m", "benchmarks.mock_github", self.root, "--port", str(self.port),
+                   "--latency", str(self.latency)]
+        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.process = subprocess.Popen(command, cwd=project_root)
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Mock GitHub server exited with status {self.process.returncode}")
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=0.2):
+                    return self.url
+            except OSError:
+                time.sleep(0.05)
+        self.__exit__()
+        raise RuntimeError(f"Mock GitHub server did not start within {self.startup_timeout}s")
+
+    def __exit__(self, *exc_info):
+        if self.process:
+            self.process.terminate()
+            self.process.wait()
+            self.process = None
+
+
+def main():
+    """Serving a directory as a GitHub repository"""
+    parser = argparse.ArgumentParser(description="Mock GitHub API serving a local directory")
+    parser.add_argument("directory", help="Directory served as the repository")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    args = parser.parse_args()
+    web.run_app(build_app(load_files(args.directory), args.latency), host="127.0.0.1", port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
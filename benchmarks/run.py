@@ -0,0 +1,190 @@
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import contextlib
+from benchmarks.corpus import generate_corpus, add_corpus_arguments, corpus_options
+from benchmarks.mock_github import MockGitHubServer
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS = ("discovery", "regex", "entropy", "main_local", "main_github", "main_github_archive")
+RESULTS_VERSION = 1
+
+
+def git_revision():
+    """Returns the commit the benchmarked code is at, or None outside a git checkout"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(function, repeat):
+    """Runs function repeat times; returns the wall time of each run in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def throughput(timings, files, size):
+    """Summarizes timings; rates are computed from the fastest run"""
+    best = min(timings)
+    return {
+        "seconds": round(best, 6),
+        "median_seconds": round(statistics.median(timings), 6),
+        "runs": len(timings),
+        "files": files,
+        "bytes": size,
+        "files_per_s": round(files / best, 2) if best else None,
+        "mb_per_s": round(size / best / 1024 / 1024, 3) if best else None,
+    }
+
+
+def run_main(module, argv):
+    """Runs a script's main() with argv, discarding what it prints"""
+    saved_argv = sys.argv
+    sys.argv = [f"{module.__name__}.py", *argv]
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(module.main())
+    finally:
+        sys.argv = saved_argv
+
+
+def run_benchmarks(corpus, selected, repeat, latency):
+    """
+    Times each selected benchmark over the corpus. Must run with the working
+    directory holding regex_patterns/, as the scripts expect.
+    """
+    import detect_secrets
+    import detect_secrets_entropy
+    from engine import walk_files, load_rules
+
+    with open("regex_patterns/file_paterns.csv", "r", encoding="UTF-8") as f:
+        files_pattern = [line.strip() for line in f if line.strip()]
+    files = list(walk_files(corpus, files_pattern))
+    contents = []
+    for path in files:
+        with open(path, "r", encoding="UTF-8", errors="replace") as f:
+            contents.append((path, f.read()))
+    size = sum(len(content.encode("UTF-8")) for _, content in contents)
+    pattern_set = load_rules("regex_patterns/regex_secrets.csv")
+    # Secrets are reported without contacting their providers
+    detect_secrets.validation_mode = "none"
+
+    async def scan_regex():
+        for path, content in contents:
+            await detect_secrets.find_secrets(pattern_set, content, path)
+
+    async def scan_entropy():
+        for path, content in contents:
+            await detect_secrets_entropy.find_secrets(content, path)
+
+    github_arguments = ["-r", "owner/repo", "--no-validate", "--requests-per-second", "1000000"]
+    benchmarks = {
+        "discovery": lambda: list(walk_files(corpus, files_pattern)),
+        "regex": lambda: asyncio.run(scan_regex()),
+        "entropy": lambda: asyncio.run(scan_entropy()),
+        "main_local": lambda: run_main(detect_secrets, ["-l", corpus, "--no-validate"]),
+    }
+    results = {}
+    with contextlib.ExitStack() as stack:
+        if any(name.startswith("main_github") for name in selected):
+            api_url = stack.enter_context(MockGitHubServer(corpus, latency))
+            benchmarks["main_github"] = lambda: run_main(detect_secrets, [*github_arguments, "--api-url", api_url])
+            benchmarks["main_github_archive"] = lambda: run_main(
+                detect_secrets, [*github_arguments, "--api-url", api_url, "--archive"])
+        for name in selected:
+            print(f"[*] {name}", file=sys.stderr)
+            results[name] = throughput(measure(benchmarks[name], repeat), len(files), size)
+    return results
+
+
+def compare(results, baseline):
+    """Returns the lines of a speed comparison against a baseline results file"""
+    lines = []
+    if results["corpus"] != baseline.get("corpus"):
+        lines.append("[!] The corpora differ, timings are not comparable")
+    for name, result in results["benchmarks"].items():
+        old = baseline.get("benchmarks", {}).get(name)
+        if not old:
+            continue
+        ratio = old["seconds"] / result["seconds"] if result["seconds"] else float("inf")
+        lines.append(f"{name:<22} {old['seconds']:>10.3f}s -> {result['seconds']:>10.3f}s  {ratio:6.2f}x")
+    return lines
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Benchmark the secret scanner on a synthetic repository")
+    parser.add_argument("--corpus", help="Existing directory to benchmark instead of generating one")
+    parser.add_argument("--keep-corpus", help="Generate the corpus into this directory and keep it")
+    parser.add_argument("--benchmarks", default=",".join(BENCHMARKS),
+                        help=f"Comma separated benchmarks to run: {', '.join(BENCHMARKS)} (default all)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark; the fastest is reported")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Seconds the mock GitHub API waits before each response")
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+    parser.add_argument("--compare", help="Results file of an earlier run to compare against")
+    add_corpus_arguments(parser)
+    args = parser.parse_args()
+    args.benchmarks = [name.strip() for name in args.benchmarks.split(",") if name.strip()]
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)} (expected {', '.join(BENCHMARKS)})")
+    return args
+
+
+def main():
+    """Main function"""
+    args = parse_arguments()
+    with tempfile.TemporaryDirectory(prefix="secret_scan_bench_") as workdir:
+        if args.corpus:
+            corpus = os.path.abspath(args.corpus)
+            corpus_info = {"path": corpus}
+        else:
+            corpus = os.path.abspath(args.keep_corpus or os.path.join(workdir, "corpus"))
+            corpus_info = generate_corpus(corpus, **corpus_options(args))
+        # The scripts read their rules relative to the working directory and write
+        # their logs and results there, so they run in a scratch copy
+        shutil.copytree(os.path.join(PROJECT_ROOT, "regex_patterns"), os.path.join(workdir, "regex_patterns"))
+        saved_cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            benchmarks = run_benchmarks(corpus, args.benchmarks, args.repeat, args.latency)
+        finally:
+            os.chdir(saved_cwd)
+
+    results = {
+        "version": RESULTS_VERSION,
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "corpus": corpus_info,
+        "benchmarks": benchmarks,
+    }
+    text = json.dumps(results, indent=4)
+    if args.output:
+        with open(args.output, "w", encoding="UTF-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, "r", encoding="UTF-8") as f:
+            print("\n".join(compare(results, json.load(f))), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,121 +1,274 @@
 import os
+import errno
 import re
-import json
 from colored import fg, attr
 import logging
-import aiohttp
 import asyncio
 import aiofiles
 import argparse
-from validators import SecretValidator as sv
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from validators import AsyncValidator, validation_marker, run_validator
+from validators import DEFAULT_VALIDATION_CONCURRENCY, DEFAULT_VALIDATION_TTL
+from engine import (PatternSet, ScanCache, GitHubClient, bounded_map, walk_files, filter_tree_blobs,
+                    iter_archive_files, iter_file_chunks, git_blob_sha, load_rules, RuleError, Scanner, RegexDetector,
+                    EntropyDetector, PrivateKeyDetector, KEYS_RULE, Finding, FileMatcher, DirectoryWalker,
+                    as_file_matcher, Profiler, SecretRecord, JsonLinesWriter, JsonArrayWriter, SarifWriter,
+                    OUTPUT_FORMATS, DEFAULT_PROFILE_PATH, DETECTORS, DEFAULT_ENTROPY_THRESHOLD, DEFAULT_MIN_LENGTH,
+                    DEFAULT_PRUNE_DIRS, DEFAULT_WALK_WORKERS, DEFAULT_MAX_LINE_LENGTH, DEFAULT_RULE_TIMEOUT,
+                    DEFAULT_MAX_INFLIGHT, LARGE_FILE_SIZE, DEFAULT_CACHE_PATH, DEFAULT_CACHE_MAX_AGE,
+                    DEFAULT_CACHE_MAX_ENTRIES, DEFAULT_MAX_CONNECTIONS, DEFAULT_REQUESTS_PER_SECOND, GITHUB_API_URL,
+                    pair_by_proximity, KeywordMatcher, KeywordDetector, KEYWORD_RULE, KEYWORD_COVERED_RULES,
+                    parse_keywords)
+from detect_secrets_entropy import highlight_entropy_finding
 
 
 logging.basicConfig(filename='scan_results.log', level=logging.INFO, 
                     format='%(asctime)s - %(message)s', filemode='w')
 
-async def get_file_content(repo, path, token, verbose=False):
+# Replaced by an enabled Profiler with --profile; disabled stages cost next to nothing
+profiler = Profiler(enabled=False)
+
+RULES_FILE = "regex_patterns/regex_secrets.csv"
+KEYWORDS_FILE = "regex_patterns/key_words.csv"
+FILE_PATTERNS_FILE = "regex_patterns/file_paterns.csv"
+
+async def get_file_content(repo, path, token, verbose=False, client=None):
     """Function for retrieving the content of files from GitHub"""
-    headers = {"Authorization": f"token {token}"} if token else {}
-    url = f"https://api.github.com/repos/{repo}/contents/{path}"
+    if client is None:
+        async with GitHubClient(token) as client:
+            return await get_file_content(repo, path, token, verbose, client)
+    url = f"{client.api_url}/repos/{repo}/contents/{path}"
     if verbose:
         print(f"Fetching file content from: {path}")
-    async with aiohttp.ClientSession(headers=headers) as session:
-        async with session.get(url) as response:
-            if response.status == 200:
-                data = await response.json()
-                if data['type'] == 'file':
-                    async with session.get(data['download_url']) as file_response:
-                        if file_response.status == 200:
-                            if verbose:
-                                print(f"Successfully downloaded content from: {path}")
-                            file_content = await file_response.text()
-                            return file_content
-                        else:
-                            logging.error(f"[-] Failed to download file content: {file_response.status}")
-                            return None
-                else:
-                    return None
+    status, data = await client.get(url)
+    if status == 200:
+        if data['type'] == 'file':
+            file_status, file_content = await client.get(data['download_url'], as_json=False)
+            if file_status == 200:
+                if verbose:
+                    print(f"Successfully downloaded content from: {path}")
+                return file_content
             else:
-                logging.error(f"[-] Failed to fetch file content: {response.status}")
+                logging.error(f"[-] Failed to download file content: {file_status}")
                 return None
+        else:
+            return None
+    else:
+        logging.error(f"[-] Failed to fetch file content: {status}")
+        return None
             
-async def find_files_github(repo, path, files_pattern, token, verbose=False):
+async def find_files_github(repo, path, files_pattern, token, verbose=False, client=None):
     """Searching for matching files in the GitHub repository"""
-    headers = {
-        "Authorization": f"token {token}",
-        "Accept": "application/vnd.github.v3+json"
-    } if token else {}
-    url = f"https://api.github.com/repos/{repo}/contents/{path}"
+    if client is None:
+        async with GitHubClient(token) as client:
+            return await find_files_github(repo, path, files_pattern, token, verbose, client)
+    url = f"{client.api_url}/repos/{repo}/contents/{path}"
     if verbose:
         print(f"Fetching contents from {url}...")
-    async with aiohttp.ClientSession(headers=headers) as session:
-        async with session.get(url) as response:
-            if response.status != 200:
-                print(f"Failed to fetch contents from {url}: {response.status}")
-                return []
-            contents = await response.json()
-            matches = []
-            if isinstance(contents, dict) and contents['type'] == 'file':
-                filename = contents['name']
-                for file_pattern in files_pattern:
-                    if re.search(file_pattern, filename):
-                        if verbose:
-                            print(f"File matching pattern found: {filename}")
-                        matches.append(contents['path'])
-                return matches
-            elif isinstance(contents, list):
-                tasks = []
-                for content in contents:
-                    if content['type'] == 'file':
-                        filename = content['name']
-                        for file_pattern in files_pattern:
-                            if re.search(file_pattern, filename):
-                                if verbose:
-                                    print(f"File matching pattern found: {filename}")
-                                matches.append(content['path'])
-                    elif content['type'] == 'dir':
-                        tasks.append(find_files_github(repo, content['path'], files_pattern, token, verbose))
-                subdir_matches = await asyncio.gather(*tasks)
-                for subdir_match in subdir_matches:
-                    matches.extend(subdir_match)
-                return matches
-            else:
-                print(f"Unexpected content structure from {url}")
-                return []
-            
-AWS_SECRET_REGEX = r"(?i)(AKIA[0-9A-Z]{16}):([A-Za-z0-9/+=]{40})"
-aws_secret = ":"
-       
-async def try_login(secret, type_secret):
-    global aws_secret
-    
+    status, contents = await client.get(url)
+    if status != 200:
+        print(f"Failed to fetch contents from {url}: {status}")
+        return []
+    matcher = as_file_matcher(files_pattern)
+    matches = []
+    if isinstance(contents, dict) and contents['type'] == 'file':
+        filename = contents['name']
+        if matcher.accepts(contents['path'], contents.get('size')):
+            if verbose:
+                print(f"File matching pattern found: {filename}")
+            matches.append(contents['path'])
+        return matches
+    elif isinstance(contents, list):
+        tasks = []
+        for content in contents:
+            if content['type'] == 'file':
+                filename = content['name']
+                if matcher.accepts(content['path'], content.get('size')):
+                    if verbose:
+                        print(f"File matching pattern found: {filename}")
+                    matches.append(content['path'])
+            elif content['type'] == 'dir':
+                if matcher.excludes and matcher.excludes.matches(content['path'], is_dir=True):
+                    continue
+                tasks.append(find_files_github(repo, content['path'], matcher, token, verbose, client))
+        subdir_matches = await asyncio.gather(*tasks)
+        for subdir_match in subdir_matches:
+            matches.extend(subdir_match)
+        return matches
+    else:
+        print(f"Unexpected content structure from {url}")
+        return []
+
+
+# Tarballs up to this size stay in memory, larger ones spill to a temporary file
+ARCHIVE_SPOOL_SIZE = 64 * 1024 * 1024
+
+async def find_blobs_github(repo, path, files_pattern, client, verbose=False):
+    """
+    Listing the matching files of the GitHub repository with one Git Trees API request.
+    Returns (path, sha) pairs, or None when the tree is unavailable or truncated.
+    """
+    with profiler.stage("listing"):
+        ref = await client.get_default_branch(repo)
+        entries, truncated = await client.get_tree(repo, ref) if ref else (None, False)
+    if entries is None or truncated:
+        if verbose:
+            print(f"Git tree of {repo} is unavailable or truncated, listing directories instead...")
+        return None
+    blobs = filter_tree_blobs(entries, path, files_pattern)
+    if verbose:
+        for blob_path, _ in blobs:
+            print(f"File matching pattern found: {blob_path}")
+    return blobs
+
+async def find_secrets_github_archive(t_regexp, repo, path, files_pattern, client, cache=None, verbose=False):
+    """Searching for secrets in the files of one streamed repository tarball, yielding (path, records) per file"""
+    ref = await client.get_default_branch(repo)
+    with tempfile.SpooledTemporaryFile(ARCHIVE_SPOOL_SIZE) as archive:
+        with profiler.stage("download"):
+            status = await client.download_archive(repo, ref, archive) if ref else None
+        if status != 200:
+            print(f"{fg('red')}[-] Failed to download the archive of {repo}: {status}{attr(0)}")
+            return
+        for file, data in iter_archive_files(archive, path, files_pattern):
+            digest = git_blob_sha(data) if cache else None
+            records = cache.get_records(digest, file) if cache else None
+            if records is None:
+                content = data.decode("utf-8", errors="replace")
+                records = await find_secret_records(t_regexp, content, file, verbose) if content else []
+                if cache and complete_scan(file):
+                    cache.put_records(digest, records)
+            yield file, records
+
+async def find_secrets_github(t_regexp, repo, path, files_pattern, token, client, max_inflight=DEFAULT_MAX_INFLIGHT,
+                              cache=None, verbose=False):
+    """
+    Searching for secrets in the matching files of the GitHub repository, downloading only their blobs.
+    Yields (path, records) as each file is scanned.
+    """
+    found_blobs = await find_blobs_github(repo, path, files_pattern, client, verbose)
+    if found_blobs is None:
+        with profiler.stage("listing"):
+            found_files = await find_files_github(repo, path, files_pattern, token, verbose, client)
+        found_blobs = [(file, None) for file in found_files]
+    if not found_blobs:
+        print(f"{fg('yellow')}[-] No files found.{attr(0)}")
+        exit(1)
+
+    async def fetch(blob):
+        file, sha = blob
+        if sha is None:
+            with profiler.stage("download"):
+                return None, await get_file_content(repo, file, token, verbose, client)
+        cached = cache.get_records(sha, file) if cache else None
+        if cached is not None:
+            return cached, None
+        if verbose:
+            print(f"Fetching file content from: {file}")
+        with profiler.stage("download"):
+            return None, await client.get_blob(repo, sha)
+
+    async for (file, sha), (cached, content) in bounded_map(fetch, found_blobs, max_inflight):
+        if cached is not None:
+            records = cached
+        elif content:
+            records = await find_secret_records(t_regexp, content, file, verbose)
+            if cache and complete_scan(file):
+                cache.put_records(sha or git_blob_sha(content.encode("utf-8")), records)
+        else:
+            continue
+        yield file, records
+
+AWS_ACCESS_KEY_RULE = "AWS Access Key ID"
+AWS_SECRET_KEY_RULE = "AWS Secret Access Keys"
+# "inline" validates each finding as it is found, "async" defers validation
+# until detection is done (see AsyncValidator), "none" skips it
+validation_mode = "inline"
+
+def validation_request(secret, type_secret):
+    """
+    Choosing the validator: returns (provider, args), or the final result if there is nothing to validate.
+    AWS keys are validated in pairs by validate_aws_pairs once the whole file is scanned.
+    """
     if type_secret == "aws":
         access_key, secret_key = secret.split(":")
-        return sv.validate_aws_keys(access_key, secret_key)
-    elif type_secret == "AWS Access Key ID":
-        aws_secret = secret + aws_secret
-        if re.search(AWS_SECRET_REGEX, aws_secret):
-            tr_log = await try_login(aws_secret, "aws")
-            aws_secret = ":"
-            return tr_log
-        return ""  
-    elif type_secret == "AWS Secret Access Keys":
-        aws_secret = aws_secret + secret
-        if re.search(AWS_SECRET_REGEX, aws_secret):
-            tr_log = await try_login(aws_secret, "aws")
-            aws_secret = ":"
-            return tr_log
+        return "aws", (access_key, secret_key)
+    elif type_secret in (AWS_ACCESS_KEY_RULE, AWS_SECRET_KEY_RULE):
         return ""
     elif type_secret == "github":
-        return sv.validate_github_token(secret)
+        return "github", (secret,)
     elif type_secret == "Google API Key":
-        return sv.validate_google_api_key(secret)
+        return "google", (secret,)
     elif type_secret == "URI-secret":
-        return sv.validate_uri_with_credentials(secret)
+        return "uri", (secret,)
     elif type_secret == "slack":
-        return sv.validate_slack_token(secret)
+        return "slack", (secret,)
     else:
         return type_secret
+       
+async def try_login(secret, type_secret):
+    """Validating a found secret according to validation_mode"""
+    request = validation_request(secret, type_secret)
+    if isinstance(request, str):
+        return request
+    return await run_validation(*request)
+
+async def run_validation(provider, args):
+    """Validating a (provider, args) request according to validation_mode"""
+    if validation_mode == "none":
+        return ""
+    if validation_mode == "async":
+        return validation_marker(provider, args)
+    with profiler.stage("validation"):
+        return await asyncio.to_thread(run_validator, provider, args)
+
+async def validate_aws_pairs(records):
+    """
+    Pairing the AWS access key IDs and secret keys of one file by proximity (see pair_by_proximity)
+    and validating each unique pair once; both records of a pair get its result.
+    """
+    keys = [(record.line, record) for record in records if record.rule == AWS_ACCESS_KEY_RULE]
+    if not keys:
+        return
+    secrets = [(record.line, record) for record in records if record.rule == AWS_SECRET_KEY_RULE]
+    results = {}
+    for key, secret in pair_by_proximity(keys, secrets):
+        pair = (key.match, secret.match)
+        if pair not in results:
+            results[pair] = await run_validation("aws", pair)
+        key.validation = secret.validation = results[pair]
+            
+def add_validation_arguments(parser):
+    """Adding the command-line options that choose how found secrets are validated"""
+    validation = parser.add_mutually_exclusive_group()
+    validation.add_argument("--no-validate", action="store_true",
+                            help="Report found secrets without checking whether they work (optional)")
+    validation.add_argument("--validate-async", action="store_true",
+                            help="Validate each unique secret once, concurrently, after the scan (optional)")
+    parser.add_argument("--validation-concurrency", type=int, default=DEFAULT_VALIDATION_CONCURRENCY,
+                        help="Maximum number of validation requests at once with --validate-async (optional)")
+    parser.add_argument("--validation-ttl", type=int, default=DEFAULT_VALIDATION_TTL,
+                        help="Seconds a validation result is reused for the same secret (optional)")
+
+def configure_validation(args):
+    """
+    Setting validation_mode from the command line; returns the AsyncValidator resolving deferred validations.
+    With a result cache, secrets are always validated through markers: the cache keeps the raw records, not
+    results that would still say VALID after a secret is revoked, and the validator's TTL decides how long a
+    result is reused.
+    """
+    global validation_mode
+    if args.no_validate:
+        validation_mode = "none"
+    elif args.validate_async or getattr(args, "cache", None):
+        validation_mode = "async"
+    else:
+        validation_mode = "inline"
+    if validation_mode == "async":
+        return AsyncValidator(args.validation_concurrency, args.validation_ttl)
+    return None
             
 async def valid_secret(secret):
     """
@@ -132,75 +285,390 @@ async def valid_secret(secret):
             return False
     return True
 
-async def find_key(content):
-    key_pattern = re.compile(
-        r"-----BEGIN (?:[A-Z ]*?)PRIVATE KEY-----[\s\S]+?-----END (?:[A-Z ]*?)PRIVATE KEY-----",
-        re.MULTILINE
-    )
-    matches = key_pattern.findall(content)
-    return matches
+def regex_detectors(pattern_set):
+    """The regex detector, followed by the private key block detector when the rules have a KEYS rule"""
+    detectors = [RegexDetector(pattern_set)]
+    if any(type_secret.strip() == KEYS_RULE for _, type_secret in pattern_set):
+        detectors.append(PrivateKeyDetector())
+    return detectors
+
+def add_detector_arguments(parser):
+    """Adding the command-line options that choose the detectors and bound the rule matching time"""
+    parser.add_argument("--detectors", default="regex",
+                        help=f"Comma separated detectors run over each file in one pass: {', '.join(DETECTORS)} (default regex)")
+    parser.add_argument("--entropy-window", type=int, default=0,
+                        help="Also check every window of this many characters of long words for entropy (optional)")
+    parser.add_argument("--max-line-length", type=int, default=DEFAULT_MAX_LINE_LENGTH,
+                        help="Search longer lines in windows of this many characters with rules prone to backtracking; 0 disables (optional)")
+    parser.add_argument("--rule-timeout", type=float, default=DEFAULT_RULE_TIMEOUT,
+                        help=f"Seconds each rule may spend on one file before it is skipped there (default {DEFAULT_RULE_TIMEOUT}); 0 disables (optional)")
+
+def check_detector_arguments(parser, args):
+    """Splitting --detectors into a list of known detector names"""
+    args.detectors = [detector.strip() for detector in args.detectors.split(",") if detector.strip()]
+    unknown = [detector for detector in args.detectors if detector not in DETECTORS]
+    if unknown or not args.detectors:
+        parser.error(f"--detectors must list some of {', '.join(DETECTORS)}, got {', '.join(unknown) or 'nothing'}")
+
+def load_scanner(args, profiler=None):
+    """
+    Building the scanner of the detectors chosen on the command line from the rule files.
+    Raises FileNotFoundError for a missing rule file and RuleError for an invalid rule.
+    """
+    if not os.path.exists(RULES_FILE):
+        raise FileNotFoundError(errno.ENOENT, "Rule file is missing", RULES_FILE)
+    pattern_set = load_rules(RULES_FILE)
+    pattern_set.max_line_length = args.max_line_length or None
+    pattern_set.rule_timeout = args.rule_timeout or None
+    detectors = []
+    if "keywords" in args.detectors:
+        if not os.path.exists(KEYWORDS_FILE):
+            raise FileNotFoundError(errno.ENOENT, "Keyword file is missing", KEYWORDS_FILE)
+        with open(KEYWORDS_FILE, "r", encoding="UTF-8") as f:
+            keywords = parse_keywords(f.read())
+        # The keyword detector takes over the generic password/secret/API key rules
+        pattern_set = pattern_set.without(KEYWORD_COVERED_RULES)
+    if "regex" in args.detectors:
+        detectors.extend(regex_detectors(pattern_set))
+    if "entropy" in args.detectors:
+        detectors.append(EntropyDetector(DEFAULT_ENTROPY_THRESHOLD, DEFAULT_MIN_LENGTH, args.entropy_window))
+    if "keywords" in args.detectors:
+        detectors.append(KeywordDetector(KeywordMatcher(keywords)))
+    return Scanner(detectors, profiler)
+
+def report_rules(scanner):
+    """The rule names a scanner can report, for the SARIF rule list"""
+    rules = [type_secret.strip() for _, type_secret in scanner.pattern_set] if scanner.pattern_set else []
+    for detector in scanner.detectors:
+        if isinstance(detector, EntropyDetector):
+            rules.append("entropy")
+        elif isinstance(detector, KeywordDetector):
+            rules.append(KEYWORD_RULE)
+    return rules
+
+def as_scanner(t_regexp):
+    """Wrapping a bare rule set into a regex-only Scanner"""
+    if isinstance(t_regexp, Scanner):
+        return t_regexp
+    pattern_set = t_regexp if isinstance(t_regexp, PatternSet) else PatternSet(t_regexp)
+    return Scanner(regex_detectors(pattern_set))
+
+def unreported_matches(matches, key, reported):
+    """Dropping the matches already reported under the same key, e.g. from the overlap of the previous chunk"""
+    if reported is None:
+        return matches
+    occurrences = {}
+    fresh = []
+    for match in matches:
+        occurrences[match] = occurrences.get(match, 0) + 1
+        finding = (*key, match, occurrences[match])
+        if finding not in reported:
+            reported.add(finding)
+            fresh.append(match)
+    return fresh
+
+async def collect_records(findings, path, verbose=False, line_offset=0, reported=None):
+    """
+    Turning the findings of one text buffer into SecretRecords, validating each secret.
+    Lines are numbered from line_offset + 1; findings already in `reported` are skipped.
+    """
+    records = []
+    for finding in findings:
+        line_number = finding.line_number + line_offset
+        type_secret = finding.type_secret
+        pattern = finding.rule.pattern if finding.rule is not None else None
+        key = (line_number, finding.detector, pattern, type_secret)
+        if finding.detector == "entropy":
+            for match in unreported_matches(finding.matches, key, reported):
+                if verbose:
+                    print(f"Secrets found in {path}")
+                    verbose=False
+                records.append(SecretRecord(path, line_number, finding.line.find(match) + 1 or None, "entropy",
+                                            finding.detector, match, finding.line))
+            continue
+        if finding.detector == "regex" and type_secret.strip() == KEYS_RULE:
+            # Only the BEGIN line; PrivateKeyDetector reports the whole block
+            continue
+        for match in unreported_matches(finding.matches, key, reported):
+            if await valid_secret(match):
+                if verbose:
+                    print(f"Secrets found in {path}")
+                    verbose=False
+                try_log = await try_login(match, type_secret.strip())
+                first_line = match.splitlines()[0] if finding.end_line != finding.line_number else match
+                column = finding.line.find(first_line) + 1 or None
+                records.append(SecretRecord(path, line_number, column, type_secret.strip(), finding.detector, match,
+                                            finding.line, try_log, finding.end_line + line_offset))
+    return records
+
+def render_records(path, records, color=True):
+    """Presenting the records of one file as the highlighted text report"""
+    if not records:
+        return ""
+    def paint(text, color_name):
+        return f"{fg(color_name)}{text}{attr(0)}" if color else text
+
+    output = []
+    current_line = None
+    position = 0
+    while position < len(records):
+        record = records[position]
+        if record.detector == "entropy":
+            # All high-entropy words of a line go on one report line
+            words = []
+            while (position < len(records) and records[position].detector == "entropy"
+                   and records[position].line == record.line):
+                words.append(records[position].match)
+                position += 1
+            if color:
+                output.append(highlight_entropy_finding(Finding("entropy", record.line, record.line_text, "entropy",
+                                                                words)))
+            else:
+                output.append(f"{record.line_text.strip()} (found entropy) - (line {record.line})\n")
+            continue
+        position += 1
+        if record.line != current_line:
+            current_line = record.line
+            highlighted_line = record.line_text.strip()
+        highlighted_match = paint(record.match, 'light_green')
+        if record.end_line != record.line:
+            output.append(f"{highlighted_match} - (lines {record.line}-{record.end_line}) {record.validation}\n")
+        else:
+            highlighted_line = highlighted_line.replace(record.match, highlighted_match)
+            output.append(f"{highlighted_line} - (line {record.line}) {record.validation}\n")
+    return f">>> Found in {path}\n\n" + "".join(output)
+
+# Files where rules ran out of their time budget; their results depend on the load and are not cached
+incomplete_files = set()
+
+def report_rule_timeouts(scanner, path):
+    """Flagging the rules skipped in a file for running out of their time budget"""
+    pattern_set = scanner.pattern_set
+    if pattern_set and pattern_set.timed_out:
+        incomplete_files.add(path)
+        message = (f"[-] Rules skipped in {path} after {pattern_set.rule_timeout}s: "
+                   f"{', '.join(dict.fromkeys(pattern_set.timed_out))}")
+        logging.warning(message)
+        print(f"{fg('yellow')}{message}{attr(0)}")
+
+def complete_scan(path):
+    """Whether every rule finished on the file, so its records can be cached; forgets the file"""
+    if path in incomplete_files:
+        incomplete_files.discard(path)
+        return False
+    return True
+
+async def find_secret_records(t_regexp, content, path, verbose=False):
+    """Searching for secrets in the file's text; returns SecretRecords"""
+    records = []
+    try:
+        scanner = as_scanner(t_regexp)
+        findings = scanner.scan(content)
+        report_rule_timeouts(scanner, path)
+        records = await collect_records(findings, path, verbose)
+        await validate_aws_pairs(records)
+        if not records:
+            logging.info(f"[+] No secrets found in {path}")    
+    except Exception as e:
+        error_message = f"[-] Error occurred while reading {path}: {e}"
+        logging.error(error_message)
+        print(f"{fg('red')}{error_message}{attr(0)}")
+    return records
 
 async def find_secrets(t_regexp, content, path, verbose=False):
-    """Searching for secrets in the file's text"""
-    output = ""
+    """Searching for secrets in the file's text; returns the highlighted report"""
+    return render_records(path, await find_secret_records(t_regexp, content, path, verbose))
+
+async def find_secret_records_in_large_file(t_regexp, path, verbose=False):
+    """Searching for secrets in a large local file, chunk by chunk through mmap; returns SecretRecords"""
+    records = []
     try:
-        lines = content.splitlines()
-        for line_number, line in enumerate(lines, start=1):
-            highlighted_line = line.strip()
-            for regexp, type_secret in t_regexp:
-                matches = re.findall(regexp, line)
-                if matches:
-                    if type_secret.strip() == "KEYS":
-                        matches = await find_key(content)
-                    for match in matches:
-                        if await valid_secret(match):
-                            if verbose:
-                                print(f"Secrets found in {path}")
-                                verbose=False
-                            try_log = await try_login(match, type_secret.strip())
-                            highlighted_match = f"{fg('light_green')}{match}{attr(0)}"
-                            if type_secret.strip() == "KEYS":
-                                text_found = f">>> Found in {path}\n\n"
-                                output += f"{highlighted_match} - (line {line_number}) {try_log}\n"
-                            else:
-                                highlighted_line = highlighted_line.replace(match, highlighted_match)  
-                                text_found = f">>> Found in {path}\n\n"
-                                output += f"{highlighted_line} - (line {line_number}) {try_log}\n" 
-        if output:
-            output = text_found + output
-        else:
+        scanner = as_scanner(t_regexp)
+        reported = set()
+        # Carries a private key block cut by a chunk boundary over to the next chunk
+        state = {}
+        for line_offset, chunk in iter_file_chunks(path):
+            findings = scanner.scan(chunk, line_offset, state)
+            report_rule_timeouts(scanner, path)
+            found = await collect_records(findings, path, verbose, line_offset, reported)
+            if found:
+                records.extend(found)
+                verbose = False
+        await validate_aws_pairs(records)
+        if not records:
             logging.info(f"[+] No secrets found in {path}")    
     except Exception as e:
         error_message = f"[-] Error occurred while reading {path}: {e}"
         logging.error(error_message)
         print(f"{fg('red')}{error_message}{attr(0)}")
-    return output
+    return records
+
+async def find_secrets_in_large_file(t_regexp, path, verbose=False):
+    """Searching for secrets in a large local file, chunk by chunk through mmap; returns the highlighted report"""
+    return render_records(path, await find_secret_records_in_large_file(t_regexp, path, verbose))
 
 async def find_files(directory, files_pattern):
     """Searching for matching files in the local repository (for testing)"""
-    matches = []
-    for root, _, files in os.walk(directory):
-        for filename in files:
-            for file_pattern in files_pattern:
-                if re.search(file_pattern, filename):
-                    matches.append(os.path.join(root, filename))
-    return matches
-
-async def get_local_file_content(file):
-    async with aiofiles.open(file, "r", encoding="UTF-8") as f:
-        return await f.read()
+    return list(walk_files(directory, files_pattern))
+
+worker_scanner = None
+
+def init_scan_worker(t_regexp, mode="inline"):
+    """Receiving the scanner and the validation mode once per worker process"""
+    global worker_scanner, validation_mode, profiler
+    worker_scanner = as_scanner(t_regexp)
+    validation_mode = mode
+    profiler = worker_scanner.profiler
+
+def scan_local_file(file, large_file_size=LARGE_FILE_SIZE, verbose=False):
+    """Reading and scanning one local file inside a worker process"""
+    pattern_set = worker_scanner.pattern_set
+    if pattern_set:
+        pattern_set.reset_stats()
+    if os.path.getsize(file) > large_file_size:
+        records = asyncio.run(find_secret_records_in_large_file(worker_scanner, file, verbose))
+    else:
+        with profiler.stage("read"):
+            with open(file, "r", encoding="UTF-8", errors="replace") as f:
+                content = f.read()
+        records = asyncio.run(find_secret_records(worker_scanner, content, file, verbose)) if content else []
+    return records, pattern_set.stats if pattern_set else None, profiler.take(), complete_scan(file)
+
+async def scan_local_files_parallel(t_regexp, files, jobs, max_inflight=DEFAULT_MAX_INFLIGHT,
+                                    large_file_size=LARGE_FILE_SIZE, cache=None, verbose=False):
+    """Scanning local files across worker processes, yielding (path, records) in file order"""
+    loop = asyncio.get_running_loop()
+    pattern_set = as_scanner(t_regexp).pattern_set
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_scan_worker,
+                             initargs=(t_regexp, validation_mode)) as executor:
+        async def submit(file):
+            digest = cache.file_digest(file) if cache else None
+            cached = cache.get_records(digest, file) if cache else None
+            if cached is not None:
+                return cached, None, None
+            records, stats, stages, complete = await loop.run_in_executor(executor, scan_local_file, file,
+                                                                          large_file_size, verbose)
+            if cache and complete:
+                cache.put_records(digest, records)
+            return records, stats, stages
+
+        async for file, (records, stats, stages) in bounded_map(submit, files, max(jobs, max_inflight)):
+            if stats:
+                pattern_set.merge_stats(stats)
+            if stages:
+                profiler.merge(stages)
+            yield file, records
+
+async def get_local_file_content(file, large_file_size=None):
+    """Reading a local file; returns None for files above large_file_size, which are scanned in chunks"""
+    if large_file_size is not None and os.path.getsize(file) > large_file_size:
+        return None
+    with profiler.stage("read"):
+        async with aiofiles.open(file, "r", encoding="UTF-8", errors="replace") as f:
+            return await f.read()
         
-async def save_results_to_file(results, file_path='found_secrets.json', verbose=False):
-    """Saving the results to the found_secrets.json file"""
-    try:
-        async with aiofiles.open(file_path, 'w', encoding='utf-8') as f:
-            await f.write(json.dumps(results, indent=4, ensure_ascii=False))
-        logging.info(f"[+] Results saved to {file_path}")
-        if verbose:
-            print(f"Results saved to {file_path}")
-    except Exception as e:
-        logging.error(f"[-] Error while saving results to file: {e}")
-        print(f"[-] Error while saving results to file: {e}")
+class TextWriter:
+    """Presenting the records of each file as the highlighted text report; colours only on the terminal"""
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def write(self, records):
+        if not records:
+            return
+        if self.stream is None:
+            print(render_records(records[0].path, records))
+        else:
+            self.stream.write(render_records(records[0].path, records, color=False) + "\n")
+            self.stream.flush()
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.flush()
+
+class ResultsFileWriter:
+    """Streaming the records into the found_secrets.json file as a JSON array, created on the first records"""
+
+    def __init__(self, file_path='found_secrets.json', verbose=False):
+        self.file_path = file_path
+        self.verbose = verbose
+        self.file = None
+        self.writer = None
+
+    def write(self, records):
+        if not records:
+            return
+        try:
+            if self.writer is None:
+                self.file = open(self.file_path, 'w', encoding='utf-8')
+                self.writer = JsonArrayWriter(self.file)
+            self.writer.write(records)
+        except Exception as e:
+            logging.error(f"[-] Error while saving results to file: {e}")
+            print(f"[-] Error while saving results to file: {e}")
+
+    def close(self):
+        if self.writer is None:
+            return
+        self.writer.close()
+        self.file.close()
+        logging.info(f"[+] Results saved to {self.file_path}")
+        if self.verbose:
+            print(f"Results saved to {self.file_path}")
+
+def open_output(output_format, output_path, rules):
+    """Opening the writer of the chosen output format on stdout or a file; returns (writer, stream to close)"""
+    stream = open(output_path, "w", encoding="UTF-8") if output_path else None
+    if output_format == "text":
+        return TextWriter(stream), stream
+    if output_format == "jsonl":
+        return JsonLinesWriter(stream or sys.stdout), stream
+    return SarifWriter(stream or sys.stdout, rules), stream
+
+class ReportSink:
+    """
+    Handing the records of each scanned file to the writers as soon as the file is done.
+    With deferred validation the records are held until the validator has resolved them all,
+    or, without `hold`, resolved file by file as they come.
+    """
+
+    def __init__(self, writers, validator=None, hold=True):
+        self.writers = writers
+        self.validator = validator
+        self.hold = hold
+        self.pending = []
+        self.found = False
+
+    def emit(self, records):
+        with profiler.stage("output"):
+            for writer in self.writers:
+                writer.write(records)
+
+    async def add(self, records):
+        if not records:
+            return
+        self.found = True
+        if self.validator and self.hold:
+            self.pending.append(records)
+        else:
+            if self.validator:
+                await self.resolve(records)
+            self.emit(records)
+
+    async def resolve(self, records):
+        with profiler.stage("validation"):
+            results = await self.validator.resolve([record.validation for record in records])
+        for record, result in zip(records, results):
+            record.validation = result
+
+    async def finish(self):
+        """Writing the held records; returns whether anything was found"""
+        if self.pending:
+            await self.resolve([record for records in self.pending for record in records])
+            for records in self.pending:
+                self.emit(records)
+            self.pending = []
+        return self.found
 
 parser = argparse.ArgumentParser()
 
@@ -211,26 +679,72 @@ def parse_arguments():
     parser.add_argument("-t", "--token", help="GitHub token for authentication")
     parser.add_argument("-p", "--path", default="", help="Path in the repository GitHub to search (optional)")
     parser.add_argument("-l", "--local", help="Path in the local repository to search (optional)")
+    parser.add_argument("--exclude", action="append", default=[],
+                        help="gitignore-style pattern of paths to skip, can be repeated (optional)")
+    parser.add_argument("--exclude-from", action="append", default=[],
+                        help="File of gitignore-style patterns of paths to skip, e.g. .gitignore (optional)")
+    parser.add_argument("--max-file-size", type=int,
+                        help="Skip files larger than this many bytes without reading them (optional)")
+    parser.add_argument("--walk-workers", type=int, default=DEFAULT_WALK_WORKERS,
+                        help="Threads walking local directories; more than 1 also changes the file order (optional)")
+    parser.add_argument("--prune", action="append", default=[],
+                        help="Directory name never entered in local scans, can be repeated (optional)")
+    parser.add_argument("--no-default-prune", action="store_true",
+                        help=f"Also enter {', '.join(sorted(DEFAULT_PRUNE_DIRS))} (optional)")
+    parser.add_argument("--follow-symlinks", action="store_true",
+                        help="Enter symlinked directories, each directory at most once (optional)")
+    parser.add_argument("--scan-binary", action="store_true",
+                        help="Also scan local files that look binary (optional)")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Number of worker processes for local scanning, 0 uses all cores (optional)")
+    parser.add_argument("--max-inflight", type=int, default=DEFAULT_MAX_INFLIGHT,
+                        help="Maximum number of files being read or scanned at once (optional)")
+    parser.add_argument("--large-file-size", type=int, default=LARGE_FILE_SIZE,
+                        help="Local files larger than this many bytes are scanned in memory-mapped chunks (optional)")
+    parser.add_argument("--cache", nargs="?", const=DEFAULT_CACHE_PATH,
+                        help=f"Reuse results for unchanged files from this SQLite cache (default {DEFAULT_CACHE_PATH})")
+    parser.add_argument("--cache-max-age", type=int, default=DEFAULT_CACHE_MAX_AGE // 86400,
+                        help="Drop cache entries unused for this many days (optional)")
+    parser.add_argument("--cache-max-entries", type=int, default=DEFAULT_CACHE_MAX_ENTRIES,
+                        help="Maximum number of cached file results (optional)")
+    parser.add_argument("--api-url", default=GITHUB_API_URL,
+                        help="GitHub API base URL, e.g. for GitHub Enterprise (optional)")
+    parser.add_argument("--max-connections", type=int, default=DEFAULT_MAX_CONNECTIONS,
+                        help="Maximum number of open connections to GitHub (optional)")
+    parser.add_argument("--requests-per-second", type=float, default=DEFAULT_REQUESTS_PER_SECOND,
+                        help="Maximum GitHub request rate; lowered automatically near the rate limit (optional)")
+    parser.add_argument("--archive", action="store_true",
+                        help="Download the GitHub repository as one tarball instead of file by file (optional)")
+    add_detector_arguments(parser)
+    add_validation_arguments(parser)
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="text",
+                        help="Report format: highlighted text, JSON Lines or SARIF, written as each file is scanned (optional)")
+    parser.add_argument("-o", "--output",
+                        help="Write the report to this file instead of stdout (optional)")
+    parser.add_argument("--profile", nargs="?", const=DEFAULT_PROFILE_PATH,
+                        help=f"Time each stage and rule, print a summary and write a JSON report (default {DEFAULT_PROFILE_PATH}) (optional)")
     parser.add_argument("--verbose", action="store_true", help="Enable verbose output")
-    return parser.parse_args()
+    args = parser.parse_args()
+    check_detector_arguments(parser, args)
+    return args
 
 async def main():
     """Main function"""
+    global profiler
     args = parse_arguments()
+    if args.profile:
+        profiler = Profiler()
       
-    regexp_to_search = "regex_patterns/regex_secrets.csv"
-    if os.path.exists(regexp_to_search):
-        async with aiofiles.open(regexp_to_search, "r", encoding="UTF-8") as file_regs:
-            regs_and_type = await file_regs.readlines()
-            regs = [reg.rsplit(', ', 1)[0] for reg in regs_and_type]
-            type_regs = [type_reg.rsplit(', ', 1)[1] for type_reg in regs_and_type]
-            regexp = [re.compile(regexp.strip(), re.IGNORECASE) for regexp in regs]
-            regexp_type = list(zip(regexp, type_regs))
-    else:
-        print(f"{fg('yellow')}[-] File {regexp_to_search} is missing.{attr(0)}")
+    try:
+        scanner = load_scanner(args, profiler)
+    except RuleError as e:
+        print(f"{fg('red')}[-] Invalid rule: {e}{attr(0)}")
+        exit(1)
+    except FileNotFoundError as e:
+        print(f"{fg('yellow')}[-] File {e.filename} is missing.{attr(0)}")
         exit(1)
           
-    search_file = "regex_patterns/file_paterns.csv"
+    search_file = FILE_PATTERNS_FILE
     if os.path.exists(search_file):
         async with aiofiles.open(search_file, "r", encoding="UTF-8") as files:
             reg_files = await files.readlines()
@@ -238,53 +752,110 @@ async def main():
     else:
         print(f"{fg('yellow')}[-] File {search_file} is missing.{attr(0)}")
         exit(1)
+    excludes = list(args.exclude)
+    for exclude_file in args.exclude_from:
+        if not os.path.exists(exclude_file):
+            print(f"{fg('yellow')}[-] File {exclude_file} is missing.{attr(0)}")
+            exit(1)
+        async with aiofiles.open(exclude_file, "r", encoding="UTF-8") as f:
+            excludes.extend((await f.read()).splitlines())
+    file_matcher = FileMatcher(regexp_file, excludes, args.max_file_size)
+    
+    if profiler and scanner.pattern_set:
+        scanner.pattern_set.timed = True
+    
+    validator = configure_validation(args)
+    cache = None
+    if args.cache:
+        # Stored records hold validation markers or nothing depending on the mode, never results
+        cache = ScanCache(args.cache, f"{scanner.fingerprint()}:{validation_mode}:records",
+                          args.cache_max_age * 86400, args.cache_max_entries)
+    
+    writer, output_stream = open_output(args.format, args.output, report_rules(scanner))
+    # Status messages stay off stdout when it carries a JSON report
+    show_status = args.format == "text" or args.output is not None
     
     if args.repo:
         token = args.token if args.token else None
         if args.verbose:
             print(f"Searching in GitHub repository {args.repo}...")
-        output = []
-        task = []
-        found_files = await find_files_github(args.repo, args.path, regexp_file, token, args.verbose)
-        if not found_files:
-            print(f"{fg('yellow')}[-] No files found.{attr(0)}")
-            exit(1)
-        
-        for file in found_files:
-            task.append(get_file_content(args.repo, file, token, args.verbose))
-        
-        contents = await asyncio.gather(*task)
-        
-        for content, file in zip(contents, found_files):
-            if content:    
-                results = await find_secrets(regexp_type, content, file, args.verbose)
-                if results:
-                    output.append(results)     
-        if output:
-            print("\n".join(output))
-            await save_results_to_file(output, verbose=args.verbose)
-        else:
-            print(f"{fg('yellow')}[-] No secrets found.{attr(0)}")
+        results_file = ResultsFileWriter(verbose=args.verbose)
+        sink = ReportSink([writer, results_file], validator, args.validate_async)
+        async with GitHubClient(token, args.max_connections, args.requests_per_second,
+                                api_url=args.api_url) as client:
+            if args.archive:
+                scanned = find_secrets_github_archive(scanner, args.repo, args.path, file_matcher, client,
+                                                      cache, args.verbose)
+            else:
+                scanned = find_secrets_github(scanner, args.repo, args.path, file_matcher, token, client,
+                                              args.max_inflight, cache, args.verbose)
+            async for _, records in scanned:
+                await sink.add(records)
+            found = await sink.finish()
+            results_file.close()
+            if not found and show_status:
+                print(f"{fg('yellow')}[-] No secrets found.{attr(0)}")
+            if args.verbose:
+                if scanner.pattern_set:
+                    print("\n".join(scanner.pattern_set.prefilter_report()))
+                print(client.report())
                 
     if args.local:
         if args.verbose:
             print(f"Searching in local repository at {args.local}...")
-        output_from_local_path = []
+        sink = ReportSink([writer], validator, args.validate_async)
         
-        found_local_files = await find_files(args.local, regexp_file)
+        prune_dirs = set(args.prune) if args.no_default_prune else DEFAULT_PRUNE_DIRS | set(args.prune)
+        walker = DirectoryWalker(file_matcher, args.walk_workers, prune_dirs, args.follow_symlinks,
+                                 not args.scan_binary, profiler)
+        found_local_files = walker.awalk(args.local)
+        jobs = args.jobs if args.jobs > 0 else os.cpu_count()
         
-        tasks = [get_local_file_content(file) for file in found_local_files]
-        contents = await asyncio.gather(*tasks)
-
-        for local_content, local_file in zip(contents, found_local_files):
-            if local_content:
-                results_local_secrets = await find_secrets(regexp_type, local_content, local_file, args.verbose)
-                if results_local_secrets:
-                    output_from_local_path.append(results_local_secrets)     
-        if output_from_local_path:
-            print("\n".join(output_from_local_path))
+        if jobs > 1:
+            async for _, records in scan_local_files_parallel(scanner, found_local_files, jobs, args.max_inflight,
+                                                              args.large_file_size, cache, args.verbose):
+                await sink.add(records)
         else:
+            async def read_local(file):
+                digest = cache.file_digest(file) if cache else None
+                cached = cache.get_records(digest, file) if cache else None
+                if cached is not None:
+                    return digest, cached, True
+                return digest, await get_local_file_content(file, args.large_file_size), False
+
+            async for local_file, (digest, local_content, from_cache) in bounded_map(read_local, found_local_files,
+                                                                                     args.max_inflight):
+                records = []
+                if from_cache:
+                    records = local_content
+                elif local_content is None:
+                    records = await find_secret_records_in_large_file(scanner, local_file, args.verbose)
+                elif local_content:
+                    records = await find_secret_records(scanner, local_content, local_file, args.verbose)
+                if cache and not from_cache and complete_scan(local_file):
+                    cache.put_records(digest, records)
+                await sink.add(records)
+        if not await sink.finish() and show_status:
             print(f"{fg('yellow')}[-] No secrets found.{attr(0)}")
+        if args.verbose:
+            print(walker.report())
+            if scanner.pattern_set:
+                print("\n".join(scanner.pattern_set.prefilter_report()))
+    
+    writer.close()
+    if output_stream is not None:
+        output_stream.close()
+    if validator and args.verbose:
+        print(validator.report())
+    if cache:
+        cache.close()
+        if args.verbose:
+            print(cache.report())
+    if profiler:
+        report = profiler.report(scanner.pattern_set)
+        print("\n".join(Profiler.summary(report)))
+        Profiler.save(report, args.profile)
+        print(f"Profile saved to {args.profile}")
             
 if __name__ == "__main__":
     asyncio.run(main())
@@ -1,126 +1,109 @@
 import os
-import re
 import json
 from colored import fg, attr
 import logging
-import aiohttp
 import asyncio
 import aiofiles
 import argparse
-import math
+from engine import (GitHubClient, bounded_map, walk_files, DEFAULT_MAX_INFLIGHT, DEFAULT_MAX_CONNECTIONS,
+                    DEFAULT_REQUESTS_PER_SECOND, GITHUB_API_URL, Scanner, EntropyDetector,
+                    DEFAULT_ENTROPY_THRESHOLD, DEFAULT_MIN_LENGTH, FileMatcher, DirectoryWalker, as_file_matcher,
+                    DEFAULT_PRUNE_DIRS, DEFAULT_WALK_WORKERS)
 
 
 logging.basicConfig(filename='scan_results.log', level=logging.INFO, 
                     format='%(asctime)s - %(message)s', filemode='w')
 
-async def get_file_content(repo, path, token, verbose=False):
+async def get_file_content(repo, path, token, verbose=False, client=None):
     """Function for retrieving the content of files from GitHub"""
-    headers = {"Authorization": f"token {token}"} if token else {}
-    url = f"https://api.github.com/repos/{repo}/contents/{path}"
+    if client is None:
+        async with GitHubClient(token) as client:
+            return await get_file_content(repo, path, token, verbose, client)
+    url = f"{client.api_url}/repos/{repo}/contents/{path}"
     if verbose:
         print(f"Fetching file content from: {path}")
-    async with aiohttp.ClientSession(headers=headers) as session:
-        async with session.get(url) as response:
-            if response.status == 200:
-                data = await response.json()
-                if data['type'] == 'file':
-                    async with session.get(data['download_url']) as file_response:
-                        if file_response.status == 200:
-                            if verbose:
-                                print(f"Successfully downloaded content from: {path}")
-                            file_content = await file_response.text()
-                            return file_content
-                        else:
-                            logging.error(f"[-] Failed to download file content: {file_response.status}")
-                            return None
-                else:
-                    return None
+    status, data = await client.get(url)
+    if status == 200:
+        if data['type'] == 'file':
+            file_status, file_content = await client.get(data['download_url'], as_json=False)
+            if file_status == 200:
+                if verbose:
+                    print(f"Successfully downloaded content from: {path}")
+                return file_content
             else:
-                logging.error(f"[-] Failed to fetch file content: {response.status}")
+                logging.error(f"[-] Failed to download file content: {file_status}")
                 return None
+        else:
+            return None
+    else:
+        logging.error(f"[-] Failed to fetch file content: {status}")
+        return None
             
-async def find_files_github(repo, path, files_pattern, token, verbose=False):
+async def find_files_github(repo, path, files_pattern, token, verbose=False, client=None):
     """Searching for matching files in the GitHub repository"""
-    headers = {
-        "Authorization": f"token {token}",
-        "Accept": "application/vnd.github.v3+json"
-    } if token else {}
-    url = f"https://api.github.com/repos/{repo}/contents/{path}"
+    if client is None:
+        async with GitHubClient(token) as client:
+            return await find_files_github(repo, path, files_pattern, token, verbose, client)
+    url = f"{client.api_url}/repos/{repo}/contents/{path}"
     if verbose:
         print(f"Fetching contents from {url}...")
-    async with aiohttp.ClientSession(headers=headers) as session:
-        async with session.get(url) as response:
-            if response.status != 200:
-                print(f"Failed to fetch contents from {url}: {response.status}")
-                return []
-            contents = await response.json()
-            matches = []
-            if isinstance(contents, dict) and contents['type'] == 'file':
-                filename = contents['name']
-                for file_pattern in files_pattern:
-                    if re.search(file_pattern, filename):
-                        if verbose:
-                            print(f"File matching pattern found: {filename}")
-                        matches.append(contents['path'])
-                return matches
-            elif isinstance(contents, list):
-                tasks = []
-                for content in contents:
-                    if content['type'] == 'file':
-                        filename = content['name']
-                        for file_pattern in files_pattern:
-                            if re.search(file_pattern, filename):
-                                if verbose:
-                                    print(f"File matching pattern found: {filename}")
-                                matches.append(content['path'])
-                    elif content['type'] == 'dir':
-                        tasks.append(find_files_github(repo, content['path'], files_pattern, token, verbose))
-                subdir_matches = await asyncio.gather(*tasks)
-                for subdir_match in subdir_matches:
-                    matches.extend(subdir_match)
-                return matches
-            else:
-                print(f"Unexpected content structure from {url}")
-                return []
-            
-async def calculate_entropy(data):
-    """Calculate the Shannon entropy of a string."""
-    if not data:
-        return 0
-    entropy = 0
-    length = len(data)
-    frequencies = {char: data.count(char) / length for char in set(data)}
-    for freq in frequencies.values():
-        entropy -= freq * math.log2(freq)
-    return entropy
+    status, contents = await client.get(url)
+    if status != 200:
+        print(f"Failed to fetch contents from {url}: {status}")
+        return []
+    matcher = as_file_matcher(files_pattern)
+    matches = []
+    if isinstance(contents, dict) and contents['type'] == 'file':
+        filename = contents['name']
+        if matcher.accepts(contents['path'], contents.get('size')):
+            if verbose:
+                print(f"File matching pattern found: {filename}")
+            matches.append(contents['path'])
+        return matches
+    elif isinstance(contents, list):
+        tasks = []
+        for content in contents:
+            if content['type'] == 'file':
+                filename = content['name']
+                if matcher.accepts(content['path'], content.get('size')):
+                    if verbose:
+                        print(f"File matching pattern found: {filename}")
+                    matches.append(content['path'])
+            elif content['type'] == 'dir':
+                if matcher.excludes and matcher.excludes.matches(content['path'], is_dir=True):
+                    continue
+                tasks.append(find_files_github(repo, content['path'], matcher, token, verbose, client))
+        subdir_matches = await asyncio.gather(*tasks)
+        for subdir_match in subdir_matches:
+            matches.extend(subdir_match)
+        return matches
+    else:
+        print(f"Unexpected content structure from {url}")
+        return []
+
 
-ENTROPY_THRESHOLD = 4.5
-MIN_LENGTH = 25
+ENTROPY_THRESHOLD = DEFAULT_ENTROPY_THRESHOLD
+MIN_LENGTH = DEFAULT_MIN_LENGTH
 
-async def find_secrets(content, path, verbose=False):
+def highlight_entropy_finding(finding, line_offset=0):
+    """Highlighting the high-entropy words of an entropy finding"""
+    highlighted_line = finding.line.strip()
+    for word in finding.matches:
+        highlighted_word = f"{fg('yellow')}{word}{attr(0)}"
+        highlighted_line = highlighted_line.replace(word, highlighted_word)
+    return f"{highlighted_line} (found entropy) - (line {finding.line_number + line_offset})\n"
+
+async def find_secrets(content, path, verbose=False, window=0):
     """Searching for secrets in the file's text using entropy check."""
     output = ""
     
     try:
-        lines = content.splitlines()
-        for line_number, line in enumerate(lines, start=1):
-            highlighted_line = line.strip()
-            found_match = False
-            found_entop = False
-            words = line.split()
-            for word in words:
-                if len(word) >= MIN_LENGTH:
-                    entropy = await calculate_entropy(word)
-                    if entropy > ENTROPY_THRESHOLD:
-                        if verbose:
-                            print(f"Secret found using entropy in {path}")
-                            verbose=False
-                        found_match = True
-                        found_entop = True
-                        highlighted_word = f"{fg('yellow')}{word}{attr(0)}"
-                        highlighted_line = highlighted_line.replace(word, highlighted_word)
-            if found_match:
-                output += f"{highlighted_line}{' (found entropy)' if found_entop else ''} - (line {line_number})\n"
+        scanner = Scanner([EntropyDetector(ENTROPY_THRESHOLD, MIN_LENGTH, window)])
+        for finding in scanner.scan(content):
+            if verbose:
+                print(f"Secret found using entropy in {path}")
+                verbose=False
+            output += highlight_entropy_finding(finding)
         text_found = f">>> Found in {path}\n\n"
         if output:
             output = text_found + output
@@ -134,16 +117,11 @@ async def find_secrets(content, path, verbose=False):
 
 async def find_files(directory, files_pattern):
     """Searching for matching files in the local repository (for testing)"""
-    matches = []
-    for root, _, files in os.walk(directory):
-        for filename in files:
-            for file_pattern in files_pattern:
-                if re.search(file_pattern, filename):
-                    matches.append(os.path.join(root, filename))
-    return matches
+    return list(walk_files(directory, files_pattern))
         
 async def get_local_file_content(file):
-    async with aiofiles.open(file, "r", encoding="UTF-8") as f:
+    # Binary and non-UTF-8 files are scanned with their undecodable bytes replaced instead of aborting the scan
+    async with aiofiles.open(file, "r", encoding="UTF-8", errors="replace") as f:
         return await f.read()
         
 async def save_results_to_file(results, file_path='found_secrets.json', verbose=False):
@@ -167,6 +145,33 @@ def parse_arguments():
     parser.add_argument("-t", "--token", help="GitHub token for authentication")
     parser.add_argument("-p", "--path", default="", help="Path in the repository GitHub to search (optional)")
     parser.add_argument("-l", "--local", help="Path in the local repository to search (optional)")
+    parser.add_argument("--exclude", action="append", default=[],
+                        help="gitignore-style pattern of paths to skip, can be repeated (optional)")
+    parser.add_argument("--exclude-from", action="append", default=[],
+                        help="File of gitignore-style patterns of paths to skip, e.g. .gitignore (optional)")
+    parser.add_argument("--max-file-size", type=int,
+                        help="Skip files larger than this many bytes without reading them (optional)")
+    parser.add_argument("--walk-workers", type=int, default=DEFAULT_WALK_WORKERS,
+                        help="Threads walking local directories; more than 1 also changes the file order (optional)")
+    parser.add_argument("--prune", action="append", default=[],
+                        help="Directory name never entered in local scans, can be repeated (optional)")
+    parser.add_argument("--no-default-prune", action="store_true",
+                        help=f"Also enter {', '.join(sorted(DEFAULT_PRUNE_DIRS))} (optional)")
+    parser.add_argument("--follow-symlinks", action="store_true",
+                        help="Enter symlinked directories, each directory at most once (optional)")
+    parser.add_argument("--scan-binary", action="store_true",
+                        help="Also scan local files that look binary (optional)")
+    parser.add_argument("--max-inflight", type=int, default=DEFAULT_MAX_INFLIGHT,
+                        help="Maximum number of files being read or scanned at once (optional)")
+    parser.add_argument("--api-url", default=GITHUB_API_URL,
+                        help="GitHub API base URL, e.g. for GitHub Enterprise (optional)")
+    parser.add_argument("--max-connections", type=int, default=DEFAULT_MAX_CONNECTIONS,
+                        help="Maximum number of open connections to GitHub (optional)")
+    parser.add_argument("--requests-per-second", type=float, default=DEFAULT_REQUESTS_PER_SECOND,
+                        help="Maximum GitHub request rate; lowered automatically near the rate limit (optional)")
+    parser.add_argument("--entropy-window", type=int, default=0,
+                        help="Also check every window of this many characters of long words, "
+                             "to catch secrets embedded in longer strings (optional)")
     parser.add_argument("--verbose", action="store_true", help="Enable verbose output")
     return parser.parse_args()
 
@@ -182,46 +187,67 @@ async def main():
     else:
         print(f"{fg('yellow')}[-] File {search_file} is missing.{attr(0)}")
         exit(1)
+    excludes = list(args.exclude)
+    for exclude_file in args.exclude_from:
+        if not os.path.exists(exclude_file):
+            print(f"{fg('yellow')}[-] File {exclude_file} is missing.{attr(0)}")
+            exit(1)
+        async with aiofiles.open(exclude_file, "r", encoding="UTF-8") as f:
+            excludes.extend((await f.read()).splitlines())
+    file_matcher = FileMatcher(regexp_file, excludes, args.max_file_size)
     
     if args.repo:
+        # Imported here: detect_secrets imports this module for highlight_entropy_finding
+        from detect_secrets import find_blobs_github
         token = args.token if args.token else None
         if args.verbose:
             print(f"Searching in GitHub repository {args.repo}...")
         output = []
-        task = []
-        found_files = await find_files_github(args.repo, args.path, regexp_file, token, args.verbose)
-        if not found_files:
-            print(f"{fg('yellow')}[-] No files found.{attr(0)}")
-            exit(1)
+        async with GitHubClient(token, args.max_connections, args.requests_per_second,
+                                api_url=args.api_url) as client:
+            found_blobs = await find_blobs_github(args.repo, args.path, file_matcher, client, args.verbose)
+            if found_blobs is None:
+                found_files = await find_files_github(args.repo, args.path, file_matcher, token, args.verbose, client)
+                found_blobs = [(file, None) for file in found_files]
+            if not found_blobs:
+                print(f"{fg('yellow')}[-] No files found.{attr(0)}")
+                exit(1)
         
-        for file in found_files:
-            task.append(get_file_content(args.repo, file, token, args.verbose))
+            async def fetch(blob):
+                file, sha = blob
+                if sha is None:
+                    return await get_file_content(args.repo, file, token, args.verbose, client)
+                if args.verbose:
+                    print(f"Fetching file content from: {file}")
+                return await client.get_blob(args.repo, sha)
         
-        contents = await asyncio.gather(*task)
-        
-        for content, file in zip(contents, found_files):
-            if content:    
-                results = await find_secrets(content, file, args.verbose)
-                if results:
-                    output.append(results)     
-        if output:
-            print("\n".join(output))
-            await save_results_to_file(output, verbose=args.verbose)
-        else:
-            print(f"{fg('yellow')}[-] No secrets found.{attr(0)}")
+            async for (file, _), content in bounded_map(fetch, found_blobs, args.max_inflight):
+                if content:    
+                    results = await find_secrets(content, file, args.verbose, args.entropy_window)
+                    if results:
+                        output.append(results)     
+            if output:
+                print("\n".join(output))
+                await save_results_to_file(output, verbose=args.verbose)
+            else:
+                print(f"{fg('yellow')}[-] No secrets found.{attr(0)}")
+            if args.verbose:
+                print(client.report())
                 
     if args.local:
         if args.verbose:
             print(f"Searching in local repository at {args.local}...")
         output_from_local_path = []
-        found_local_files = await find_files(args.local, regexp_file)
+        prune_dirs = set(args.prune) if args.no_default_prune else DEFAULT_PRUNE_DIRS | set(args.prune)
+        walker = DirectoryWalker(file_matcher, args.walk_workers, prune_dirs, args.follow_symlinks,
+                                 not args.scan_binary)
+        found_local_files = walker.awalk(args.local)
         
-        tasks = [get_local_file_content(file) for file in found_local_files]
-        contents = await asyncio.gather(*tasks)
-
-        for local_content, local_file in zip(contents, found_local_files):
+        async for local_file, local_content in bounded_map(get_local_file_content, found_local_files,
+                                                           args.max_inflight):
             if local_content:
-                results_local_secrets = await find_secrets(local_content, local_file, args.verbose)
+                results_local_secrets = await find_secrets(local_content, local_file, args.verbose,
+                                                           args.entropy_window)
                 if results_local_secrets:
                     output_from_local_path.append(results_local_secrets)     
         if output_from_local_path:
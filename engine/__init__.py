@@ -0,0 +1,37 @@
+from .pattern_set import PatternSet, LineIndex, DEFAULT_MAX_LINE_LENGTH, DEFAULT_RULE_TIMEOUT
+from .pipeline import bounded_map, DEFAULT_MAX_INFLIGHT
+from .file_matcher import FileMatcher, ExcludeRules, as_file_matcher
+from .walker import DirectoryWalker, is_binary, DEFAULT_PRUNE_DIRS, DEFAULT_WALK_WORKERS
+from .discovery import walk_files, filter_tree_blobs, iter_archive_files
+from .chunks import iter_file_chunks, LARGE_FILE_SIZE
+from .cache import ScanCache, git_blob_sha, file_blob_sha, DEFAULT_CACHE_PATH, DEFAULT_CACHE_MAX_AGE, DEFAULT_CACHE_MAX_ENTRIES
+from .git_history import iter_history_blobs, iter_diff_additions, DEFAULT_MAX_BLOB_SIZE
+from .entropy import shannon_entropy, score_tokens, iter_window_entropy, max_window_entropy
+from .scanner import (Scanner, ScanBuffer, Finding, RegexDetector, EntropyDetector, PrivateKeyDetector, DETECTORS,
+                      KeywordDetector, KEYS_RULE, KEYWORD_RULE, DEFAULT_ENTROPY_THRESHOLD, DEFAULT_MIN_LENGTH)
+from .keys import KeyBlockTracker
+from .keywords import (KeywordMatcher, parse_keywords, trie_pattern, KEYWORD_COVERED_RULES, DEFAULT_KEYWORD_ENTROPY,
+                       DEFAULT_KEYWORD_MIN_LENGTH)
+from .correlation import pair_by_proximity, DEFAULT_PAIR_WINDOW
+from .rules import load_rules, parse_rules, RuleError, DEFAULT_RULES_CACHE_PATH
+from .profiler import Profiler, DEFAULT_PROFILE_PATH
+from .findings import (SecretRecord, JsonLinesWriter, JsonArrayWriter, SarifWriter, validation_status,
+                       OUTPUT_FORMATS)
+from .github import GitHubClient, GitHubError, DEFAULT_MAX_CONNECTIONS, DEFAULT_REQUESTS_PER_SECOND, GITHUB_API_URL
+from .commits import CommitCheckpoints, added_lines, DEFAULT_CHECKPOINT_PATH
+
+__all__ = ['PatternSet', 'LineIndex', 'bounded_map', 'DEFAULT_MAX_INFLIGHT', 'walk_files', 'filter_tree_blobs',
+           'iter_archive_files', 'iter_file_chunks', 'LARGE_FILE_SIZE', 'ScanCache', 'git_blob_sha', 'file_blob_sha',
+           'DEFAULT_CACHE_PATH', 'DEFAULT_CACHE_MAX_AGE', 'DEFAULT_CACHE_MAX_ENTRIES', 'iter_history_blobs',
+           'iter_diff_additions', 'DEFAULT_MAX_BLOB_SIZE', 'GitHubClient', 'DEFAULT_MAX_CONNECTIONS',
+           'DEFAULT_REQUESTS_PER_SECOND', 'GITHUB_API_URL', 'shannon_entropy', 'score_tokens', 'iter_window_entropy', 'max_window_entropy',
+           'Scanner', 'ScanBuffer', 'Finding', 'RegexDetector', 'EntropyDetector', 'DETECTORS',
+           'DEFAULT_ENTROPY_THRESHOLD', 'DEFAULT_MIN_LENGTH', 'load_rules', 'parse_rules', 'RuleError',
+           'DEFAULT_RULES_CACHE_PATH', 'FileMatcher', 'ExcludeRules', 'as_file_matcher',
+           'DirectoryWalker', 'is_binary', 'DEFAULT_PRUNE_DIRS', 'DEFAULT_WALK_WORKERS',
+           'Profiler', 'DEFAULT_PROFILE_PATH', 'DEFAULT_MAX_LINE_LENGTH', 'DEFAULT_RULE_TIMEOUT',
+           'SecretRecord', 'JsonLinesWriter', 'JsonArrayWriter', 'SarifWriter', 'validation_status', 'OUTPUT_FORMATS',
+           'GitHubError', 'CommitCheckpoints', 'added_lines', 'DEFAULT_CHECKPOINT_PATH',
+           'PrivateKeyDetector', 'KeyBlockTracker', 'KEYS_RULE', 'pair_by_proximity', 'DEFAULT_PAIR_WINDOW',
+           'KeywordDetector', 'KEYWORD_RULE', 'KeywordMatcher', 'parse_keywords', 'trie_pattern',
+           'KEYWORD_COVERED_RULES', 'DEFAULT_KEYWORD_ENTROPY', 'DEFAULT_KEYWORD_MIN_LENGTH', ]
@@ -0,0 +1,194 @@
+import copy
+import hashlib
+import os
+import sqlite3
+import time
+from .findings import dump_records, load_records
+
+DEFAULT_CACHE_PATH = ".secret_scan_cache.sqlite"
+DEFAULT_CACHE_MAX_AGE = 30 * 24 * 60 * 60
+DEFAULT_CACHE_MAX_ENTRIES = 200000
+# Bump when the stored output format changes
+CACHE_VERSION = 1
+COMMIT_EVERY = 1000
+
+
+def git_blob_sha(data):
+    """
+    Returns the git blob SHA-1 of the bytes, the same id `git hash-object` prints.
+    """
+    digest = hashlib.sha1(b"blob %d\0" % len(data))
+    digest.update(data)
+    return digest.hexdigest()
+
+
+def file_blob_sha(path, block_size=1024 * 1024):
+    """
+    Returns the git blob SHA-1 of a local file without loading it whole.
+    """
+    digest = hashlib.sha1(b"blob %d\0" % os.path.getsize(path))
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ScanCache:
+    """
+    On-disk cache of per-file scan results.
+
+    Results are keyed by the git blob SHA of the file content and by the
+    fingerprint of the loaded rule set, so unchanged content is never scanned
+    twice with the same rules, wherever it lives. Local files are also
+    remembered by size and mtime, which lets an unchanged file skip even the
+    hashing. Entries unused for max_age seconds, and the least recently used
+    ones beyond max_entries, are evicted on close().
+    """
+
+    def __init__(self, path, fingerprint, max_age=DEFAULT_CACHE_MAX_AGE,
+                 max_entries=DEFAULT_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.fingerprint = f"{CACHE_VERSION}:{fingerprint}"
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.pending_writes = 0
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest TEXT);
+            CREATE TABLE IF NOT EXISTS findings (
+                digest TEXT, fingerprint TEXT, output TEXT, last_used REAL,
+                PRIMARY KEY (digest, fingerprint));
+        """)
+
+    def keyed(self, fingerprint):
+        """
+        Returns a cache over the same connection for another rule fingerprint, e.g. for
+        rules a long-running process reloaded while requests still use the old ones.
+        Only the original is closed.
+        """
+        cache = copy.copy(self)
+        cache.fingerprint = f"{CACHE_VERSION}:{fingerprint}"
+        return cache
+
+    def file_digest(self, path):
+        """
+        Returns the content digest of a local file, hashing it only if its size or mtime changed.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        digest = self.stored_digest(path, stat)
+        if digest is None:
+            digest = file_blob_sha(path)
+            self.store_digest(path, stat, digest)
+        return digest
+
+    def stored_digest(self, path, stat):
+        """
+        Returns the digest remembered for the absolute path if its size and mtime still match `stat`, else None.
+        """
+        row = self.connection.execute(
+            "SELECT size, mtime_ns, digest FROM files WHERE path = ?", (path,)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+        return None
+
+    def store_digest(self, path, stat, digest):
+        """
+        Remembers the digest of the absolute path, hashed after `stat` was taken.
+        """
+        self.connection.execute(
+            "INSERT OR REPLACE INTO files (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)",
+            (path, stat.st_size, stat.st_mtime_ns, digest))
+        self._written()
+
+    def _lookup(self, digest):
+        row = self.connection.execute(
+            "SELECT output FROM findings WHERE digest = ? AND fingerprint = ?",
+            (digest, self.fingerprint)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.connection.execute(
+            "UPDATE findings SET last_used = ? WHERE digest = ? AND fingerprint = ?",
+            (time.time(), digest, self.fingerprint))
+        self._written()
+        return row[0]
+
+    def get(self, digest, path):
+        """
+        Returns the cached scan output for the content as reported for `path`, or None on a miss.
+        """
+        output = self._lookup(digest)
+        if output is None:
+            return None
+        return f">>> Found in {path}\n\n{output}" if output else ""
+
+    def get_records(self, digest, path):
+        """
+        Returns the cached SecretRecords of the content, reported under `path`, or None on a miss.
+        """
+        output = self._lookup(digest)
+        return load_records(output, path) if output is not None else None
+
+    def put(self, digest, path, output):
+        """
+        Stores the scan output of the content; the path header is dropped so any copy can reuse it.
+        """
+        header = f">>> Found in {path}\n\n"
+        if output.startswith(header):
+            output = output[len(header):]
+        self._store(digest, output)
+
+    def put_records(self, digest, records):
+        """
+        Stores the SecretRecords of the content without their path, so any copy can reuse them.
+        Use a different fingerprint than for text outputs.
+        """
+        self._store(digest, dump_records(records))
+
+    def _store(self, digest, output):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO findings (digest, fingerprint, output, last_used) VALUES (?, ?, ?, ?)",
+            (digest, self.fingerprint, output, time.time()))
+        self._written()
+
+    def _written(self):
+        self.pending_writes += 1
+        if self.pending_writes >= COMMIT_EVERY:
+            self.connection.commit()
+            self.pending_writes = 0
+
+    def evict(self):
+        """
+        Removes entries older than max_age and the least recently used ones above max_entries.
+        """
+        cursor = self.connection.execute(
+            "DELETE FROM findings WHERE last_used < ?", (time.time() - self.max_age,))
+        self.evicted += cursor.rowcount
+        cursor = self.connection.execute(
+            "DELETE FROM findings WHERE rowid IN "
+            "(SELECT rowid FROM findings ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+        self.evicted += cursor.rowcount
+        self.connection.execute(
+            "DELETE FROM files WHERE digest NOT IN (SELECT digest FROM findings)")
+
+    def flush(self):
+        """
+        Commits the pending writes, e.g. after each request of a long-running process.
+        """
+        self.connection.commit()
+        self.pending_writes = 0
+
+    def close(self):
+        self.evict()
+        self.connection.commit()
+        self.connection.close()
+
+    def report(self):
+        return (f"Scan cache {self.path}: {self.hits} hits, {self.misses} misses, "
+                f"{self.evicted} evicted")
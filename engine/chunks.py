@@ -0,0 +1,68 @@
+import mmap
+import re
+
+LARGE_FILE_SIZE = 8 * 1024 * 1024
+CHUNK_SIZE = 4 * 1024 * 1024
+# Longest text a match may need from the previous chunk: private key blocks
+# are the only rules spanning lines, and an RSA 16384 PEM block is ~12 KiB
+CHUNK_OVERLAP = 64 * 1024
+
+# UTF-8 encoded str.splitlines() boundaries, so line numbers match text mode
+LINE_BREAK_BYTES_REGEX = re.compile(rb"\r\n|[\n\r\x0b\x0c\x1c\x1d\x1e]|\xc2\x85|\xe2\x80[\xa8\xa9]")
+
+
+def _char_start(data, position, lowest):
+    """
+    Moves the position back to the start of a UTF-8 character.
+    """
+    while position > lowest and (data[position] & 0xC0) == 0x80:
+        position -= 1
+    return position
+
+
+def count_lines(data, start, end):
+    """
+    Counts the line breaks in data[start:end] without materializing the lines.
+    """
+    return sum(1 for _ in LINE_BREAK_BYTES_REGEX.finditer(data, start, end))
+
+
+def iter_file_chunks(path, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """
+    Memory-maps the file and yields (line_offset, text) chunks.
+
+    Chunks end after a newline when possible; a single line longer than the
+    chunk is cut at a UTF-8 character boundary. Each chunk after the first
+    starts up to `overlap` bytes before the previous one ended, so matches
+    cut by a chunk boundary are seen whole in the next chunk. line_offset is
+    the number of line breaks before the chunk, so the first line of the
+    chunk is line line_offset + 1. Bytes that are not valid UTF-8 are replaced.
+    """
+    chunk_size = max(chunk_size, 2 * overlap)
+    with open(path, "rb") as f:
+        if f.seek(0, 2) == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            size = len(data)
+            start = 0
+            line_offset = 0
+            while start < size:
+                end = start + chunk_size
+                if end >= size:
+                    cut = size
+                else:
+                    cut = data.rfind(b"\n", start, end) + 1
+                    if cut <= start:
+                        cut = _char_start(data, end, start + 1)
+                yield line_offset, data[start:cut].decode("utf-8", errors="replace")
+                if cut >= size:
+                    break
+
+                next_start = cut - overlap
+                if next_start <= start:
+                    next_start = cut
+                else:
+                    line_start = data.find(b"\n", next_start, cut) + 1
+                    next_start = line_start if line_start > 0 else _char_start(data, next_start, start + 1)
+                line_offset += count_lines(data, start, next_start)
+                start = next_start
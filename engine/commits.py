@@ -0,0 +1,67 @@
+import json
+import os
+import re
+
+DEFAULT_CHECKPOINT_PATH = ".secret_scan_commits.json"
+CHECKPOINT_VERSION = 1
+
+HUNK_HEADER = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,\d+)? @@")
+
+
+def added_lines(patch):
+    """
+    Returns the (line_number, text) pairs a unified diff patch adds, numbered as in the new file.
+    Like git, only newlines end a line: form feeds and other separators stay in the text.
+    """
+    lines = []
+    line_number = 0
+    for line in patch.split("\n"):
+        line = line.rstrip("\r")
+        if line.startswith("@@"):
+            header = HUNK_HEADER.match(line)
+            if header:
+                line_number = int(header.group(1))
+        elif line.startswith("+"):
+            lines.append((line_number, line[1:]))
+            line_number += 1
+        elif line.startswith(" ") or not line:
+            line_number += 1
+        # Removed lines and "\ No newline at end of file" do not move the new file
+    return lines
+
+
+class CommitCheckpoints:
+    """
+    The newest commit scanned in each repository, kept in a JSON file.
+
+    Repeated scans list commits only down to the checkpoint, so only new
+    commits are fetched and scanned. If the checkpoint commit is no longer on
+    the branch, e.g. after a force push, the whole history is listed again.
+    """
+
+    def __init__(self, path=DEFAULT_CHECKPOINT_PATH):
+        self.path = path
+        self.checkpoints = {}
+        try:
+            with open(path, "r", encoding="UTF-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get("version") == CHECKPOINT_VERSION:
+            self.checkpoints = data.get("repositories", {})
+
+    def get(self, repo):
+        return self.checkpoints.get(repo)
+
+    def set(self, repo, sha):
+        self.checkpoints[repo] = sha
+
+    def save(self):
+        temporary_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(temporary_path, "w", encoding="UTF-8") as f:
+                json.dump({"version": CHECKPOINT_VERSION, "repositories": self.checkpoints}, f, indent=4)
+            os.replace(temporary_path, self.path)
+        except OSError:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
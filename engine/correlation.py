@@ -0,0 +1,46 @@
+from bisect import bisect_left
+
+# Lines between a key and a secret paired closest first
+DEFAULT_PAIR_WINDOW = 20
+
+
+def pair_by_proximity(keys, secrets, window=DEFAULT_PAIR_WINDOW):
+    """
+    Pairs each key with a secret by line distance; keys and secrets are lists of (line, item).
+
+    Pairs at most `window` lines apart are made closest first, preferring a
+    secret after its key, and each key and secret is used once, so interleaved
+    key and secret lines pair up in order. A key left over is paired with the
+    nearest secret of the whole list. Returns (key, secret) items in line order
+    of the keys.
+    """
+    keys = sorted(keys, key=lambda entry: entry[0])
+    secrets = sorted(secrets, key=lambda entry: entry[0])
+    if not keys or not secrets:
+        return []
+    candidates = []
+    low = 0
+    for key_index, (line, _) in enumerate(keys):
+        while secrets[low][0] < line - window and low < len(secrets) - 1:
+            low += 1
+        for secret_index in range(low, len(secrets)):
+            secret_line = secrets[secret_index][0]
+            if secret_line > line + window:
+                break
+            if secret_line >= line - window:
+                candidates.append((abs(secret_line - line), secret_line < line, key_index, secret_index))
+    candidates.sort()
+
+    paired = {}
+    used = set()
+    for _, _, key_index, secret_index in candidates:
+        if key_index not in paired and secret_index not in used:
+            paired[key_index] = secret_index
+            used.add(secret_index)
+    secret_lines = [line for line, _ in secrets]
+    for key_index, (line, _) in enumerate(keys):
+        if key_index not in paired:
+            after = bisect_left(secret_lines, line)
+            nearest = [index for index in (after - 1, after) if 0 <= index < len(secrets)]
+            paired[key_index] = min(nearest, key=lambda index: (abs(secret_lines[index] - line), index < after))
+    return [(keys[key_index][1], secrets[secret_index][1]) for key_index, secret_index in sorted(paired.items())]
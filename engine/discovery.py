@@ -0,0 +1,47 @@
+import tarfile
+from .file_matcher import as_file_matcher
+from .walker import DirectoryWalker
+
+
+def in_scope(path, scope):
+    """
+    Tells whether a repository path is the scoped file or lies under the scoped directory.
+    """
+    scope = scope.strip("/")
+    return not scope or path == scope or path.startswith(scope + "/")
+
+
+def walk_files(directory, files_pattern):
+    """
+    Yields each local file whose name matches the file patterns once, in os.walk order.
+    files_pattern is a FileMatcher or a list of patterns; excluded directories are not entered.
+    Nothing is pruned or sniffed here, see DirectoryWalker for that.
+    """
+    return DirectoryWalker(files_pattern, prune_dirs=(), skip_binary=False).walk(directory)
+
+
+def filter_tree_blobs(entries, scope, files_pattern):
+    """
+    Returns (path, sha) for the blobs of a recursive Git tree listing that are in scope
+    and accepted by the file matcher.
+    """
+    matcher = as_file_matcher(files_pattern)
+    return [(entry["path"], entry["sha"]) for entry in entries
+            if entry["type"] == "blob" and in_scope(entry["path"], scope)
+            and matcher.accepts(entry["path"], entry.get("size"))]
+
+
+def iter_archive_files(fileobj, scope, files_pattern):
+    """
+    Yields (path, data) for the matching files of a gzipped repository tarball, reading it as a stream.
+    The top-level "owner-repo-sha/" directory GitHub adds is dropped from the paths.
+    """
+    matcher = as_file_matcher(files_pattern)
+    with tarfile.open(fileobj=fileobj, mode="r|gz") as archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+            path = member.name.split("/", 1)[1] if "/" in member.name else member.name
+            if not in_scope(path, scope) or not matcher.accepts(path, member.size):
+                continue
+            yield path, archive.extractfile(member).read()
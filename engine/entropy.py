@@ -0,0 +1,72 @@
+import math
+from collections import Counter
+
+# c * log2(c) for every count a token of TABLE_SIZE characters can reach;
+# larger counts are computed on demand
+TABLE_SIZE = 4096
+C_LOG2_C = [0.0] + [count * math.log2(count) for count in range(1, TABLE_SIZE + 1)]
+
+
+def _c_log2_c(count):
+    return C_LOG2_C[count] if count <= TABLE_SIZE else count * math.log2(count)
+
+
+def shannon_entropy(data):
+    """
+    Returns the Shannon entropy of a string in bits per character.
+
+    Characters are counted in one pass, and the entropy is computed as
+    log2(n) - sum(c * log2(c)) / n from the precomputed c * log2(c) table.
+    """
+    length = len(data)
+    if not length:
+        return 0
+    total = sum(_c_log2_c(count) for count in Counter(data).values())
+    return max(0.0, math.log2(length) - total / length)
+
+
+def score_tokens(tokens):
+    """
+    Returns the entropy of every token, computing it once per distinct token.
+    """
+    scores = {}
+    for token in tokens:
+        if token not in scores:
+            scores[token] = shannon_entropy(token)
+    return [scores[token] for token in tokens]
+
+
+def iter_window_entropy(data, window):
+    """
+    Yields (start, entropy) for every window of `window` characters of the string.
+
+    Counts and the sum of c * log2(c) are updated incrementally as the window
+    slides, so each step costs O(1) instead of a full recount.
+    """
+    if window <= 0 or len(data) < window:
+        return
+    counts = Counter(data[:window])
+    total = sum(_c_log2_c(count) for count in counts.values())
+    log2_window = math.log2(window)
+    yield 0, max(0.0, log2_window - total / window)
+    for start in range(1, len(data) - window + 1):
+        removed, added = data[start - 1], data[start + window - 1]
+        if removed != added:
+            count = counts[removed]
+            total += _c_log2_c(count - 1) - _c_log2_c(count)
+            counts[removed] = count - 1
+            count = counts[added]
+            total += _c_log2_c(count + 1) - _c_log2_c(count)
+            counts[added] = count + 1
+        yield start, max(0.0, log2_window - total / window)
+
+
+def max_window_entropy(data, window):
+    """
+    Returns (start, entropy) of the window with the highest entropy, or (None, 0) if data is shorter than window.
+    """
+    best_start, best_entropy = None, 0
+    for start, entropy in iter_window_entropy(data, window):
+        if entropy > best_entropy:
+            best_start, best_entropy = start, entropy
+    return best_start, best_entropy
@@ -0,0 +1,229 @@
+import os
+import re
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+# Most alternatives a pattern may expand to before it is left to the regex engine
+MAX_EXPANSIONS = 64
+
+
+def _expand(parsed):
+    """
+    Returns every string a parsed pattern without wildcards can match, or None
+    if it matches an open set of strings or too many of them.
+    """
+    results = {""}
+    for op, av in parsed:
+        if op is sre_parse.LITERAL:
+            options = {chr(av)}
+        elif op is sre_parse.SUBPATTERN:
+            if av[1] & re.IGNORECASE:
+                return None
+            options = _expand(av[-1])
+        elif op is sre_parse.BRANCH:
+            options = set()
+            for branch in av[1]:
+                expanded = _expand(branch)
+                if expanded is None:
+                    return None
+                options |= expanded
+        elif op is sre_parse.IN and all(item_op is sre_parse.LITERAL for item_op, _ in av):
+            options = {chr(item) for _, item in av}
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[1] <= 1:
+            options = _expand(av[2])
+            if options is not None and av[0] == 0:
+                options |= {""}
+        else:
+            return None
+        if options is None or len(results) * len(options) > MAX_EXPANSIONS:
+            return None
+        results = {result + option for result in results for option in options}
+    return results
+
+
+def pattern_suffixes(file_pattern):
+    """
+    Returns the literal file name endings an "<anything><literal>$" pattern such as
+    .*\\.ya?ml$ matches, or None if the pattern has another shape.
+    """
+    try:
+        parsed = sre_parse.parse(file_pattern)
+    except Exception:
+        return None
+    state = getattr(parsed, "state", None) or parsed.pattern
+    if state.flags & re.IGNORECASE:
+        return None
+    parsed = list(parsed)
+    if not parsed or parsed[-1] != (sre_parse.AT, sre_parse.AT_END):
+        return None
+    parsed = parsed[:-1]
+    if parsed and parsed[0][0] in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) \
+            and parsed[0][1][0] == 0 and list(parsed[0][1][2]) == [(sre_parse.ANY, None)]:
+        parsed = parsed[1:]
+    suffixes = _expand(parsed)
+    if not suffixes or "" in suffixes or any("\n" in suffix for suffix in suffixes):
+        return None
+    return suffixes
+
+
+def _glob_to_regex(glob):
+    """
+    Translates a gitignore glob to a regex: "*" and "?" stay within one path
+    component, "**" spans components and [...] classes are kept.
+    """
+    regex = ""
+    i = 0
+    while i < len(glob):
+        char = glob[i]
+        if glob.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+            continue
+        if glob.startswith("**", i):
+            regex += ".*"
+            i += 2
+            continue
+        if char == "*":
+            regex += "[^/]*"
+        elif char == "?":
+            regex += "[^/]"
+        elif char == "[":
+            end = glob.find("]", i + 1)
+            if end == -1:
+                regex += re.escape(char)
+            else:
+                regex += "[" + glob[i + 1:end].replace("\\", "\\\\").replace("!", "^", 1) + "]"
+                i = end
+        elif char == "\\" and i + 1 < len(glob):
+            i += 1
+            regex += re.escape(glob[i])
+        else:
+            regex += re.escape(char)
+        i += 1
+    return regex
+
+
+class ExcludeRules:
+    """
+    gitignore-style exclude patterns over "/"-separated relative paths.
+
+    A pattern without an inner "/" matches a name at any depth, one with a "/"
+    is anchored to the scan root, a trailing "/" only matches directories, "**"
+    spans directories and "!" re-includes. The last matching pattern wins, and
+    everything under an excluded directory is excluded.
+    """
+
+    def __init__(self, patterns=()):
+        self.rules = []
+        for pattern in patterns:
+            pattern = pattern.rstrip("\n")
+            if not pattern.strip() or pattern.startswith("#"):
+                continue
+            negated = pattern.startswith("!")
+            if negated:
+                pattern = pattern[1:]
+            directory_only = pattern.endswith("/")
+            pattern = pattern.rstrip("/")
+            if not pattern:
+                continue
+            if "/" in pattern:
+                regex = "^" + _glob_to_regex(pattern.lstrip("/")) + "$"
+            else:
+                regex = "(?:^|/)" + _glob_to_regex(pattern) + "$"
+            self.rules.append((re.compile(regex), negated, directory_only))
+
+    def __bool__(self):
+        return bool(self.rules)
+
+    def matches(self, path, is_dir=False):
+        """
+        Tells whether the path itself is excluded, not looking at its parent directories.
+        """
+        excluded = False
+        for regex, negated, directory_only in self.rules:
+            if directory_only and not is_dir:
+                continue
+            if regex.search(path):
+                excluded = not negated
+        return excluded
+
+    def excluded(self, path):
+        """
+        Tells whether a file path is excluded by itself or through one of its parent directories.
+        """
+        parts = path.strip("/").split("/")
+        for depth in range(1, len(parts)):
+            if self.matches("/".join(parts[:depth]), is_dir=True):
+                return True
+        return self.matches("/".join(parts))
+
+
+class FileMatcher:
+    """
+    All file patterns compiled into one matcher, evaluated before any file is opened.
+
+    Patterns of the common "<anything>.<ext>$" shape are answered with a set
+    lookup on the file extension (or str.endswith for multi-part suffixes like
+    .pkr.hcl); the rest are precompiled regexes searched in order. A name is
+    accepted once however many patterns match it. Exclude patterns and a
+    maximum file size are checked alongside.
+    """
+
+    def __init__(self, files_pattern, excludes=(), max_file_size=None):
+        self.files_pattern = list(files_pattern)
+        self.extensions = set()
+        suffixes = set()
+        regexes = []
+        for file_pattern in dict.fromkeys(self.files_pattern):
+            pattern_endings = pattern_suffixes(file_pattern)
+            if pattern_endings is None:
+                regexes.append(re.compile(file_pattern))
+                continue
+            for suffix in pattern_endings:
+                if suffix.startswith(".") and suffix.count(".") == 1:
+                    self.extensions.add(suffix)
+                else:
+                    suffixes.add(suffix)
+        self.suffixes = tuple(sorted(suffixes))
+        self.regexes = regexes
+        self.excludes = excludes if isinstance(excludes, ExcludeRules) else ExcludeRules(excludes)
+        self.max_file_size = max_file_size
+
+    def matches_name(self, filename):
+        """
+        Tells whether a file name matches any file pattern.
+        """
+        # "$" also matches before a trailing newline
+        name = filename[:-1] if filename.endswith("\n") else filename
+        dot = name.rfind(".")
+        if dot != -1 and name[dot:] in self.extensions:
+            return True
+        if self.suffixes and name.endswith(self.suffixes):
+            return True
+        return any(regex.search(filename) for regex in self.regexes)
+
+    def too_large(self, size):
+        return self.max_file_size is not None and size is not None and size > self.max_file_size
+
+    def accepts(self, path, size=None):
+        """
+        Tells whether a "/"-separated path relative to the scan root should be scanned.
+        """
+        return (self.matches_name(path.rsplit("/", 1)[-1]) and not self.too_large(size)
+                and not (self.excludes and self.excludes.excluded(path)))
+
+
+def as_file_matcher(files_pattern):
+    """
+    Returns files_pattern itself if it is a FileMatcher, else a FileMatcher over the pattern list.
+    """
+    return files_pattern if isinstance(files_pattern, FileMatcher) else FileMatcher(files_pattern)
+
+
+def relative_path(path, root):
+    """
+    Returns path relative to root with "/" separators, as exclude patterns expect.
+    """
+    return os.path.relpath(path, root).replace(os.sep, "/")
@@ -0,0 +1,185 @@
+import hashlib
+import json
+
+OUTPUT_FORMATS = ("text", "jsonl", "sarif")
+SARIF_SCHEMA = "https://json.schemastore.org/sarif-2.1.0.json"
+SARIF_VERSION = "2.1.0"
+TOOL_NAME = "GitHub Secret Finder"
+
+
+def validation_status(result):
+    """
+    Maps a validation result string to "valid", "invalid", "error" or "unverified".
+    """
+    if result.startswith("VALID"):
+        return "valid"
+    if result.startswith("INVALID"):
+        return "invalid"
+    if result.startswith("Error"):
+        return "error"
+    return "unverified"
+
+
+class SecretRecord:
+    """
+    One reported secret: where it is, which rule found it and how it validated.
+
+    `validation` is the raw validation result shown in text reports (empty when
+    not validated, a placeholder until deferred validation resolves it). Lines
+    and columns are 1-based; column is None when the match is not on the line
+    itself. A match spanning several lines, such as a private key block, starts
+    on `line` and ends on `end_line`.
+    """
+
+    __slots__ = ("path", "line", "column", "rule", "detector", "match", "line_text", "validation", "end_line")
+
+    def __init__(self, path, line, column, rule, detector, match, line_text, validation="", end_line=None):
+        self.path = path
+        self.line = line
+        self.column = column
+        self.rule = rule
+        self.detector = detector
+        self.match = match
+        self.line_text = line_text
+        self.validation = validation
+        self.end_line = end_line if end_line is not None else line
+
+    def __repr__(self):
+        return f"SecretRecord({self.path!r}, {self.line}, {self.rule!r}, {self.match!r})"
+
+    @property
+    def match_hash(self):
+        return hashlib.sha256(self.match.encode("utf-8")).hexdigest()
+
+    def to_dict(self, include_line=False):
+        """
+        Returns the record as a JSON-serializable dict; the source line is only included on request.
+        """
+        status = validation_status(self.validation)
+        record = {
+            "path": self.path,
+            "line": self.line,
+            "end_line": self.end_line,
+            "column": self.column,
+            "rule": self.rule,
+            "detector": self.detector,
+            "match": self.match,
+            "match_hash": self.match_hash,
+            "validation": status,
+        }
+        if status != "unverified":
+            record["validation_message"] = self.validation
+        if include_line:
+            record["line_text"] = self.line_text
+            record["validation_result"] = self.validation
+        return record
+
+    @classmethod
+    def from_dict(cls, record, path=None):
+        """
+        Rebuilds a record saved with to_dict(include_line=True), optionally under another path.
+        """
+        return cls(path if path is not None else record["path"], record["line"], record["column"], record["rule"],
+                   record["detector"], record["match"], record["line_text"], record["validation_result"],
+                   record.get("end_line"))
+
+
+def dump_records(records):
+    """
+    Serializes records without their paths, e.g. for the scan cache.
+    """
+    return json.dumps([{key: value for key, value in record.to_dict(include_line=True).items() if key != "path"}
+                       for record in records])
+
+
+def load_records(text, path):
+    return [SecretRecord.from_dict(record, path) for record in json.loads(text)]
+
+
+class JsonLinesWriter:
+    """
+    Writes one JSON object per record and line, flushed after every file. Non-ASCII
+    characters are escaped, so readers splitting on Unicode line breaks such as
+    U+2028 still see one record per line.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, records):
+        for record in records:
+            self.stream.write(json.dumps(record.to_dict()) + "\n")
+        self.stream.flush()
+
+    def close(self):
+        self.stream.flush()
+
+
+class JsonArrayWriter:
+    """
+    Writes the records as one JSON array, streamed element by element.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.count = 0
+        self.stream.write("[")
+
+    def write(self, records):
+        for record in records:
+            separator = ",\n    " if self.count else "\n    "
+            self.stream.write(separator + json.dumps(record.to_dict(), ensure_ascii=False))
+            self.count += 1
+        self.stream.flush()
+
+    def close(self):
+        self.stream.write("\n]\n" if self.count else "]\n")
+        self.stream.flush()
+
+
+class SarifWriter:
+    """
+    Writes a SARIF 2.1.0 log with one run. The rule list goes out first and the
+    results are streamed into the run's results array as they are written.
+    """
+
+    def __init__(self, stream, rules):
+        self.stream = stream
+        self.count = 0
+        driver = {
+            "name": TOOL_NAME,
+            "rules": [{"id": rule, "shortDescription": {"text": rule}} for rule in dict.fromkeys(rules)],
+        }
+        header = json.dumps({"$schema": SARIF_SCHEMA, "version": SARIF_VERSION,
+                             "runs": [{"tool": {"driver": driver}, "results": []}]}, ensure_ascii=False)
+        # Everything up to the empty results array; close() writes the rest
+        self.footer = "]}]}\n"
+        self.stream.write(header[:-len("]}]}")])
+
+    @staticmethod
+    def result(record):
+        region = {"startLine": record.line}
+        if record.end_line != record.line:
+            region["endLine"] = record.end_line
+        if record.column is not None:
+            region["startColumn"] = record.column
+        status = validation_status(record.validation)
+        return {
+            "ruleId": record.rule,
+            "level": "error" if status == "valid" else "warning",
+            "message": {"text": f"{record.rule} found ({status})"},
+            "locations": [{"physicalLocation": {"artifactLocation": {"uri": record.path.replace("\\", "/")},
+                                                "region": region}}],
+            "partialFingerprints": {"matchHash/v1": record.match_hash},
+            "properties": {"detector": record.detector, "validation": status},
+        }
+
+    def write(self, records):
+        for record in records:
+            self.stream.write(("," if self.count else "") + json.dumps(self.result(record), ensure_ascii=False))
+            self.count += 1
+        self.stream.flush()
+
+    def close(self):
+        self.stream.write(self.footer)
+        self.stream.flush()
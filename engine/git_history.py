@@ -0,0 +1,131 @@
+import codecs
+import subprocess
+from .file_matcher import as_file_matcher
+from .commits import HUNK_HEADER
+
+DEFAULT_MAX_BLOB_SIZE = 8 * 1024 * 1024
+
+
+def _git(repo_path, *args, **kwargs):
+    return subprocess.Popen(["git", "-C", repo_path, *args], **kwargs)
+
+
+def iter_history_blobs(repo_path, files_pattern, max_size=DEFAULT_MAX_BLOB_SIZE):
+    """
+    Yields (sha, path, data) once for every unique blob reachable from any ref of a
+    local clone, under the first path accepted by the file matcher it was seen at.
+
+    `git log --all --raw` lists every path each commit adds or changes with its
+    blob, so a blob is matched against all the paths it appears under: content
+    committed as x.txt and then copied to config.py is still scanned. Sizes come
+    from one `git cat-file --batch-check` process and the blobs are read through
+    a single `git cat-file --batch` process. Blobs above max_size bytes are skipped.
+    """
+    matcher = as_file_matcher(files_pattern)
+    log = _git(repo_path, "log", "--all", "--raw", "--no-abbrev", "--no-renames", "-m", "--format=",
+               stdout=subprocess.PIPE)
+    check = _git(repo_path, "cat-file", "--batch-check", stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    batch = _git(repo_path, "cat-file", "--batch", stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    seen = set()
+    try:
+        for line in log.stdout:
+            # :<old mode> <new mode> <old sha> <new sha> <status>\t<path>
+            entry, _, path = line.decode("utf-8", errors="replace").rstrip("\n").partition("\t")
+            fields = entry.split()
+            if len(fields) != 5 or not fields[0].startswith(":"):
+                continue
+            _, mode, _, sha, status = fields
+            # Deleted files and submodule commits have no blob to read
+            if status == "D" or mode == "160000" or sha in seen:
+                continue
+            path = _unquote(path)
+            if not matcher.accepts(path):
+                continue
+            seen.add(sha)
+            check.stdin.write(sha.encode("ascii") + b"\n")
+            check.stdin.flush()
+            header = check.stdout.readline().split()
+            if len(header) != 3 or header[1] != b"blob":
+                continue
+            size = int(header[2])
+            if (max_size and size > max_size) or not matcher.accepts(path, size):
+                continue
+            batch.stdin.write(sha.encode("ascii") + b"\n")
+            batch.stdin.flush()
+            header = batch.stdout.readline().split()
+            if len(header) != 3:
+                continue
+            data = batch.stdout.read(int(header[2]))
+            batch.stdout.read(1)
+            yield sha, path, data
+    finally:
+        for process in (batch, check):
+            process.stdin.close()
+        if log.poll() is None:
+            log.kill()
+        for process in (batch, check, log):
+            process.wait()
+
+
+def _unquote(path):
+    """
+    Undoes git's C-style quoting of path names with special characters or non-ASCII letters.
+    With core.quotePath=false the letters stay literal next to the escapes, so the escapes
+    are decoded on the UTF-8 bytes.
+    """
+    if len(path) < 2 or not (path.startswith('"') and path.endswith('"')):
+        return path
+    return codecs.escape_decode(path[1:-1].encode("utf-8"))[0].decode("utf-8", errors="replace")
+
+
+def iter_diff_additions(repo_path, files_pattern, revisions=None):
+    """
+    Yields (path, lines) for each matching file a diff of a local clone adds
+    lines to; lines are (line_number, text) pairs numbered as in the new version.
+
+    Without revisions the diff is `git diff --cached`, the changes staged for the
+    next commit; otherwise it is `git diff <revisions>`, e.g. main..HEAD. The
+    diff is read as a stream without context lines, and only the added lines of
+    one file are held at a time. Deleted and binary files add no lines. Raises
+    CalledProcessError when git fails, e.g. on an unknown revision.
+    """
+    matcher = as_file_matcher(files_pattern)
+    diff = _git(repo_path, "diff", "--no-color", "--no-ext-diff", "--no-textconv", "--unified=0",
+                "--diff-filter=d", "--src-prefix=a/", "--dst-prefix=b/",
+                *([revisions, "--"] if revisions else ["--cached"]), stdout=subprocess.PIPE)
+    path = None
+    lines = []
+    in_header = False
+    line_number = 0
+    try:
+        for raw_line in diff.stdout:
+            line = raw_line.rstrip(b"\n").rstrip(b"\r").decode("utf-8", errors="replace")
+            if line.startswith("diff --git "):
+                if path is not None and lines:
+                    yield path, lines
+                path, lines, in_header = None, [], True
+            elif line.startswith("@@"):
+                in_header = False
+                header = HUNK_HEADER.match(line)
+                if header:
+                    line_number = int(header.group(1))
+            elif in_header:
+                if line.startswith("+++ "):
+                    # Names with spaces end with a tab; /dev/null stands for a deleted file
+                    target = _unquote(line[4:].rstrip("\t"))
+                    if target.startswith("b/") and matcher.accepts(target[2:]):
+                        path = target[2:]
+            elif line.startswith("+"):
+                if path is not None:
+                    lines.append((line_number, line[1:]))
+                line_number += 1
+            elif line.startswith(" "):
+                line_number += 1
+        if path is not None and lines:
+            yield path, lines
+        if diff.wait() != 0:
+            raise subprocess.CalledProcessError(diff.returncode, diff.args)
+    finally:
+        if diff.poll() is None:
+            diff.kill()
+        diff.wait()
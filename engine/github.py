@@ -0,0 +1,258 @@
+import asyncio
+import random
+import time
+import aiohttp
+
+GITHUB_API_URL = "https://api.github.com"
+DEFAULT_MAX_CONNECTIONS = 16
+DEFAULT_REQUESTS_PER_SECOND = 10
+DEFAULT_MAX_RETRIES = 5
+BACKOFF_BASE = 1
+BACKOFF_CAP = 60
+RETRY_STATUSES = {500, 502, 503, 504}
+COMMITS_PER_PAGE = 100
+# GitHub lists the changed files of one commit 300 at a time
+COMMIT_FILES_PER_PAGE = 300
+
+
+class GitHubError(Exception):
+    """
+    Raised when a listing GitHub request fails, so it cannot be completed.
+    """
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+class TokenBucket:
+    """
+    Token bucket that spaces requests out to `rate` per second, with short bursts up to `capacity`.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.max_rate = rate
+        self.capacity = capacity or max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        """
+        Holds every request back for the given number of seconds.
+        """
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class GitHubClient:
+    """
+    One pooled aiohttp session for all GitHub requests of a scan.
+
+    Requests go through a token bucket, follow the X-RateLimit-Remaining /
+    X-RateLimit-Reset budget and Retry-After, and are retried with jittered
+    exponential backoff on rate limiting, server errors and connection errors.
+    """
+
+    def __init__(self, token=None, max_connections=DEFAULT_MAX_CONNECTIONS,
+                 requests_per_second=DEFAULT_REQUESTS_PER_SECOND, max_retries=DEFAULT_MAX_RETRIES,
+                 api_url=GITHUB_API_URL):
+        self.api_url = api_url.rstrip("/")
+        self.headers = {"Accept": "application/vnd.github.v3+json"}
+        if token:
+            self.headers["Authorization"] = f"token {token}"
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.bucket = TokenBucket(requests_per_second)
+        self.session = None
+        self.requests = 0
+        self.retries = 0
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.max_connections)
+        self.session = aiohttp.ClientSession(headers=self.headers, connector=connector)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+    def _observe(self, headers):
+        """
+        Slows the bucket down so the remaining rate limit lasts until it resets.
+        """
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
+        remaining, seconds_left = int(remaining), max(1, int(reset) - time.time())
+        if remaining == 0:
+            self.bucket.pause(seconds_left)
+        else:
+            self.bucket.rate = min(self.bucket.max_rate, remaining / seconds_left)
+
+    def _retry_delay(self, response, attempt):
+        """
+        Returns how long to wait before retrying the response, or None if it is final.
+        """
+        if attempt >= self.max_retries:
+            return None
+        if response.status in (403, 429):
+            retry_after = response.headers.get("Retry-After")
+            if retry_after is not None:
+                delay = int(retry_after) + random.uniform(0, 1)
+            elif response.headers.get("X-RateLimit-Remaining") == "0":
+                reset = int(response.headers.get("X-RateLimit-Reset", time.time()))
+                delay = max(1, reset - time.time()) + random.uniform(0, 1)
+            elif response.status == 429:
+                delay = self._backoff(attempt)
+            else:
+                return None
+            # Rate limits apply to the whole token, so every request waits
+            self.bucket.pause(delay)
+            return delay
+        if response.status in RETRY_STATUSES:
+            return self._backoff(attempt)
+        return None
+
+    async def _request(self, url, read, params=None, headers=None):
+        """
+        Sends a GET with rate limiting and retries; returns (status, read(response)) for a 200, else (status, None).
+        """
+        status = None
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            self.requests += 1
+            try:
+                async with self.session.get(url, params=params, headers=headers) as response:
+                    status = response.status
+                    self._observe(response.headers)
+                    delay = self._retry_delay(response, attempt)
+                    if delay is None:
+                        if status != 200:
+                            return status, None
+                        return status, await read(response)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+            self.retries += 1
+            await asyncio.sleep(delay)
+        return status, None
+
+    async def get(self, url, as_json=True, params=None):
+        """
+        Returns (status, body); body is the decoded JSON or text for a 200 response, otherwise None.
+        """
+        if as_json:
+            return await self._request(url, lambda response: response.json(content_type=None), params)
+        return await self._request(url, lambda response: response.text(), params)
+
+    async def download(self, url, fileobj, chunk_size=1024 * 1024):
+        """
+        Streams the response body into a binary file object; returns the status.
+        """
+        async def read(response):
+            fileobj.seek(0)
+            fileobj.truncate()
+            async for chunk in response.content.iter_chunked(chunk_size):
+                fileobj.write(chunk)
+            fileobj.seek(0)
+        status, _ = await self._request(url, read)
+        return status
+
+    async def get_default_branch(self, repo):
+        status, data = await self.get(f"{self.api_url}/repos/{repo}")
+        return data["default_branch"] if status == 200 else None
+
+    async def get_tree(self, repo, ref):
+        """
+        Lists every entry of the repository tree at ref with one request.
+        Returns (entries, truncated), or (None, False) if the tree cannot be fetched.
+        """
+        status, data = await self.get(f"{self.api_url}/repos/{repo}/git/trees/{ref}", params={"recursive": "1"})
+        if status != 200:
+            return None, False
+        return data.get("tree", []), data.get("truncated", False)
+
+    async def get_blob(self, repo, sha):
+        """
+        Downloads the raw content of a blob; returns the text or None.
+        """
+        status, content = await self._request(
+            f"{self.api_url}/repos/{repo}/git/blobs/{sha}",
+            lambda response: response.text(errors="replace"),
+            headers={"Accept": "application/vnd.github.raw"})
+        return content if status == 200 else None
+
+    async def download_archive(self, repo, ref, fileobj):
+        """
+        Streams the gzipped tarball of the repository at ref into fileobj; returns the status.
+        """
+        return await self.download(f"{self.api_url}/repos/{repo}/tarball/{ref}", fileobj)
+
+    async def iter_commits(self, repo, since=None, until=None, stop_at=None, per_page=COMMITS_PER_PAGE):
+        """
+        Yields the commits of the default branch newest first, fetching them page by page.
+
+        since and until are ISO 8601 timestamps passed on to GitHub. Listing
+        stops before the commit whose SHA is stop_at, e.g. the last one scanned
+        by a previous run. Raises GitHubError if a page cannot be fetched.
+        """
+        params = {"per_page": str(per_page)}
+        if since:
+            params["since"] = since
+        if until:
+            params["until"] = until
+        page = 1
+        while True:
+            params["page"] = str(page)
+            status, commits = await self.get(f"{self.api_url}/repos/{repo}/commits", params=params)
+            if status != 200:
+                raise GitHubError(f"Error fetching commits of {repo} (page {page}): {status}", status)
+            for commit in commits:
+                if commit["sha"] == stop_at:
+                    return
+                yield commit
+            if len(commits) < per_page:
+                return
+            page += 1
+
+    async def get_commit(self, repo, sha):
+        """
+        Returns the commit with every changed file and its patch, or None if it cannot be fetched.
+        """
+        url = f"{self.api_url}/repos/{repo}/commits/{sha}"
+        status, commit = await self.get(url)
+        if status != 200:
+            return None
+        files = commit.get("files", [])
+        page = 1
+        while len(files) == page * COMMIT_FILES_PER_PAGE:
+            page += 1
+            status, more = await self.get(url, params={"page": str(page)})
+            if status != 200 or not more.get("files"):
+                break
+            files.extend(more["files"])
+        commit["files"] = files
+        return commit
+
+    def report(self):
+        return f"GitHub requests: {self.requests}, retries: {self.retries}"
@@ -0,0 +1,82 @@
+import re
+
+# Same markers as the KEYS rule of regex_secrets.csv
+KEY_MARKER_REGEX = re.compile(r"-----(BEGIN|END) [A-Z ]*?PRIVATE KEY-----")
+# Longest block carried over to the next chunk; an RSA 16384 PEM block is ~12 KiB
+MAX_KEY_BLOCK_SIZE = 64 * 1024
+
+
+class KeyBlockTracker:
+    """
+    Finds PEM private key blocks in one pass over the BEGIN/END markers of a file.
+
+    Each block runs from a BEGIN marker to the next END marker and is reported
+    once. A BEGIN marker without an END before the next BEGIN is dropped, and
+    so are blocks with nothing but whitespace between their markers. The
+    tracker is fed a file chunk by chunk through `feed`, with the number of
+    lines before each chunk: markers already seen in the overlap with the
+    previous chunk are skipped, and a block still open at the end of a chunk
+    is carried over, up to MAX_KEY_BLOCK_SIZE characters.
+    """
+
+    def __init__(self):
+        self.last_marker = (0, -1)
+        # (line, begin line text, text so far, last line in the text) of a block carried over
+        self.carried = None
+
+    def feed(self, content, index, line_offset=0):
+        """
+        Returns the (start_line, end_line, begin_line, block) of the blocks
+        ending in this chunk, with 1-based line numbers counted from the file start.
+        """
+        blocks = []
+        carried, self.carried = self.carried, None
+        begin = None
+        for marker in KEY_MARKER_REGEX.finditer(content):
+            line_index = index.line_of(marker.start())
+            line_number = line_offset + line_index + 1
+            column = marker.start() - index.starts[line_index]
+            if (line_number, column) <= self.last_marker:
+                continue
+            self.last_marker = (line_number, column)
+            if marker.group(1) == "BEGIN":
+                begin = (line_number, index.line(line_index), marker.start())
+                carried = None
+            elif begin is not None:
+                start_line, begin_line, start = begin
+                self._emit(blocks, start_line, line_number, begin_line, content[start:marker.end()])
+                begin = None
+            elif carried is not None:
+                start_line, begin_line, text, last_line = carried
+                resume = self._line_start(content, index, last_line - line_offset)
+                self._emit(blocks, start_line, line_number, begin_line, text + content[resume:marker.end()])
+                carried = None
+
+        if begin is not None:
+            start_line, begin_line, start = begin
+            carried = self._carry((start_line, begin_line, "", None), content[start:], line_offset + len(index))
+        elif carried is not None:
+            resume = self._line_start(content, index, carried[3] - line_offset)
+            carried = self._carry(carried, content[resume:], line_offset + len(index))
+        self.carried = carried
+        return blocks
+
+    @staticmethod
+    def _emit(blocks, start_line, end_line, begin_line, block):
+        if KEY_MARKER_REGEX.sub("", block).strip():
+            blocks.append((start_line, end_line, begin_line, block))
+
+    @staticmethod
+    def _line_start(content, index, line_index):
+        """
+        Returns where the zero-based line starts in the chunk, or its end past the last line.
+        """
+        return index.starts[line_index] if line_index < len(index) else len(content)
+
+    @staticmethod
+    def _carry(carried, text, last_line):
+        start_line, begin_line, carried_text, _ = carried
+        text = carried_text + text
+        if len(text) > MAX_KEY_BLOCK_SIZE:
+            return None
+        return start_line, begin_line, text, last_line
@@ -0,0 +1,106 @@
+import hashlib
+import re
+from .entropy import shannon_entropy
+
+DEFAULT_KEYWORD_ENTROPY = 3.0
+DEFAULT_KEYWORD_MIN_LENGTH = 8
+MAX_VALUE_LENGTH = 200
+# Generic rules of regex_secrets.csv that the keyword detector replaces
+KEYWORD_COVERED_RULES = ("password", "password db", "secret", "Generic API Key", "Generic Secret")
+
+# The value assigned after a keyword: `key = value`, `"key": "value"`, `key := value`, `'key' => 'value'`...
+_VALUE = rf"""(?:(?P<quote>["'`])(?P<quoted>[^"'`\r\n]{{1,{MAX_VALUE_LENGTH}}}?)(?P=quote)|(?P<bare>[^\s"'`,;]{{1,{MAX_VALUE_LENGTH}}}))"""
+ASSIGNMENT_REGEX = re.compile(rf"""["'`]?[ \t]*(?:=>|:=|==|=|:)[ \t]*{_VALUE}""")
+# Command line flags such as --password also take their value after a space
+FLAG_ASSIGNMENT_REGEX = re.compile(rf"""["'`]?(?:[ \t]*=[ \t]*|[ \t]+){_VALUE}""")
+DOTTED_NAME_REGEX = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)+")
+PLACEHOLDER_PREFIXES = ("$", "{", "<", "%", "#")
+# Where a keyword may start: not inside a word, except at a camelCase hump (userPassword)
+KEYWORD_START = r"(?:(?<![A-Za-z0-9])|(?-i:(?<=[a-z0-9])(?=[A-Z])))"
+# Separator a "_" of a keyword stands for: api_key also matches api-key, apikey and apiKey
+KEYWORD_SEPARATOR = r"[_-]?"
+
+
+def parse_keywords(text):
+    """
+    Returns the keywords of a key_words.csv file, one per line, lower-cased and without duplicates.
+    """
+    return list(dict.fromkeys(line.strip().lower() for line in text.splitlines() if line.strip()))
+
+
+def trie_pattern(words):
+    """
+    Returns a regex source matching any of the words, built from their trie so
+    that words sharing a prefix share its branch: ["pass", "password", "passphrase"]
+    becomes pass(?:phrase|word)?. Longer words are tried first. Each "_" matches
+    an optional separator (KEYWORD_SEPARATOR).
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def render(node):
+        alternatives = [(KEYWORD_SEPARATOR if char == "_" else re.escape(char)) + render(child)
+                        for char, child in sorted(node.items()) if char]
+        if not alternatives:
+            return ""
+        if len(alternatives) == 1 and "" not in node:
+            return alternatives[0]
+        group = f"(?:{'|'.join(alternatives)})"
+        return group + "?" if "" in node else group
+
+    return render(trie)
+
+
+class KeywordMatcher:
+    """
+    Finds the values assigned to secret-looking keys (password, api_key, --token...).
+
+    The keywords are compiled into one trie-shaped, case-insensitive regex, so
+    each buffer is searched for all of them in a single pass. A keyword must
+    start and end an identifier part (DB_PASSWORD, dbPassword and db-password
+    match, bypass, password_hash and passwordHash do not). Only at a hit
+    is the assignment parsed, and its value is kept when it is at least
+    min_length characters, is not a placeholder, variable or call, and its
+    Shannon entropy reaches entropy_threshold.
+    """
+
+    def __init__(self, keywords, min_length=DEFAULT_KEYWORD_MIN_LENGTH, entropy_threshold=DEFAULT_KEYWORD_ENTROPY):
+        self.keywords = list(keywords)
+        self.min_length = min_length
+        self.entropy_threshold = entropy_threshold
+        self.regex = re.compile(f"{KEYWORD_START}(?:{trie_pattern(self.keywords)})(?![A-Za-z0-9_-])", re.IGNORECASE)
+
+    def value(self, content, keyword_match):
+        """
+        Returns the value assigned right after a keyword hit, or None if there is none worth reporting.
+        """
+        keyword = keyword_match.group()
+        regex = FLAG_ASSIGNMENT_REGEX if keyword.startswith("-") else ASSIGNMENT_REGEX
+        assignment = regex.match(content, keyword_match.end())
+        if not assignment:
+            return None
+        value = assignment.group("quoted") or assignment.group("bare")
+        if len(value) < self.min_length or value.startswith(PLACEHOLDER_PREFIXES):
+            return None
+        if assignment.group("bare") and ("(" in value or DOTTED_NAME_REGEX.fullmatch(value)):
+            return None
+        if shannon_entropy(value) < self.entropy_threshold:
+            return None
+        return value
+
+    def find(self, content):
+        """
+        Yields (offset, keyword, value) for every keyword assigned a secret-looking value.
+        """
+        for keyword_match in self.regex.finditer(content):
+            value = self.value(content, keyword_match)
+            if value is not None:
+                yield keyword_match.start(), keyword_match.group().lower(), value
+
+    def fingerprint(self):
+        digest = hashlib.sha256(self.regex.pattern.encode("utf-8")).hexdigest()
+        return f"{digest}:{self.min_length}:{self.entropy_threshold}"
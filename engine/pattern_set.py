@@ -0,0 +1,339 @@
+import re
+import time
+import hashlib
+from bisect import bisect_right
+from .prefilter import AnchorIndex, extract_anchors, can_backtrack
+
+# Same line boundaries as str.splitlines(), so line numbers stay identical
+LINE_BREAK_REGEX = re.compile(r"\r\n|[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]")
+# Longest line a backtracking rule searches at once, in characters
+DEFAULT_MAX_LINE_LENGTH = 4096
+# Seconds each rule may spend on one file, so a pathological line costs bounded time
+DEFAULT_RULE_TIMEOUT = 1.0
+
+
+class LineIndex:
+    """
+    Newline offset index over a file buffer.
+    """
+
+    def __init__(self, content):
+        self.content = content
+        self.starts = [0]
+        self.ends = []
+        for line_break in LINE_BREAK_REGEX.finditer(content):
+            self.ends.append(line_break.start())
+            self.starts.append(line_break.end())
+        if self.starts[-1] == len(content):
+            self.starts.pop()
+        else:
+            self.ends.append(len(content))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def line_of(self, offset):
+        """
+        Returns the zero-based line number containing the offset.
+        """
+        return bisect_right(self.starts, offset) - 1
+
+    def line(self, line_index):
+        return self.content[self.starts[line_index]:self.ends[line_index]]
+
+
+class RuleTimeout(Exception):
+    """
+    Raised inside a scan when a rule runs out of its time budget for the file.
+    """
+
+
+def _findall_item(regexp, match):
+    """
+    Returns what findall() gives for one match: the match, its only group or all groups.
+    """
+    if regexp.groups == 0:
+        return match.group()
+    if regexp.groups == 1:
+        return match.group(1) or ""
+    return tuple(group or "" for group in match.groups())
+
+
+class PatternSet:
+    """
+    Runs every rule over the whole file buffer once and confirms the hits per line.
+
+    A rule is searched in the buffer from the start of the next unconfirmed line,
+    so each rule costs one pass over the file. Every line that could match is
+    confirmed with findall() on that line alone, which keeps the results identical
+    to matching every rule on every line, except on the long lines cut by the
+    guards below.
+
+    Rules with required literals (anchors) are only run on files where one of
+    their anchors appears; unanchored rules always run.
+
+    Rules sharing the same pattern and flags under different labels are run
+    once; each of their labels is still reported, in rule order. Precomputed
+    anchors (e.g. from the rule cache) can be passed in.
+
+    With `timed` set, the time spent in each rule's regex is added to its
+    stats; a regex shared by several rules is timed under the first of them.
+
+    Two guards bound the cost of a pathological file. Rules that can backtrack
+    (see can_backtrack) only see lines longer than max_line_length through
+    overlapping windows of that length, so one search costs at most a window.
+    This deliberately changes what such a rule reports on those lines: a match is
+    at most a window long, so a greedy match that findall() would return whole can
+    come back as several shorter ones (never overlapping). A window still costs
+    a backtracking rule time quadratic in its length, so each rule also gets
+    rule_timeout seconds per file: a rule over budget is skipped for the rest
+    of the file, counted in its "timeouts" stat and named in `timed_out` until
+    the next scan. None disables either guard.
+    """
+
+    def __init__(self, t_regexp, anchors=None, backtracking=None, max_line_length=DEFAULT_MAX_LINE_LENGTH,
+                 rule_timeout=DEFAULT_RULE_TIMEOUT):
+        self.rules = [(regexp, type_secret) for regexp, type_secret in t_regexp]
+        if anchors is None:
+            anchors = [extract_anchors(regexp) for regexp, _ in self.rules]
+        if backtracking is None:
+            backtracking = [can_backtrack(regexp) for regexp, _ in self.rules]
+        self.anchors = list(anchors)
+        self.backtracking = list(backtracking)
+        self.anchor_index = AnchorIndex(self.anchors)
+        groups = {}
+        for rule_number, (regexp, _) in enumerate(self.rules):
+            groups.setdefault((regexp.pattern, regexp.flags), []).append(rule_number)
+        self.groups = list(groups.values())
+        self.stats = [{"files": 0, "executed": 0, "matched_lines": 0, "seconds": 0.0, "timeouts": 0}
+                      for _ in self.rules]
+        self.timed = False
+        self.max_line_length = max_line_length
+        self.rule_timeout = rule_timeout
+        self.timed_out = []
+
+    def __iter__(self):
+        return iter(self.rules)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def without(self, labels):
+        """
+        Returns a copy of the set without the rules labelled with one of `labels`, keeping the guards.
+        """
+        labels = {label.strip() for label in labels}
+        kept = [rule_number for rule_number, (_, type_secret) in enumerate(self.rules)
+                if type_secret.strip() not in labels]
+        pattern_set = PatternSet([self.rules[rule_number] for rule_number in kept],
+                                 [self.anchors[rule_number] for rule_number in kept],
+                                 [self.backtracking[rule_number] for rule_number in kept],
+                                 self.max_line_length, self.rule_timeout)
+        pattern_set.timed = self.timed
+        return pattern_set
+
+    def _deadline(self, budget):
+        return time.perf_counter() + budget if budget is not None else None
+
+    def candidate_lines(self, regexp, index, deadline=None, start=0, end=None):
+        """
+        Returns the zero-based lines where the rule matches somewhere in the
+        buffer, or between the offsets start and end.
+        """
+        lines = []
+        position = start
+        end = len(index.content) if end is None else end
+        while position < end:
+            if deadline is not None and time.perf_counter() > deadline:
+                raise RuleTimeout()
+            found = regexp.search(index.content, position, end)
+            if not found:
+                break
+            line_index = index.line_of(found.start())
+            lines.append(line_index)
+            if line_index + 1 >= len(index):
+                break
+            position = index.starts[line_index + 1]
+        return lines
+
+    def iter_windowed(self, regexp, text, start, end, deadline=None):
+        """
+        Yields the non-overlapping matches of the rule in text[start:end], searching
+        windows of max_line_length characters that overlap by half. Each window
+        reports the matches starting in its first half, so none is reported twice
+        and their spans are disjoint; a match cannot extend past its window, so a
+        greedy one is split where findall() on the whole line would return one.
+        """
+        length = self.max_line_length
+        step = max(1, length // 2)
+        position = start
+        window = start
+        while window < end:
+            window_end = min(window + length, end)
+            owned_end = end if window_end == end else window + step
+            position = max(position, window)
+            while position < owned_end:
+                if deadline is not None and time.perf_counter() > deadline:
+                    raise RuleTimeout()
+                found = regexp.search(text, position, window_end)
+                if not found or found.start() >= owned_end:
+                    break
+                yield found
+                position = max(found.end(), found.start() + 1)
+            window += step
+
+    def _guarded_candidate_lines(self, regexp, index, long_lines, deadline):
+        """
+        candidate_lines for a backtracking rule: the buffer is searched as usual
+        between long lines, and each long line through windows.
+        """
+        lines = []
+        position = 0
+        for line_index in long_lines:
+            lines.extend(self.candidate_lines(regexp, index, deadline, position, index.starts[line_index]))
+            for _ in self.iter_windowed(regexp, index.content, index.starts[line_index], index.ends[line_index],
+                                        deadline):
+                lines.append(line_index)
+                break
+            position = index.starts[line_index + 1] if line_index + 1 < len(index) else len(index.content)
+        lines.extend(self.candidate_lines(regexp, index, deadline, position))
+        return lines
+
+    def _skip(self, group_number, skipped):
+        skipped.add(group_number)
+        for rule_number in self.groups[group_number]:
+            self.stats[rule_number]["timeouts"] += 1
+            self.timed_out.append(self.rules[rule_number][1].strip())
+
+    def long_lines(self, index):
+        """
+        Returns the zero-based lines longer than max_line_length.
+        """
+        length = self.max_line_length
+        if length is None or len(index.content) <= length:
+            return []
+        return [line_index for line_index, (start, end) in enumerate(zip(index.starts, index.ends))
+                if end - start > length]
+
+    def scan(self, content, index=None):
+        """
+        Yields (line_number, line, hits) in file order, where hits is a list of
+        (regexp, type_secret, matches) in rule order. A LineIndex already built
+        for the content can be passed in.
+        """
+        if index is None:
+            index = LineIndex(content)
+        present = self.anchor_index.present(content)
+        timed = self.timed
+        self.timed_out = []
+        skipped = set()
+        long_lines = None
+        # Unused part of each group's time budget, in seconds
+        budgets = {}
+        hit_groups = {}
+        for group_number, rule_numbers in enumerate(self.groups):
+            anchors = self.anchors[rule_numbers[0]]
+            for rule_number in rule_numbers:
+                self.stats[rule_number]["files"] += 1
+            if anchors is not None and not anchors & present:
+                continue
+            for rule_number in rule_numbers:
+                self.stats[rule_number]["executed"] += 1
+            regexp = self.rules[rule_numbers[0]][0]
+            start = time.perf_counter()
+            deadline = self._deadline(self.rule_timeout)
+            try:
+                if self.backtracking[rule_numbers[0]]:
+                    if long_lines is None:
+                        long_lines = self.long_lines(index)
+                    if long_lines:
+                        lines = self._guarded_candidate_lines(regexp, index, long_lines, deadline)
+                    else:
+                        lines = self.candidate_lines(regexp, index, deadline)
+                else:
+                    lines = self.candidate_lines(regexp, index, deadline)
+            except RuleTimeout:
+                self._skip(group_number, skipped)
+                continue
+            finally:
+                if timed:
+                    self.stats[rule_numbers[0]]["seconds"] += time.perf_counter() - start
+            if self.rule_timeout is not None:
+                budgets[group_number] = deadline - time.perf_counter()
+            for line_index in lines:
+                hit_groups.setdefault(line_index, []).append(group_number)
+
+        for line_index in sorted(hit_groups):
+            line = index.line(line_index)
+            long_line = self.max_line_length is not None and len(line) > self.max_line_length
+            group_matches = {}
+            for group_number in hit_groups[line_index]:
+                if group_number in skipped:
+                    continue
+                rule_numbers = self.groups[group_number]
+                regexp = self.rules[rule_numbers[0]][0]
+                start = time.perf_counter()
+                try:
+                    if long_line and self.backtracking[rule_numbers[0]]:
+                        deadline = self._deadline(budgets.get(group_number))
+                        matches = [_findall_item(regexp, found)
+                                   for found in self.iter_windowed(regexp, line, 0, len(line), deadline)]
+                    else:
+                        matches = regexp.findall(line)
+                except RuleTimeout:
+                    self._skip(group_number, skipped)
+                    continue
+                finally:
+                    elapsed = time.perf_counter() - start
+                    if timed:
+                        self.stats[rule_numbers[0]]["seconds"] += elapsed
+                    if group_number in budgets:
+                        budgets[group_number] -= elapsed
+                for rule_number in rule_numbers:
+                    group_matches[rule_number] = matches
+            hits = []
+            for rule_number in sorted(group_matches):
+                regexp, type_secret = self.rules[rule_number]
+                matches = group_matches[rule_number]
+                if matches:
+                    self.stats[rule_number]["matched_lines"] += 1
+                    hits.append((regexp, type_secret, matches))
+            if hits:
+                yield line_index + 1, line, hits
+
+    def fingerprint(self):
+        """
+        Returns a digest of the rules, their flags, labels and order, and the line length limit.
+        """
+        digest = hashlib.sha256()
+        # The line length limit can change what backtracking rules report
+        digest.update(f"max_line_length={self.max_line_length}\n".encode("utf-8"))
+        for regexp, type_secret in self.rules:
+            digest.update(f"{regexp.pattern}\0{regexp.flags}\0{type_secret.strip()}\n".encode("utf-8"))
+        return digest.hexdigest()
+
+    def reset_stats(self):
+        for stats in self.stats:
+            for key in stats:
+                stats[key] = 0
+
+    def merge_stats(self, other_stats):
+        """
+        Adds the counters collected by another copy of this rule set (e.g. in a worker process).
+        """
+        for stats, other in zip(self.stats, other_stats):
+            for key in stats:
+                stats[key] += other[key]
+
+    def prefilter_report(self):
+        """
+        Returns the per-rule prefilter hit rates as printable lines.
+        """
+        report = [f"{'Rule':<32} {'Anchors':<28} {'Run/Files':>11} {'Rate':>7} {'Lines':>7}"]
+        for (_, type_secret), anchors, stats in zip(self.rules, self.anchors, self.stats):
+            anchors_text = "always" if anchors is None else ", ".join(sorted(anchors))
+            rate = stats["executed"] / stats["files"] * 100 if stats["files"] else 0
+            run_files = f"{stats['executed']}/{stats['files']}"
+            report.append(f"{type_secret.strip()[:32]:<32} {anchors_text[:28]:<28} {run_files:>11} "
+                          f"{rate:>6.1f}% {stats['matched_lines']:>7}")
+        return report
@@ -0,0 +1,38 @@
+import asyncio
+from collections import deque
+
+DEFAULT_MAX_INFLIGHT = 32
+
+
+async def _iterate(items):
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def bounded_map(function, items, max_inflight=DEFAULT_MAX_INFLIGHT):
+    """
+    Runs function(item) for a stream of items with at most max_inflight calls
+    pending at once and yields (item, result) in input order.
+
+    Items are pulled from the (async) iterable only when a slot is free, so
+    discovery, reading and scanning overlap and only max_inflight results are
+    held in memory at any time.
+    """
+    max_inflight = max(1, max_inflight)
+    pending = deque()
+    try:
+        async for item in _iterate(items):
+            pending.append((item, asyncio.ensure_future(function(item))))
+            if len(pending) >= max_inflight:
+                item, task = pending.popleft()
+                yield item, await task
+        while pending:
+            item, task = pending.popleft()
+            yield item, await task
+    finally:
+        for _, task in pending:
+            task.cancel()
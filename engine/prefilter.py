@@ -0,0 +1,143 @@
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+MIN_ANCHOR_LENGTH = 2
+
+# Non-ASCII characters that IGNORECASE matching treats as ASCII letters
+# but str.lower() does not map onto them
+IGNORECASE_FOLDS = str.maketrans({"\u0130": "i", "\u0131": "i", "\u017f": "s"})
+
+
+def _class_literal(items):
+    """
+    Returns the single letter a class like [aA] stands for, otherwise None.
+    """
+    chars = set()
+    for op, av in items:
+        if op is not sre_parse.LITERAL:
+            return None
+        chars.add(chr(av).lower())
+    if len(chars) == 1:
+        return chars.pop()
+    return None
+
+
+def _best(candidates):
+    """
+    Picks the alternative set whose shortest literal is the longest.
+    """
+    candidates = [c for c in candidates if c and min(map(len, c)) >= MIN_ANCHOR_LENGTH]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda c: min(map(len, c)))
+
+
+def _required_literals(parsed):
+    """
+    Returns a set of literals of which at least one appears in every match,
+    or None if the pattern has no usable literal.
+    """
+    candidates = []
+    run = ""
+    for op, av in parsed:
+        if op is sre_parse.LITERAL:
+            run += chr(av).lower()
+            continue
+        if op is sre_parse.IN:
+            letter = _class_literal(av)
+            if letter is not None:
+                run += letter
+                continue
+        if run:
+            candidates.append({run})
+            run = ""
+        if op is sre_parse.SUBPATTERN:
+            candidates.append(_required_literals(av[-1]))
+        elif op is sre_parse.BRANCH:
+            branches = [_required_literals(branch) for branch in av[1]]
+            if all(branches):
+                candidates.append(set().union(*branches))
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] >= 1:
+            candidates.append(_required_literals(av[2]))
+    if run:
+        candidates.append({run})
+    return _best(candidates)
+
+
+def extract_anchors(regexp):
+    """
+    Extracts the lowercase literals a compiled rule needs, one of which must
+    be present in the text for the rule to match. Returns None for unanchored rules.
+    """
+    try:
+        parsed = sre_parse.parse(regexp.pattern, regexp.flags)
+    except Exception:
+        return None
+    anchors = _required_literals(parsed)
+    if not anchors or not all(anchor.isascii() for anchor in anchors):
+        return None
+    # "password" is redundant next to "ass": any text holding it holds "ass" too
+    return frozenset(anchor for anchor in anchors
+                     if not any(other != anchor and other in anchor for other in anchors))
+
+
+def _unbounded_repeat_followed(parsed, followed=False):
+    items = list(parsed)
+    for position, (op, av) in enumerate(items):
+        rest = followed or position + 1 < len(items)
+        if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            if av[1] is sre_parse.MAXREPEAT and rest:
+                return True
+            if _unbounded_repeat_followed(av[2], rest):
+                return True
+        elif op is sre_parse.SUBPATTERN:
+            if _unbounded_repeat_followed(av[-1], rest):
+                return True
+        elif op is sre_parse.BRANCH:
+            if any(_unbounded_repeat_followed(branch, rest) for branch in av[1]):
+                return True
+    return False
+
+
+def can_backtrack(regexp):
+    """
+    Tells whether a compiled rule can backtrack super-linearly: it has an
+    unbounded repeat (like .* or [0-9]+) followed by more pattern, which is
+    retried at every position the repeat could have stopped.
+    """
+    try:
+        parsed = sre_parse.parse(regexp.pattern, regexp.flags)
+    except Exception:
+        return True
+    return _unbounded_repeat_followed(parsed)
+
+
+def fold_case(content):
+    """
+    Lowercases the text the way IGNORECASE rules see it, for anchor lookups.
+    """
+    if content.isascii():
+        return content.lower()
+    return content.translate(IGNORECASE_FOLDS).lower()
+
+
+class AnchorIndex:
+    """
+    Multi-substring index over the anchors of all rules.
+
+    Every distinct anchor is looked up once per file in the lowercased buffer.
+    CPython's substring search runs in C, which is far faster here than walking
+    an Aho-Corasick automaton in pure Python.
+    """
+
+    def __init__(self, anchor_sets):
+        self.anchors = sorted({anchor for anchors in anchor_sets if anchors for anchor in anchors})
+
+    def present(self, content):
+        """
+        Returns the set of anchors that appear in the content.
+        """
+        folded = fold_case(content)
+        return {anchor for anchor in self.anchors if anchor in folded}
@@ -0,0 +1,137 @@
+import json
+import threading
+import time
+
+DEFAULT_PROFILE_PATH = "scan_profile.json"
+
+
+class _Stage:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _DisabledStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_DISABLED_STAGE = _DisabledStage()
+
+
+class Profiler:
+    """
+    Wall time and call counts per pipeline stage, plus the per-rule timings of a PatternSet.
+
+    Code is instrumented with `with profiler.stage(name):` blocks. Stages run
+    concurrently (reads overlap scans, the walk runs in a thread), so their sum
+    can exceed the wall time of the run. A disabled profiler hands out one shared
+    no-op context manager, so instrumented code costs next to nothing.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.stages = {}
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+
+    def __bool__(self):
+        return self.enabled
+
+    def __getstate__(self):
+        # Sent to worker processes without the lock and with no timings yet
+        return {"enabled": self.enabled}
+
+    def __setstate__(self, state):
+        self.__init__(state["enabled"])
+
+    def stage(self, name):
+        """
+        Returns a context manager adding its wall time and one call to the stage.
+        """
+        if not self.enabled:
+            return _DISABLED_STAGE
+        return _Stage(self, name)
+
+    def add(self, name, seconds, calls=1):
+        with self.lock:
+            stats = self.stages.get(name)
+            if stats is None:
+                stats = self.stages[name] = {"calls": 0, "seconds": 0.0}
+            stats["calls"] += calls
+            stats["seconds"] += seconds
+
+    def take(self):
+        """
+        Returns the stage timings collected so far and starts over, e.g. once per file in a worker process.
+        """
+        with self.lock:
+            stages, self.stages = self.stages, {}
+        return stages
+
+    def merge(self, stages):
+        """
+        Adds stage timings collected by another profiler.
+        """
+        for name, stats in stages.items():
+            self.add(name, stats["seconds"], stats["calls"])
+
+    def report(self, pattern_set=None):
+        """
+        Returns the profile as a JSON-serializable dict. Rules are listed slowest
+        first; rules sharing a regex are timed once, under the first of them.
+        """
+        wall = time.perf_counter() - self.started
+        report = {
+            "wall_seconds": round(wall, 6),
+            "stages": {name: {"calls": stats["calls"], "seconds": round(stats["seconds"], 6)}
+                       for name, stats in sorted(self.stages.items(), key=lambda item: -item[1]["seconds"])},
+            "rules": [],
+        }
+        if pattern_set is not None:
+            rules = [{"rule": type_secret.strip(), "pattern": regexp.pattern, "seconds": round(stats["seconds"], 6),
+                      "files": stats["files"], "executed": stats["executed"], "matched_lines": stats["matched_lines"],
+                      "timeouts": stats["timeouts"]}
+                     for (regexp, type_secret), stats in zip(pattern_set.rules, pattern_set.stats)]
+            report["rules"] = sorted(rules, key=lambda rule: -rule["seconds"])
+        return report
+
+    @staticmethod
+    def summary(report, max_rules=15):
+        """
+        Returns a profile report as printable table lines.
+        """
+        wall = report["wall_seconds"]
+        lines = [f"{'Stage':<24} {'Calls':>9} {'Seconds':>10} {'Of wall':>8}"]
+        for name, stats in report["stages"].items():
+            share = stats["seconds"] / wall * 100 if wall else 0
+            lines.append(f"{name:<24} {stats['calls']:>9} {stats['seconds']:>10.3f} {share:>7.1f}%")
+        lines.append(f"{'wall':<24} {'':>9} {wall:>10.3f}")
+        if report["rules"]:
+            lines.append("")
+            lines.append(f"{'Rule':<32} {'Seconds':>10} {'Run/Files':>11} {'Lines':>7} {'Timeouts':>8}")
+            for rule in report["rules"][:max_rules]:
+                run_files = f"{rule['executed']}/{rule['files']}"
+                lines.append(f"{rule['rule'][:32]:<32} {rule['seconds']:>10.4f} {run_files:>11} "
+                             f"{rule['matched_lines']:>7} {rule['timeouts']:>8}")
+        return lines
+
+    @staticmethod
+    def save(report, path=DEFAULT_PROFILE_PATH):
+        with open(path, "w", encoding="UTF-8") as f:
+            json.dump(report, f, indent=4)
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import re
+from .pattern_set import PatternSet
+from .prefilter import extract_anchors, can_backtrack
+
+DEFAULT_RULES_CACHE_PATH = ".secret_scan_rules.json"
+# Bump when the parsing, validation or anchor extraction changes
+RULES_CACHE_VERSION = 2
+RULES_CACHE_MAX_ENTRIES = 16
+RULE_FLAGS = re.IGNORECASE
+
+
+class RuleError(ValueError):
+    """
+    Raised for a rule file line that cannot be used as a rule.
+    """
+
+
+def parse_rules(text, path="<rules>"):
+    """
+    Parses "<regex>, <label>" lines into validated (pattern, label) pairs.
+
+    Blank lines are skipped and exact duplicate lines are kept once. A line
+    without a label, a regex that does not compile, or one that matches the
+    empty string raises RuleError naming the line.
+    """
+    rules = []
+    seen = set()
+    for line_number, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        if ", " not in line:
+            raise RuleError(f"{path}:{line_number}: expected '<regex>, <label>'")
+        pattern, label = line.rsplit(", ", 1)
+        pattern, label = pattern.strip(), label.strip()
+        if not pattern or not label:
+            raise RuleError(f"{path}:{line_number}: expected '<regex>, <label>'")
+        try:
+            regexp = re.compile(pattern, RULE_FLAGS)
+        except re.error as e:
+            raise RuleError(f"{path}:{line_number}: invalid regex {pattern!r}: {e}") from None
+        if regexp.search("") is not None:
+            raise RuleError(f"{path}:{line_number}: regex {pattern!r} matches an empty string")
+        if (pattern, label) not in seen:
+            seen.add((pattern, label))
+            rules.append((pattern, label))
+    return rules
+
+
+def _read_cache(cache_path):
+    try:
+        with open(cache_path, "r", encoding="UTF-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get("version") != RULES_CACHE_VERSION:
+        return {}
+    return cache.get("rule_sets", {})
+
+
+def _write_cache(cache_path, rule_sets):
+    # Keep the most recently written rule sets only
+    rule_sets = dict(list(rule_sets.items())[-RULES_CACHE_MAX_ENTRIES:])
+    temporary_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary_path, "w", encoding="UTF-8") as f:
+            json.dump({"version": RULES_CACHE_VERSION, "rule_sets": rule_sets}, f)
+        os.replace(temporary_path, cache_path)
+    except OSError:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+def load_rules(path, cache_path=DEFAULT_RULES_CACHE_PATH):
+    """
+    Loads a rule file into a PatternSet.
+
+    Rules are parsed and validated by parse_rules. Rules sharing a pattern are
+    compiled once and run once per line by the PatternSet. The parsed rules and
+    their prefilter anchors are cached in cache_path under the SHA-256 of the
+    rule file together with whether each rule can backtrack, so an unchanged
+    file is not parsed, validated or analysed again.
+    Pass cache_path=None to disable the cache.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    rule_sets = _read_cache(cache_path) if cache_path else {}
+    cached = rule_sets.get(digest)
+
+    compiled = {}
+    if cached is not None:
+        rules = [(pattern, label) for pattern, label in cached["rules"]]
+        anchors = [frozenset(anchor_set) if anchor_set is not None else None for anchor_set in cached["anchors"]]
+        backtracking = cached["backtracking"]
+        for pattern, _ in rules:
+            if pattern not in compiled:
+                compiled[pattern] = re.compile(pattern, RULE_FLAGS)
+    else:
+        rules = parse_rules(data.decode("UTF-8"), path)
+        anchors = []
+        backtracking = []
+        for pattern, _ in rules:
+            if pattern not in compiled:
+                compiled[pattern] = re.compile(pattern, RULE_FLAGS)
+            anchors.append(extract_anchors(compiled[pattern]))
+            backtracking.append(can_backtrack(compiled[pattern]))
+        if cache_path:
+            rule_sets.pop(digest, None)
+            rule_sets[digest] = {
+                "rules": rules,
+                "anchors": [sorted(anchor_set) if anchor_set is not None else None for anchor_set in anchors],
+                "backtracking": backtracking,
+            }
+            _write_cache(cache_path, rule_sets)
+    return PatternSet([(compiled[pattern], label) for pattern, label in rules], anchors, backtracking)
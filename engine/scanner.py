@@ -0,0 +1,209 @@
+import hashlib
+from .pattern_set import LineIndex
+from .entropy import score_tokens, max_window_entropy
+from .keys import KeyBlockTracker
+from .profiler import Profiler
+
+DEFAULT_ENTROPY_THRESHOLD = 4.5
+DEFAULT_MIN_LENGTH = 25
+DETECTORS = ("regex", "entropy", "keywords")
+KEYS_RULE = "KEYS"
+KEYWORD_RULE = "keyword"
+
+
+class Finding:
+    """
+    One detector hit on one line; the result model shared by all detectors.
+
+    `matches` are the secrets found on the line and `rule` is the compiled
+    regex that found them, or None for detectors without rules. A finding
+    spanning several lines starts on line_number and ends on end_line.
+    """
+
+    __slots__ = ("detector", "line_number", "line", "type_secret", "matches", "rule", "end_line")
+
+    def __init__(self, detector, line_number, line, type_secret, matches, rule=None, end_line=None):
+        self.detector = detector
+        self.line_number = line_number
+        self.line = line
+        self.type_secret = type_secret
+        self.matches = matches
+        self.rule = rule
+        self.end_line = end_line if end_line is not None else line_number
+
+    def __repr__(self):
+        return f"Finding({self.detector!r}, {self.line_number}, {self.type_secret!r}, {self.matches!r})"
+
+
+class ScanBuffer:
+    """
+    The text of one file, with its line index and lines built once on first use.
+
+    For a file scanned in chunks, line_offset is the number of lines before the
+    chunk and `state` is shared by all chunks of the file, for detectors that
+    follow text across lines.
+    """
+
+    def __init__(self, content, line_offset=0, state=None):
+        self.content = content
+        self.line_offset = line_offset
+        self.state = state if state is not None else {}
+        self._index = None
+        self._lines = None
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = LineIndex(self.content)
+        return self._index
+
+    @property
+    def lines(self):
+        if self._lines is None:
+            self._lines = [self.index.line(line_index) for line_index in range(len(self.index))]
+        return self._lines
+
+
+class RegexDetector:
+    """
+    Runs the rules of a PatternSet over the buffer.
+    """
+
+    name = "regex"
+
+    def __init__(self, pattern_set):
+        self.pattern_set = pattern_set
+
+    def detect(self, buffer):
+        for line_number, line, hits in self.pattern_set.scan(buffer.content, buffer.index):
+            for regexp, type_secret, matches in hits:
+                yield Finding(self.name, line_number, line, type_secret, matches, regexp)
+
+    def fingerprint(self):
+        return f"regex:{self.pattern_set.fingerprint()}"
+
+
+class PrivateKeyDetector:
+    """
+    Reports each PEM private key block once, from its BEGIN to its END line.
+
+    The BEGIN/END markers are found in one pass (see KeyBlockTracker), so the
+    cost is linear in the file size however many keys it holds, and a block
+    cut by a chunk boundary is completed from the next chunk.
+    """
+
+    name = "keys"
+
+    def detect(self, buffer):
+        tracker = buffer.state.get(self.name)
+        if tracker is None:
+            tracker = buffer.state[self.name] = KeyBlockTracker()
+        offset = buffer.line_offset
+        for start_line, end_line, begin_line, block in tracker.feed(buffer.content, buffer.index, offset):
+            yield Finding(self.name, start_line - offset, begin_line, KEYS_RULE, [block], end_line=end_line - offset)
+
+    def fingerprint(self):
+        return "keys:1"
+
+
+class EntropyDetector:
+    """
+    Reports whitespace separated words whose Shannon entropy is above the threshold.
+
+    All candidate words of the buffer are scored in one batch. With a window,
+    words that fail the check as a whole are also searched for their most
+    random window, which catches secrets embedded in longer strings.
+    """
+
+    name = "entropy"
+
+    def __init__(self, threshold=DEFAULT_ENTROPY_THRESHOLD, min_length=DEFAULT_MIN_LENGTH, window=0):
+        self.threshold = threshold
+        self.min_length = min_length
+        self.window = window
+
+    def detect(self, buffer):
+        candidates = [(line_number, word) for line_number, line in enumerate(buffer.lines, start=1)
+                      for word in line.split() if len(word) >= self.min_length]
+        found = {}
+        for (line_number, word), entropy in zip(candidates, score_tokens([word for _, word in candidates])):
+            if entropy > self.threshold:
+                found.setdefault(line_number, []).append(word)
+            elif self.window and len(word) > self.window:
+                start, entropy = max_window_entropy(word, self.window)
+                if entropy > self.threshold:
+                    found.setdefault(line_number, []).append(word[start:start + self.window])
+        for line_number, words in found.items():
+            yield Finding(self.name, line_number, buffer.lines[line_number - 1], "entropy", words)
+
+    def fingerprint(self):
+        return f"entropy:{self.threshold}:{self.min_length}:{self.window}"
+
+
+class KeywordDetector:
+    """
+    Reports the values assigned to the keywords of key_words.csv (see KeywordMatcher).
+
+    The keywords are searched in one pass over the buffer; values are only
+    extracted and scored at the hits, so this replaces the unanchored generic
+    rules (KEYWORD_COVERED_RULES) of the regex detector.
+    """
+
+    name = "keywords"
+
+    def __init__(self, matcher):
+        self.matcher = matcher
+
+    def detect(self, buffer):
+        found = {}
+        for offset, _, value in self.matcher.find(buffer.content):
+            found.setdefault(buffer.index.line_of(offset), []).append(value)
+        for line_index, values in found.items():
+            yield Finding(self.name, line_index + 1, buffer.lines[line_index], KEYWORD_RULE, values)
+
+    def fingerprint(self):
+        return f"keywords:{self.matcher.fingerprint()}"
+
+
+class Scanner:
+    """
+    Reads a file buffer once and runs every enabled detector over it.
+
+    Detectors share the buffer, its line index and its split lines, and
+    return Finding objects; findings are grouped by detector, in the order
+    the detectors were given. Each detector is timed as a profiler stage
+    named after it.
+    """
+
+    def __init__(self, detectors, profiler=None):
+        self.detectors = list(detectors)
+        self.profiler = profiler if profiler is not None else Profiler(enabled=False)
+
+    @property
+    def pattern_set(self):
+        """
+        The rule set of the regex detector, or None when regex detection is disabled.
+        """
+        for detector in self.detectors:
+            if isinstance(detector, RegexDetector):
+                return detector.pattern_set
+        return None
+
+    def scan(self, content, line_offset=0, state=None):
+        """
+        Returns the findings of every detector, numbering lines from the start of
+        the content. A file scanned in chunks passes the lines before each chunk
+        and the same `state` dict with every chunk.
+        """
+        buffer = ScanBuffer(content, line_offset, state)
+        findings = []
+        for detector in self.detectors:
+            with self.profiler.stage(detector.name):
+                findings.extend(detector.detect(buffer))
+        return findings
+
+    def fingerprint(self):
+        digest = hashlib.sha256()
+        for detector in self.detectors:
+            digest.update(f"{detector.fingerprint()}\n".encode("utf-8"))
+        return digest.hexdigest()
@@ -0,0 +1,195 @@
+import asyncio
+import os
+import queue
+import threading
+from .file_matcher import as_file_matcher, relative_path
+from .profiler import Profiler
+
+DEFAULT_WALK_WORKERS = 1
+# Dependency, VCS and build output directories that are not worth scanning
+DEFAULT_PRUNE_DIRS = frozenset({
+    ".git", ".hg", ".svn", "node_modules", "bower_components", "vendor", "__pycache__",
+    ".venv", "venv", ".tox", ".mypy_cache", ".pytest_cache", "dist", "build", "target",
+})
+SNIFF_SIZE = 8192
+
+
+def is_binary(path, sniff_size=SNIFF_SIZE):
+    """
+    Tells whether the file looks binary: a NUL byte in its first sniff_size bytes.
+    """
+    try:
+        with open(path, "rb") as f:
+            return b"\0" in f.read(sniff_size)
+    except OSError:
+        return False
+
+
+class DirectoryWalker:
+    """
+    os.scandir based discovery of the files to scan.
+
+    Directories named in prune_dirs or excluded by the file matcher are never
+    entered. Symlinked directories are skipped unless follow_symlinks is set,
+    in which case every directory is entered once by (device, inode), which
+    also breaks symlink loops. Name, exclude and size checks use the scandir
+    entries, and binary files are sniffed and dropped, all in the walking threads.
+
+    With one worker the walk is depth-first in os.walk order. With more, worker
+    threads take directories from a shared queue and the order varies. Each
+    directory listing is timed as the profiler's "discovery" stage.
+    """
+
+    def __init__(self, files_pattern, workers=DEFAULT_WALK_WORKERS, prune_dirs=DEFAULT_PRUNE_DIRS,
+                 follow_symlinks=False, skip_binary=True, profiler=None):
+        self.matcher = as_file_matcher(files_pattern)
+        self.workers = max(1, workers)
+        self.prune_dirs = frozenset(prune_dirs)
+        self.follow_symlinks = follow_symlinks
+        self.skip_binary = skip_binary
+        self.profiler = profiler if profiler is not None else Profiler(enabled=False)
+        self.visited = set()
+        self.lock = threading.Lock()
+        self.directories = 0
+        self.skipped_binary = 0
+
+    def _first_visit(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        with self.lock:
+            key = (stat.st_dev, stat.st_ino)
+            if key in self.visited:
+                return False
+            self.visited.add(key)
+            return True
+
+    def _scan_directory(self, root, directory):
+        """
+        Returns (files, subdirectories) of one directory, in listing order.
+        """
+        with self.profiler.stage("discovery"):
+            return self._list_directory(root, directory)
+
+    def _list_directory(self, root, directory):
+        files, subdirectories = [], []
+        excludes = self.matcher.excludes
+        try:
+            with os.scandir(directory) as entries:
+                entries = list(entries)
+        except OSError:
+            return files, subdirectories
+        with self.lock:
+            self.directories += 1
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    if entry.name in self.prune_dirs:
+                        continue
+                    if entry.is_symlink() and not self.follow_symlinks:
+                        continue
+                    if excludes and excludes.matches(relative_path(entry.path, root), is_dir=True):
+                        continue
+                    if self.follow_symlinks and not self._first_visit(entry.path):
+                        continue
+                    subdirectories.append(entry.path)
+                elif entry.is_file() and self.matcher.matches_name(entry.name):
+                    if excludes and excludes.matches(relative_path(entry.path, root)):
+                        continue
+                    if self.matcher.max_file_size is not None and self.matcher.too_large(entry.stat().st_size):
+                        continue
+                    if self.skip_binary and is_binary(entry.path):
+                        with self.lock:
+                            self.skipped_binary += 1
+                        continue
+                    files.append(entry.path)
+            except OSError:
+                continue
+        return files, subdirectories
+
+    def iter_batches(self, directory):
+        """
+        Yields the accepted files directory by directory, as lists.
+        """
+        if self.follow_symlinks:
+            self._first_visit(directory)
+        if self.workers == 1:
+            stack = [directory]
+            while stack:
+                files, subdirectories = self._scan_directory(directory, stack.pop())
+                if files:
+                    yield files
+                stack.extend(reversed(subdirectories))
+            return
+        yield from self._iter_batches_parallel(directory)
+
+    def _iter_batches_parallel(self, directory):
+        directories = queue.LifoQueue()
+        results = queue.Queue()
+        stopped = threading.Event()
+        pending = [1]
+        directories.put(directory)
+
+        def work():
+            while not stopped.is_set():
+                current = directories.get()
+                if current is None:
+                    return
+                files, subdirectories = self._scan_directory(directory, current)
+                # Files go out before the directory counts as done, so the
+                # end marker always comes after every batch
+                if files:
+                    results.put(files)
+                with self.lock:
+                    pending[0] += len(subdirectories) - 1
+                    finished = pending[0] == 0
+                for subdirectory in subdirectories:
+                    directories.put(subdirectory)
+                if finished:
+                    results.put(None)
+
+        threads = [threading.Thread(target=work, daemon=True) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                batch = results.get()
+                if batch is None:
+                    break
+                yield batch
+        finally:
+            stopped.set()
+            for _ in threads:
+                directories.put(None)
+
+    def walk(self, directory):
+        """
+        Yields the accepted file paths under directory.
+        """
+        for batch in self.iter_batches(directory):
+            yield from batch
+
+    async def awalk(self, directory):
+        """
+        Yields the accepted file paths while the walk runs in a background thread,
+        so scanning starts with the first directory and never blocks on the walk.
+        """
+        loop = asyncio.get_running_loop()
+        batches = self.iter_batches(directory)
+        try:
+            while True:
+                batch = await loop.run_in_executor(None, next, batches, None)
+                if batch is None:
+                    break
+                for path in batch:
+                    yield path
+        finally:
+            try:
+                batches.close()
+            except ValueError:
+                # Cancelled while a thread is still inside next(); its walk ends on its own
+                pass
+
+    def report(self):
+        return f"Walked {self.directories} directories, skipped {self.skipped_binary} binary files"
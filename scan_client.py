@@ -0,0 +1,131 @@
+import os
+import sys
+import json
+import errno
+import socket
+import argparse
+import tempfile
+
+# Only the standard library is imported here, so a client call starts in milliseconds;
+# scan_daemon.py keeps the rules, caches and validators loaded
+DEFAULT_PORT = 8733
+DEFAULT_TIMEOUT = 60
+# The per-user runtime directory, or a directory of this user in the shared temporary one;
+# either way only its owner can create the socket and the token in it
+RUNTIME_DIR = os.environ.get("XDG_RUNTIME_DIR") or os.path.join(
+    tempfile.gettempdir(), f"secret_scan-{os.getuid()}" if hasattr(os, "getuid") else "secret_scan")
+DEFAULT_SOCKET_PATH = os.path.join(RUNTIME_DIR, "secret_scan.sock")
+# Shared secret a daemon listening on a port writes here, readable only by its owner
+DEFAULT_TOKEN_PATH = os.path.join(RUNTIME_DIR, "secret_scan.token")
+# Largest request or response line, e.g. a buffer sent from an editor
+MAX_MESSAGE_SIZE = 64 * 1024 * 1024
+
+
+def check_private(path):
+    """
+    Raising PermissionError unless the socket, token or directory belongs to this user and
+    no one else can use it: another user could have created it to read what is sent.
+    """
+    if not hasattr(os, "getuid"):
+        return
+    stat = os.lstat(path)
+    if stat.st_uid != os.getuid() or stat.st_mode & 0o077:
+        raise PermissionError(errno.EACCES, "Not private to this user", path)
+
+
+def private_directory(path):
+    """Creating the directory only its owner can use, or checking the existing one"""
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    check_private(path)
+
+
+def connect(socket_path=DEFAULT_SOCKET_PATH, port=None, timeout=DEFAULT_TIMEOUT):
+    """Connecting to the daemon on its Unix socket, or on localhost:port"""
+    if port:
+        return socket.create_connection(("127.0.0.1", port), timeout)
+    check_private(socket_path)
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.settimeout(timeout)
+    connection.connect(socket_path)
+    return connection
+
+
+def read_token(token_path=DEFAULT_TOKEN_PATH):
+    """Reading the token a daemon listening on a port expects in every request"""
+    check_private(token_path)
+    with open(token_path, "r", encoding="UTF-8") as f:
+        return f.read().strip()
+
+
+def request(message, socket_path=DEFAULT_SOCKET_PATH, port=None, timeout=DEFAULT_TIMEOUT,
+            token_path=DEFAULT_TOKEN_PATH):
+    """Sending one JSON request line to the daemon and returning its JSON response"""
+    if port:
+        message = {**message, "token": read_token(token_path)}
+    with connect(socket_path, port, timeout) as connection:
+        connection.sendall(json.dumps(message).encode("utf-8") + b"\n")
+        with connection.makefile("rb") as response:
+            line = response.readline(MAX_MESSAGE_SIZE)
+    if not line:
+        raise ConnectionError("the daemon closed the connection")
+    return json.loads(line)
+
+
+def parse_arguments():
+    """Function for processing command-line arguments"""
+    parser = argparse.ArgumentParser(description="Client of scan_daemon.py")
+    parser.add_argument("paths", nargs="*",
+                        help="Files or directories to scan; - reads a buffer from stdin (optional)")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH,
+                        help=f"Unix socket of the daemon (default {DEFAULT_SOCKET_PATH}) (optional)")
+    parser.add_argument("--port", type=int,
+                        help="Connect to the daemon on this localhost port instead of the Unix socket (optional)")
+    parser.add_argument("--token-file", default=DEFAULT_TOKEN_PATH,
+                        help=f"Token of a daemon listening on a port (default {DEFAULT_TOKEN_PATH}) (optional)")
+    parser.add_argument("--stdin-path", default="<stdin>",
+                        help="Path reported for the buffer read from stdin (optional)")
+    parser.add_argument("--format", choices=("text", "jsonl", "sarif"), default="text",
+                        help="Report format (optional)")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help="Seconds to wait for the daemon (optional)")
+    parser.add_argument("--reload", action="store_true",
+                        help="Make the daemon reload the rule files now (optional)")
+    parser.add_argument("--stop", action="store_true",
+                        help="Stop the daemon (optional)")
+    return parser.parse_args()
+
+
+def main():
+    """Main function; exits with 1 when secrets are found or the daemon fails"""
+    args = parse_arguments()
+    if args.stop:
+        message = {"command": "stop"}
+    elif args.reload:
+        message = {"command": "reload"}
+    else:
+        message = {"command": "scan", "format": args.format, "paths": [], "buffers": []}
+        for path in args.paths:
+            if path == "-":
+                message["buffers"].append({"path": args.stdin_path, "content": sys.stdin.read()})
+            else:
+                message["paths"].append(os.path.abspath(path))
+    try:
+        response = request(message, args.socket, args.port, args.timeout, args.token_file)
+    except (OSError, ValueError) as e:
+        print(f"[-] Cannot reach the scan daemon: {e}", file=sys.stderr)
+        exit(1)
+    for error in response.get("errors", []):
+        print(f"[-] {error}", file=sys.stderr)
+    if response.get("output"):
+        sys.stdout.write(response["output"])
+    if response.get("message"):
+        print(response["message"], file=sys.stderr)
+    if response.get("found") or response.get("errors"):
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,104 +1,53 @@
 import os
 import re
 from colored import fg, attr
-import aiohttp
 import argparse
 import asyncio
+import subprocess
 import aiofiles
-from validators import SecretValidator as sv
+from bisect import bisect_right
+from itertools import accumulate
+from datetime import datetime, timezone
+import detect_secrets
+from engine import (load_rules, RuleError, FileMatcher, ScanCache, GitHubClient, GitHubError, CommitCheckpoints,
+                    LineIndex, bounded_map, added_lines, iter_history_blobs, iter_diff_additions,
+                    DEFAULT_MAX_BLOB_SIZE, DEFAULT_CACHE_PATH, DEFAULT_CHECKPOINT_PATH, DEFAULT_MAX_CONNECTIONS,
+                    DEFAULT_REQUESTS_PER_SECOND, GITHUB_API_URL)
+from detect_secrets import (find_secrets, find_secret_records, render_records, try_login, valid_secret, as_scanner,
+                            add_validation_arguments, configure_validation)
 
+DEFAULT_COMMIT_CONCURRENCY = 8
+
+
+async def find_message_secrets(t_regexp, commit, verbose=False):
+    """Search secrets in one commit message"""
+    output = ""
+    highlighted_line = commit
+    # Rules sharing a pattern under several labels are matched once
+    pattern_matches = {}
+    for regexp, type_secret in t_regexp:
+        if regexp not in pattern_matches:
+            pattern_matches[regexp] = re.findall(regexp, commit)
+        matches = pattern_matches[regexp]
+        if matches:
+            for match in matches:
+                if await valid_secret(match):
+                    if verbose:
+                        print(f"Secrets found in {commit}")
+                        verbose=False
+                    try_log = await try_login(match, type_secret.strip())
+                    highlighted_match = f"{fg('light_green')}{match}{attr(0)}"
+                    highlighted_line = highlighted_line.replace(match, highlighted_match) 
+                    output += f"\nSecrets found in commit: {commit}\n"
+                    output += highlighted_line + " " + try_log + "\n" 
+    return output
 
-async def get_commits(repo, token, verbose=False):
-    """Gets commits from a GitHub repository using GitHub API asynchronously"""
-    url = f"https://api.github.com/repos/{repo}/commits"
-    headers = {
-        'Authorization': f'token {token}'
-    } if token else {}
-    if verbose:
-        print(f"Fetching commits from {repo}...")
-
-    async with aiohttp.ClientSession(headers=headers) as session:
-        async with session.get(url) as response:
-            if response.status == 200:
-                if verbose:
-                    print(f"Successfully fetched commits.")
-                commits_list = []
-                commits = await response.json()
-                for commit in commits:
-                    commits_list.append(commit['commit']['message'])
-                return commits_list
-            else:
-                print(f"Error fetching commits: {response.status}")
-                return None
-    
-AWS_SECRET_REGEX = r"(?i)(AKIA[0-9A-Z]{16}):([A-Za-z0-9/+=]{40})"
-aws_secret = ":"
-       
-async def try_login(secret, type_secret):
-    global aws_secret
-    
-    if type_secret == "aws":
-        access_key, secret_key = secret.split(":")
-        return sv.validate_aws_keys(access_key, secret_key)
-    elif type_secret == "AWS Access Key ID":
-        aws_secret = secret + aws_secret
-        if re.search(AWS_SECRET_REGEX, aws_secret):
-            tr_log = await try_login(aws_secret, "aws")
-            aws_secret = ":"
-            return tr_log
-        return ""  
-    elif type_secret == "AWS Secret Access Keys":
-        aws_secret = aws_secret + secret
-        if re.search(AWS_SECRET_REGEX, aws_secret):
-            tr_log = await try_login(aws_secret, "aws")
-            aws_secret = ":"
-            return tr_log
-        return ""
-    elif type_secret == "github":
-        return sv.validate_github_token(secret)
-    elif type_secret == "Google API Key":
-        return sv.validate_google_api_key(secret)
-    elif type_secret == "URI-secret":
-        return sv.validate_uri_with_credentials(secret)
-    elif type_secret == "slack":
-        return sv.validate_slack_token(secret)
-    else:
-        return type_secret
-            
-async def valid_secret(secret):
-    """
-    Function to check the secret
-    """
-    clean_secret = re.sub(r"-----BEGIN [A-Z ]+-----|-----END [A-Z ]+-----", "", secret)
-    pattern = rf"(.)\1{{{4-1},}}"
-    if bool(re.search(pattern, clean_secret.upper())):
-        return False
-    test_patterns = ["EXAMPLE", "TEST", "FAKE", "DUMMY", "12345",
-                     "ABCDF", "A1B2C3D4" "FAKEKEY", "SECRET", "SAMPLE", "ACCESS"]
-    for pattern in test_patterns:
-        if pattern in secret.upper():
-            return False
-    return True
-    
 async def find_commit_secrets(t_regexp, commits, verbose=False):
     """Search secrets in commit messages"""
     output = ""
     try:
         for commit in commits:
-            highlighted_line = commit
-            for regexp, type_secret in t_regexp:
-                matches = re.findall(regexp, commit)
-                if matches:
-                    for match in matches:
-                        if await valid_secret(match):
-                            if verbose:
-                                print(f"Secrets found in {commit}")
-                                verbose=False
-                            try_log = await try_login(match, type_secret.strip())
-                            highlighted_match = f"{fg('light_green')}{match}{attr(0)}"
-                            highlighted_line = highlighted_line.replace(match, highlighted_match) 
-                            output += f"\nSecrets found in commit: {commit}\n"
-                            output += highlighted_line + " " + try_log + "\n" 
+            output += await find_message_secrets(t_regexp, commit, verbose)
         if not output:
             print(f"[+] No secrets found in commits")
 
@@ -107,39 +56,263 @@ async def find_commit_secrets(t_regexp, commits, verbose=False):
         print(f"{fg('red')}{error_message}{attr(0)}")
     return output
 
+async def find_diff_secrets(t_regexp, commit, files_pattern, verbose=False):
+    """Search secrets in the lines a commit adds to the matching files; returns one report per file"""
+    output = []
+    for changed_file in commit.get("files", []):
+        path = changed_file["filename"]
+        # Binary files and very large diffs come without a patch
+        patch = changed_file.get("patch")
+        if not patch or not files_pattern.accepts(path):
+            continue
+        lines = added_lines(patch)
+        if not lines:
+            continue
+        location = f"{path} (commit {commit['sha'][:12]})"
+        records = await find_added_line_records(t_regexp, lines, location, verbose)
+        if records:
+            output.append(render_records(location, records))
+    return output
+
+async def find_added_line_records(t_regexp, lines, location, verbose=False):
+    """Search secrets in the (line_number, text) lines a diff adds to one file, numbered as in the new file"""
+    content = "\n".join(text for _, text in lines)
+    records = await find_secret_records(t_regexp, content, location, verbose)
+    # The added lines were scanned as one buffer, which also breaks lines at the form feeds and other
+    # separators git keeps inside a line; map each buffer line back to the added line it starts in
+    index = LineIndex(content)
+    starts = list(accumulate((len(text) + 1 for _, text in lines[:-1]), initial=0))
+    for record in records:
+        record.line = lines[bisect_right(starts, index.starts[record.line - 1]) - 1][0]
+        record.end_line = lines[bisect_right(starts, index.starts[record.end_line - 1]) - 1][0]
+    return records
+
+async def find_local_diff_secrets(t_regexp, repo_path, files_pattern, revisions=None, verbose=False):
+    """
+    Search secrets in the lines a local diff adds: the staged changes, or a revision range such as main..HEAD.
+    Only the added lines are scanned, so the cost follows the size of the change, not of the tree.
+    """
+    output = []
+    scanned = 0
+    for path, lines in iter_diff_additions(repo_path, files_pattern, revisions):
+        scanned += 1
+        location = f"{path} ({revisions or 'staged'})"
+        records = await find_added_line_records(t_regexp, lines, location, verbose)
+        if records:
+            output.append(render_records(location, records))
+    if verbose:
+        print(f"Scanned the added lines of {scanned} files in {repo_path}")
+    return output
+
+async def find_github_commit_secrets(t_regexp, repo, client, files_pattern, since=None, until=None,
+                                     checkpoints=None, concurrency=DEFAULT_COMMIT_CONCURRENCY, verbose=False):
+    """
+    Search secrets in the messages and added lines of every commit of a GitHub repository.
+
+    Commits are listed 100 per page and their diffs are fetched `concurrency` at
+    a time over the client's shared session. Yields the report of each commit,
+    newest first. With checkpoints, only commits newer than the last scanned one
+    are listed, and the newest commit becomes the checkpoint once every commit
+    has been scanned; runs limited by `since` or `until` leave the checkpoint
+    alone, since they skip commits the next run would then take as scanned.
+    """
+    key = f"{client.api_url}/{repo}"
+    stop_at = checkpoints.get(key) if checkpoints is not None else None
+    if verbose:
+        print(f"Fetching commits from {repo}" + (f" after {stop_at[:12]}..." if stop_at else "..."))
+    newest = None
+    complete = True
+
+    async def listing():
+        nonlocal newest
+        async for commit in client.iter_commits(repo, since, until, stop_at):
+            if newest is None:
+                newest = commit["sha"]
+            yield commit
+
+    async def fetch(commit):
+        return await client.get_commit(repo, commit["sha"])
+
+    scanned = 0
+    async for commit, details in bounded_map(fetch, listing(), concurrency):
+        scanned += 1
+        output = await find_message_secrets(t_regexp, commit["commit"]["message"])
+        if details is None:
+            complete = False
+            print(f"{fg('yellow')}[-] Failed to fetch the diff of commit {commit['sha']}{attr(0)}")
+        else:
+            output += "".join(await find_diff_secrets(t_regexp, details, files_pattern, verbose))
+        if output:
+            yield output
+    if verbose:
+        print(f"Scanned {scanned} commits of {repo}")
+    if checkpoints is not None and newest and complete and since is None and until is None:
+        checkpoints.set(key, newest)
+
+async def find_history_secrets(t_regexp, repo_path, files_pattern, max_size=DEFAULT_MAX_BLOB_SIZE,
+                               cache=None, verbose=False):
+    """Search secrets in every unique file version of a local clone's history"""
+    output = []
+    scanned = 0
+    for sha, path, data in iter_history_blobs(repo_path, files_pattern, max_size):
+        scanned += 1
+        location = f"{path} (blob {sha[:12]})"
+        result = cache.get(sha, location) if cache else None
+        if result is None:
+            content = data.decode("utf-8", errors="replace")
+            result = await find_secrets(t_regexp, content, location, verbose) if content else ""
+            if cache and detect_secrets.complete_scan(location):
+                cache.put(sha, location, result)
+        if result:
+            output.append(result)
+    if verbose:
+        print(f"Scanned {scanned} unique blobs from {repo_path}")
+    return output
+
+def revision_range(value):
+    """Checking a --range value, which is passed to git diff"""
+    if not value or value.startswith("-"):
+        raise argparse.ArgumentTypeError(f"invalid revision range: {value!r}")
+    return value
+
+def iso_timestamp(value):
+    """Parsing a --since/--until date or time into the UTC ISO 8601 form GitHub expects"""
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid ISO 8601 date or time: {value!r}") from None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+async def load_file_matcher(args):
+    """Loading the file name patterns and the --exclude/--exclude-from patterns"""
+    search_file = "regex_patterns/file_paterns.csv"
+    if os.path.exists(search_file):
+        async with aiofiles.open(search_file, "r", encoding="UTF-8") as files:
+            reg_files = await files.readlines()
+            regexp_file = [reg_file.strip() for reg_file in reg_files if reg_file.strip()]
+    else:
+        print(f"{fg('yellow')}[-] File {search_file} is missing.{attr(0)}")
+        exit(1)
+    excludes = list(args.exclude)
+    for exclude_file in args.exclude_from:
+        if not os.path.exists(exclude_file):
+            print(f"{fg('yellow')}[-] File {exclude_file} is missing.{attr(0)}")
+            exit(1)
+        async with aiofiles.open(exclude_file, "r", encoding="UTF-8") as f:
+            excludes.extend((await f.read()).splitlines())
+    return FileMatcher(regexp_file, excludes)
+
 def parse_arguments():
     """Function for processing command-line arguments"""
     parser = argparse.ArgumentParser()
-    parser.add_argument("-r", "--repo", required=True, help="Repository path")
+    parser.add_argument("-r", "--repo", help="Repository path")
     parser.add_argument("-t", "--token", help="GitHub token for authentication")
+    parser.add_argument("-g", "--git", help="Path to a local clone whose whole history is scanned (optional)")
+    diff = parser.add_mutually_exclusive_group()
+    diff.add_argument("--staged", action="store_true",
+                      help="Only scan the lines added by the changes staged in the -g clone, by default the current directory (optional)")
+    diff.add_argument("--range", type=revision_range,
+                      help="Only scan the lines added between two revisions of the -g clone, e.g. main..HEAD (optional)")
+    parser.add_argument("--max-blob-size", type=int, default=DEFAULT_MAX_BLOB_SIZE,
+                        help="Skip file versions larger than this many bytes in --git mode (optional)")
+    parser.add_argument("--exclude", action="append", default=[],
+                        help="gitignore-style pattern of paths to skip, can be repeated (optional)")
+    parser.add_argument("--exclude-from", action="append", default=[],
+                        help="File of gitignore-style patterns of paths to skip, e.g. .gitignore (optional)")
+    parser.add_argument("--since", type=iso_timestamp,
+                        help="Only scan commits made at or after this ISO 8601 date or time with -r (optional)")
+    parser.add_argument("--until", type=iso_timestamp,
+                        help="Only scan commits made at or before this ISO 8601 date or time with -r (optional)")
+    parser.add_argument("--checkpoint", nargs="?", const=DEFAULT_CHECKPOINT_PATH,
+                        help=f"Only scan commits newer than the last run's with -r, tracked in this file (default {DEFAULT_CHECKPOINT_PATH}) (optional)")
+    parser.add_argument("--commit-concurrency", type=int, default=DEFAULT_COMMIT_CONCURRENCY,
+                        help="Maximum number of commit diffs fetched at once with -r (optional)")
+    parser.add_argument("--api-url", default=GITHUB_API_URL,
+                        help="GitHub API base URL, e.g. for GitHub Enterprise (optional)")
+    parser.add_argument("--max-connections", type=int, default=DEFAULT_MAX_CONNECTIONS,
+                        help="Maximum number of open connections to GitHub (optional)")
+    parser.add_argument("--requests-per-second", type=float, default=DEFAULT_REQUESTS_PER_SECOND,
+                        help="Maximum GitHub request rate; lowered automatically near the rate limit (optional)")
+    parser.add_argument("--cache", nargs="?", const=DEFAULT_CACHE_PATH,
+                        help=f"Reuse results for already scanned blobs from this SQLite cache (default {DEFAULT_CACHE_PATH})")
+    add_validation_arguments(parser)
     parser.add_argument("--verbose", action="store_true", help="Enable verbose output")
-    return parser.parse_args()
+    args = parser.parse_args()
+    if (args.staged or args.range) and not args.git:
+        args.git = "."
+    if (args.staged or args.range) and not args.validate_async:
+        # A pre-commit hook has to answer at once: found secrets are only checked online when asked for
+        args.no_validate = True
+    if not args.repo and not args.git:
+        parser.error("one of -r/--repo or -g/--git is required")
+    return args
 
 async def main():
     """Main function"""
     args = parse_arguments()
     regexp_to_search = "regex_patterns/regex_secrets.csv"
     if os.path.exists(regexp_to_search):
-        async with aiofiles.open(regexp_to_search, "r", encoding="UTF-8") as file_regs:
-            regs_and_type = await file_regs.readlines()
-            regs = [reg.rsplit(', ', 1)[0] for reg in regs_and_type]
-            type_regs = [type_reg.rsplit(', ', 1)[1] for type_reg in regs_and_type]
-            regexp = [re.compile(regexp.strip(), re.IGNORECASE) for regexp in regs]
-            regexp_type = list(zip(regexp, type_regs))
+        try:
+            regexp_type = load_rules(regexp_to_search)
+        except RuleError as e:
+            print(f"{fg('red')}[-] Invalid rule: {e}{attr(0)}")
+            exit(1)
     else:
         print(f"{fg('yellow')}[-] File {regexp_to_search} is missing.{attr(0)}")
         exit(1)
         
-    token = args.token if args.token else None       
+    validator = configure_validation(args)
     output = []
-    commits = await get_commits(args.repo, token, args.verbose)
-
-    if commits:
-        result = await find_commit_secrets(regexp_type, commits)
-        if result:
-            output.append(result)
+    file_matcher = await load_file_matcher(args)
+    if args.repo:
+        token = args.token if args.token else None
+        checkpoints = CommitCheckpoints(args.checkpoint) if args.checkpoint else None
+        async with GitHubClient(token, args.max_connections, args.requests_per_second,
+                                api_url=args.api_url) as client:
+            try:
+                async for result in find_github_commit_secrets(regexp_type, args.repo, client, file_matcher,
+                                                               args.since, args.until, checkpoints,
+                                                               args.commit_concurrency, args.verbose):
+                    output.append(result)
+            except GitHubError as e:
+                print(f"{fg('red')}[-] {e}{attr(0)}")
+            if args.verbose:
+                print(client.report())
+        if checkpoints is not None:
+            checkpoints.save()
+    
+    if args.git and (args.staged or args.range):
+        try:
+            output.extend(await find_local_diff_secrets(regexp_type, args.git, file_matcher, args.range,
+                                                        args.verbose))
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"{fg('red')}[-] Cannot read the diff of {args.git}: {e}{attr(0)}")
+            exit(1)
+    elif args.git:
+        if args.verbose:
+            print(f"Scanning the history of the local clone at {args.git}...")
+        # Every detector the blobs go through, e.g. the private key detector, keys the cache
+        scanner = as_scanner(regexp_type)
+        cache = None
+        if args.cache:
+            cache = ScanCache(args.cache, f"{scanner.fingerprint()}:{detect_secrets.validation_mode}")
+        output.extend(await find_history_secrets(scanner, args.git, file_matcher, args.max_blob_size,
+                                                 cache, args.verbose))
+        if cache:
+            cache.close()
+            if args.verbose:
+                print(cache.report())
+    if validator:
+        output = await validator.resolve(output)
+        if args.verbose:
+            print(validator.report())
     if output:
         print("\n".join(output))
+        # Fails a pre-commit or pre-push hook
+        if args.staged or args.range:
+            exit(1)
     else:
         print(f"{fg('yellow')}[-] No secrets found.{attr(0)}")
     
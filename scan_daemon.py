@@ -0,0 +1,379 @@
+import io
+import os
+import json
+import hmac
+import signal
+import socket
+import asyncio
+import secrets
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from colored import fg, attr
+import detect_secrets
+from engine import (FileMatcher, DirectoryWalker, ScanCache, RuleError, file_blob_sha, JsonLinesWriter, SarifWriter,
+                    LARGE_FILE_SIZE, DEFAULT_CACHE_PATH, DEFAULT_CACHE_MAX_AGE, DEFAULT_CACHE_MAX_ENTRIES)
+from detect_secrets import (load_scanner, report_rules, find_secret_records, scan_local_file, init_scan_worker,
+                            complete_scan, add_detector_arguments, check_detector_arguments, add_validation_arguments,
+                            configure_validation, TextWriter, ReportSink, RULES_FILE, KEYWORDS_FILE,
+                            FILE_PATTERNS_FILE)
+from scan_client import (private_directory, RUNTIME_DIR, DEFAULT_SOCKET_PATH, DEFAULT_TOKEN_PATH, DEFAULT_PORT,
+                         MAX_MESSAGE_SIZE)
+
+DEFAULT_MAX_REQUESTS = 4
+# Changes to these files reload the rules before the next request
+WATCHED_FILES = (RULES_FILE, KEYWORDS_FILE, FILE_PATTERNS_FILE)
+
+
+def init_daemon_worker(scanner, mode):
+    """
+    Setting up a worker process. A forked worker inherits the signal handlers of the
+    daemon's event loop, whose wakeup fd would pass a SIGTERM sent to the worker, e.g.
+    by a broken pool terminating the others, on to the daemon and stop it.
+    """
+    signal.set_wakeup_fd(-1)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    # Ctrl-C and SIGHUP are the daemon's to handle
+    for signal_name in ("SIGINT", "SIGHUP"):
+        if hasattr(signal, signal_name):
+            signal.signal(getattr(signal, signal_name), signal.SIG_IGN)
+    init_scan_worker(scanner, mode)
+
+
+def scan_buffer(content, path):
+    """Scanning a buffer sent by a client inside a worker process"""
+    records = asyncio.run(find_secret_records(detect_secrets.worker_scanner, content, path))
+    # Buffers are never cached; only forgets a rule timeout
+    complete_scan(path)
+    return records
+
+
+class LoadedRules:
+    """
+    One load of the rule files: the scanner, the file name patterns, the worker
+    processes scanning with them and the view of the scan cache keyed by their
+    fingerprint.
+
+    Requests hold the rules they started with until they finish. Replaced rules
+    shut their workers down once the last request holding them is done.
+    """
+
+    def __init__(self, scanner, file_matcher, executor, cache=None):
+        self.scanner = scanner
+        self.file_matcher = file_matcher
+        self.executor = executor
+        self.cache = cache
+        self.requests = 0
+        self.replaced = False
+
+    def hold(self):
+        self.requests += 1
+        return self
+
+    def release(self):
+        self.requests -= 1
+        if self.replaced and not self.requests:
+            self.executor.shutdown(wait=False)
+
+    def replace(self):
+        self.replaced = True
+        if not self.requests:
+            self.executor.shutdown(wait=False)
+
+
+class ScanService:
+    """
+    The state a daemon keeps warm between requests: the compiled rules (see
+    LoadedRules), the scan cache and the validator with its result cache.
+
+    Before each request the modification times of the rule files are checked,
+    and the rules are rebuilt when one changed. Requests already running keep
+    the rules they started with, and rules that fail to load leave the
+    previous ones in place. The cache stays open across reloads; each load of
+    the rules reads and writes it under its own fingerprint.
+
+    Files and buffers are scanned in max_requests worker processes, so the
+    event loop keeps answering while they run. At most max_requests requests
+    are scanned at once; further requests wait for a slot. With a token set,
+    every request must carry it.
+    """
+
+    def __init__(self, args, token=None):
+        self.args = args
+        self.token = token
+        self.rules = None
+        self.cache = None
+        self.mtimes = None
+        self.validator = configure_validation(args)
+        self.semaphore = asyncio.Semaphore(args.max_requests)
+        self.stopping = asyncio.Event()
+
+    @staticmethod
+    def rule_mtimes():
+        return tuple(os.stat(path).st_mtime_ns if os.path.exists(path) else None for path in WATCHED_FILES)
+
+    def reload(self):
+        """Loading the rule files; returns an error message, or None once the new rules are in place"""
+        mtimes = self.rule_mtimes()
+        try:
+            scanner = load_scanner(self.args)
+            with open(FILE_PATTERNS_FILE, "r", encoding="UTF-8") as files:
+                file_matcher = FileMatcher([line.strip() for line in files if line.strip()], self.args.exclude)
+        except RuleError as e:
+            error = f"Invalid rule: {e}"
+        except OSError as e:
+            error = f"File {e.filename} is missing."
+        else:
+            cache = None
+            if self.args.cache:
+                # Stored records hold validation markers or nothing depending on the mode, never results
+                fingerprint = f"{scanner.fingerprint()}:{detect_secrets.validation_mode}:records"
+                if self.cache is None:
+                    self.cache = ScanCache(self.args.cache, fingerprint, self.args.cache_max_age * 86400,
+                                           self.args.cache_max_entries)
+                cache = self.cache.keyed(fingerprint)
+            executor = ProcessPoolExecutor(max_workers=self.args.max_requests, initializer=init_daemon_worker,
+                                           initargs=(scanner, detect_secrets.validation_mode))
+            if self.rules:
+                self.rules.replace()
+            self.rules = LoadedRules(scanner, file_matcher, executor, cache)
+            self.mtimes = mtimes
+            logging.info(f"[+] Rules loaded: {len(scanner.pattern_set or [])} rules")
+            return None
+        # Keeps the previous rules and does not retry until the files change again
+        self.mtimes = mtimes
+        logging.error(f"[-] Rules not reloaded: {error}")
+        print(f"{fg('red')}[-] Rules not reloaded: {error}{attr(0)}")
+        return error
+
+    def refresh(self):
+        if self.rule_mtimes() != self.mtimes:
+            return self.reload()
+        return None
+
+    @staticmethod
+    def local_files(rules, paths):
+        """Returns the given files and those the file patterns accept under given directories, and missing paths"""
+        walker = DirectoryWalker(rules.file_matcher)
+        files = []
+        missing = []
+        for path in paths:
+            if os.path.isdir(path):
+                files.extend(walker.walk(path))
+            elif os.path.isfile(path):
+                files.append(path)
+            else:
+                missing.append(path)
+        return files, missing
+
+    async def scan_file(self, rules, path):
+        cache = rules.cache
+        digest = None
+        if cache:
+            # The database stays on the loop's thread; only the hashing moves off it
+            path = os.path.abspath(path)
+            stat = os.stat(path)
+            digest = cache.stored_digest(path, stat)
+            if digest is None:
+                digest = await asyncio.to_thread(file_blob_sha, path)
+                cache.store_digest(path, stat, digest)
+            cached = cache.get_records(digest, path)
+            if cached is not None:
+                return cached
+        loop = asyncio.get_running_loop()
+        records, _, _, complete = await loop.run_in_executor(rules.executor, scan_local_file, path,
+                                                             self.args.large_file_size)
+        if cache and complete:
+            cache.put_records(digest, records)
+        return records
+
+    async def scan(self, request):
+        """Scanning the paths and buffers of one request; returns the report and whether anything was found"""
+        errors = []
+        error = self.refresh()
+        if error:
+            errors.append(f"Rules not reloaded: {error}")
+        if self.rules is None:
+            return {"found": False, "output": "", "errors": errors}
+        rules = self.rules.hold()
+        try:
+            output = io.StringIO()
+            output_format = request.get("format", "text")
+            if output_format == "jsonl":
+                writer = JsonLinesWriter(output)
+            elif output_format == "sarif":
+                writer = SarifWriter(output, report_rules(rules.scanner))
+            else:
+                writer = TextWriter(output)
+            sink = ReportSink([writer], self.validator)
+            loop = asyncio.get_running_loop()
+            async with self.semaphore:
+                # Walking large directories would hold up the other clients
+                files, missing = await asyncio.to_thread(self.local_files, rules, request.get("paths", []))
+                errors.extend(f"File {path} is missing." for path in missing)
+                for path in files:
+                    await sink.add(await self.scan_file(rules, path))
+                for buffer in request.get("buffers", []):
+                    await sink.add(await loop.run_in_executor(rules.executor, scan_buffer, buffer["content"],
+                                                              buffer.get("path", "<buffer>")))
+                found = await sink.finish()
+            writer.close()
+        finally:
+            rules.release()
+        if self.cache:
+            self.cache.flush()
+        return {"found": found, "output": output.getvalue(), "errors": errors}
+
+    async def handle(self, request):
+        if self.token is not None and not hmac.compare_digest(str(request.get("token", "")), self.token):
+            return {"errors": ["Invalid token"]}
+        command = request.get("command", "scan")
+        if command == "scan":
+            return await self.scan(request)
+        if command == "reload":
+            error = self.reload()
+            return {"message": "Rules reloaded", "errors": [error] if error else []}
+        if command == "stop":
+            self.stopping.set()
+            return {"message": "Scan daemon stopping"}
+        return {"errors": [f"Unknown command {command}"]}
+
+    async def serve_client(self, reader, writer):
+        """Answering each JSON request line of a connection with one JSON response line"""
+        try:
+            while line := await reader.readline():
+                try:
+                    response = await self.handle(json.loads(line))
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    response = {"errors": [f"Invalid request: {e}"]}
+                except (OSError, BrokenProcessPool) as e:
+                    # e.g. an unreadable file, or a worker process killed; the next request gets new workers
+                    logging.error(f"[-] Request failed: {e}")
+                    response = {"errors": [f"Scan failed: {e}"]}
+                    if isinstance(e, BrokenProcessPool):
+                        self.reload()
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+        except (ValueError, ConnectionError) as e:
+            # A line over MAX_MESSAGE_SIZE or a client gone away
+            logging.error(f"[-] Request dropped: {e}")
+        finally:
+            writer.close()
+
+    def close(self):
+        if self.rules:
+            self.rules.executor.shutdown(wait=False, cancel_futures=True)
+            self.rules = None
+        if self.cache:
+            self.cache.close()
+            self.cache = None
+
+
+def write_token(path):
+    """Writing a new random token to a file only its owner can read; returns the token"""
+    if os.path.exists(path):
+        os.unlink(path)
+    token = secrets.token_hex(32)
+    # O_EXCL: never follows a link or reuses a file someone else created in the meantime
+    descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(descriptor, "w", encoding="UTF-8") as f:
+        f.write(token)
+    return token
+
+
+async def start_server(service, args):
+    """Listening on localhost:port, or on the Unix socket, replacing a stale socket file"""
+    if args.port:
+        return await asyncio.start_server(service.serve_client, "127.0.0.1", args.port, limit=MAX_MESSAGE_SIZE)
+    if os.path.exists(args.socket):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(args.socket)
+        except OSError:
+            os.unlink(args.socket)
+        else:
+            probe.close()
+            print(f"{fg('yellow')}[-] A scan daemon is already listening on {args.socket}.{attr(0)}")
+            exit(1)
+    # The socket file is created accessible to its owner only, with no window before a chmod
+    umask = os.umask(0o077)
+    try:
+        return await asyncio.start_unix_server(service.serve_client, args.socket, limit=MAX_MESSAGE_SIZE)
+    finally:
+        os.umask(umask)
+
+
+def parse_arguments():
+    """Function for processing command-line arguments"""
+    parser = argparse.ArgumentParser(description="Secret scan daemon")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH,
+                        help=f"Unix socket to listen on (default {DEFAULT_SOCKET_PATH}) (optional)")
+    parser.add_argument("--port", type=int, nargs="?", const=DEFAULT_PORT,
+                        help=f"Listen on this localhost port instead of the Unix socket (default {DEFAULT_PORT}) (optional)")
+    parser.add_argument("--token-file", default=DEFAULT_TOKEN_PATH,
+                        help=f"With --port, file the token clients must send is written to (default {DEFAULT_TOKEN_PATH}) (optional)")
+    parser.add_argument("--max-requests", type=int, default=DEFAULT_MAX_REQUESTS,
+                        help="Maximum number of requests scanned at once, each in a worker process; others wait (optional)")
+    parser.add_argument("--exclude", action="append", default=[],
+                        help="gitignore-style pattern of paths to skip in scanned directories, can be repeated (optional)")
+    parser.add_argument("--large-file-size", type=int, default=LARGE_FILE_SIZE,
+                        help="Files larger than this many bytes are scanned in memory-mapped chunks (optional)")
+    parser.add_argument("--cache", nargs="?", const=DEFAULT_CACHE_PATH,
+                        help=f"Reuse results for unchanged files from this SQLite cache (default {DEFAULT_CACHE_PATH})")
+    parser.add_argument("--cache-max-age", type=int, default=DEFAULT_CACHE_MAX_AGE // 86400,
+                        help="Drop cache entries unused for this many days (optional)")
+    parser.add_argument("--cache-max-entries", type=int, default=DEFAULT_CACHE_MAX_ENTRIES,
+                        help="Maximum number of cached file results (optional)")
+    add_detector_arguments(parser)
+    add_validation_arguments(parser)
+    parser.add_argument("--verbose", action="store_true", help="Enable verbose output")
+    args = parser.parse_args()
+    check_detector_arguments(parser, args)
+    if not args.port and not hasattr(socket, "AF_UNIX"):
+        parser.error("Unix sockets are not available here, use --port")
+    return args
+
+
+async def main():
+    """Main function"""
+    args = parse_arguments()
+    try:
+        # The default socket and token live in the runtime directory, which must be this user's alone
+        directory = os.path.dirname(os.path.abspath(args.token_file if args.port else args.socket))
+        if directory == os.path.abspath(RUNTIME_DIR):
+            private_directory(directory)
+        # Anyone on the machine can connect to a port, so TCP requests must carry the token
+        token = write_token(args.token_file) if args.port else None
+    except OSError as e:
+        print(f"{fg('yellow')}[-] Cannot use {e.filename}: {e.strerror}.{attr(0)}")
+        exit(1)
+    service = ScanService(args, token)
+    error = service.reload()
+    if error:
+        exit(1)
+    server = await start_server(service, args)
+    loop = asyncio.get_running_loop()
+    for signal_name in ("SIGINT", "SIGTERM"):
+        if hasattr(signal, signal_name):
+            try:
+                loop.add_signal_handler(getattr(signal, signal_name), service.stopping.set)
+            except NotImplementedError:
+                pass
+    if hasattr(signal, "SIGHUP"):
+        loop.add_signal_handler(signal.SIGHUP, service.reload)
+    address = f"127.0.0.1:{args.port}" if args.port else args.socket
+    print(f"Scan daemon listening on {address}")
+    async with server:
+        await service.stopping.wait()
+    service.close()
+    if not args.port and os.path.exists(args.socket):
+        os.unlink(args.socket)
+    if args.port and os.path.exists(args.token_file):
+        os.unlink(args.token_file)
+    if args.verbose and service.validator:
+        print(service.validator.report())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,12 @@
+import os
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def in_root(monkeypatch):
+    """Runs the test from the repository root, where the scripts read regex_patterns/ from."""
+    monkeypatch.chdir(ROOT)
@@ -0,0 +1,41 @@
+import asyncio
+import detect_secrets
+from engine import pair_by_proximity, SecretRecord
+from detect_secrets import AWS_ACCESS_KEY_RULE, AWS_SECRET_KEY_RULE
+
+
+def test_interleaved_keys_and_secrets_pair_in_order():
+    keys = [(1, "key1"), (10, "key2")]
+    secrets = [(2, "secret1"), (11, "secret2")]
+    assert pair_by_proximity(keys, secrets) == [("key1", "secret1"), ("key2", "secret2")]
+
+
+def test_a_secret_after_its_key_wins_a_tie():
+    assert pair_by_proximity([(5, "key")], [(4, "before"), (6, "after")]) == [("key", "after")]
+
+
+def test_keys_beyond_the_window_take_the_nearest_secret():
+    keys = [(1, "key1"), (100, "key2")]
+    secrets = [(2, "secret1")]
+    assert pair_by_proximity(keys, secrets, window=20) == [("key1", "secret1"), ("key2", "secret1")]
+
+
+def test_each_pair_of_a_file_is_validated_once(monkeypatch):
+    checked = []
+
+    def run_validator(provider, args):
+        checked.append((provider, args))
+        return f"VALID {args[0]}"
+
+    monkeypatch.setattr(detect_secrets, "validation_mode", "inline")
+    monkeypatch.setattr(detect_secrets, "run_validator", run_validator)
+    records = [SecretRecord("a.env", 1, None, AWS_ACCESS_KEY_RULE, "regex", "AKIA1", ""),
+               SecretRecord("a.env", 2, None, AWS_SECRET_KEY_RULE, "regex", "secret1", ""),
+               SecretRecord("a.env", 30, None, AWS_ACCESS_KEY_RULE, "regex", "AKIA2", ""),
+               SecretRecord("a.env", 31, None, AWS_SECRET_KEY_RULE, "regex", "secret2", ""),
+               SecretRecord("a.env", 40, None, AWS_ACCESS_KEY_RULE, "regex", "AKIA1", ""),
+               SecretRecord("a.env", 41, None, AWS_SECRET_KEY_RULE, "regex", "secret1", "")]
+    asyncio.run(detect_secrets.validate_aws_pairs(records))
+    assert checked == [("aws", ("AKIA1", "secret1")), ("aws", ("AKIA2", "secret2"))]
+    assert [record.validation for record in records] == ["VALID AKIA1", "VALID AKIA1", "VALID AKIA2",
+                                                        "VALID AKIA2", "VALID AKIA1", "VALID AKIA1"]
@@ -0,0 +1,46 @@
+import asyncio
+from datetime import datetime, timezone
+import pytest
+import detect_secrets
+import scan_commits
+from engine import CommitCheckpoints, PatternSet
+
+SINCE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class FakeClient:
+    api_url = "https://api.github.com"
+
+    def __init__(self, shas):
+        self.shas = shas
+
+    async def iter_commits(self, repo, since=None, until=None, stop_at=None):
+        for sha in self.shas:
+            if sha == stop_at:
+                return
+            yield {"sha": sha, "commit": {"message": "change"}}
+
+    async def get_commit(self, repo, sha):
+        return {"sha": sha, "files": []}
+
+
+def scan(client, checkpoints, **limits):
+    async def run():
+        return [output async for output in scan_commits.find_github_commit_secrets(
+            PatternSet([]), "owner/repo", client, None, checkpoints=checkpoints, **limits)]
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("limits", [{"since": SINCE}, {"until": SINCE}])
+def test_limited_runs_leave_the_checkpoint_alone(tmp_path, monkeypatch, limits):
+    monkeypatch.setattr(detect_secrets, "validation_mode", "none")
+    checkpoints = CommitCheckpoints(str(tmp_path / "checkpoints.json"))
+    scan(FakeClient(["c2", "c1"]), checkpoints, **limits)
+    assert checkpoints.get(f"{FakeClient.api_url}/owner/repo") is None
+
+
+def test_a_full_run_sets_the_checkpoint_to_the_newest_commit(tmp_path, monkeypatch):
+    monkeypatch.setattr(detect_secrets, "validation_mode", "none")
+    checkpoints = CommitCheckpoints(str(tmp_path / "checkpoints.json"))
+    scan(FakeClient(["c2", "c1"]), checkpoints)
+    assert checkpoints.get(f"{FakeClient.api_url}/owner/repo") == "c2"
@@ -0,0 +1,9 @@
+import asyncio
+import detect_secrets_entropy
+
+
+def test_files_that_are_not_utf8_are_read_with_replacements(tmp_path):
+    path = tmp_path / "latin1.txt"
+    path.write_bytes("caf\xe9 = 1\n".encode("latin-1") + b"\x00\xff\xfe")
+    content = asyncio.run(detect_secrets_entropy.get_local_file_content(str(path)))
+    assert content.startswith("caf� = 1\n")
@@ -0,0 +1,59 @@
+import re
+import pytest
+import detect_secrets
+from engine import FileMatcher, ExcludeRules
+
+NAMES = ["app.py", "settings.yml", "settings.yaml", "config.json", ".env", "prod.env", "deploy.pkr.hcl",
+         "notes.txt", "script.PY", "py", "archive.tar.gz", "id_rsa", "Dockerfile", "app.py\n", "app.pyc",
+         "docker-compose.yml.bak", ".npmrc", "credentials", "web.config"]
+
+
+@pytest.fixture
+def file_patterns(in_root):
+    with open(detect_secrets.FILE_PATTERNS_FILE, "r", encoding="UTF-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def test_names_are_accepted_like_searching_every_pattern(file_patterns):
+    matcher = FileMatcher(file_patterns)
+    assert matcher.extensions
+    for name in NAMES:
+        assert matcher.matches_name(name) == any(re.search(pattern, name) for pattern in file_patterns), name
+
+
+def test_multi_part_suffixes_and_optional_letters_expand():
+    matcher = FileMatcher([r".*\.ya?ml$", r".*\.pkr\.hcl$", r"^Dockerfile"])
+    assert matcher.extensions == {".yml", ".yaml"}
+    assert matcher.suffixes == (".pkr.hcl",)
+    assert [regex.pattern for regex in matcher.regexes] == ["^Dockerfile"]
+    assert matcher.accepts("infra/build.pkr.hcl") and matcher.accepts("Dockerfile.dev")
+    assert not matcher.accepts("hcl") and not matcher.accepts("x.yml.bak")
+
+
+@pytest.mark.parametrize("patterns, path, excluded", [
+    (["*.min.js"], "static/vendor/app.min.js", True),
+    (["node_modules/"], "web/node_modules/pkg/index.js", True),
+    (["node_modules/"], "node_modules", False),
+    (["/build"], "build/out.py", True),
+    (["/build"], "src/build/out.py", False),
+    (["docs/*.md"], "docs/guide/intro.md", False),
+    (["docs/**/*.md"], "docs/guide/intro.md", True),
+    (["**/fixtures/**"], "a/b/fixtures/c/d.json", True),
+    (["*.py", "!keep.py"], "src/keep.py", False),
+    (["!keep.py", "*.py"], "src/keep.py", True),
+    (["tests/", "!tests/keep.py"], "tests/keep.py", True),
+    (["# comment", "", "secret?.txt"], "secret1.txt", True),
+    (["secret[0-9].txt"], "secretA.txt", False),
+    (["\\!important.txt"], "!important.txt", True),
+])
+def test_exclude_rules_follow_gitignore(patterns, path, excluded):
+    assert ExcludeRules(patterns).excluded(path) == excluded
+
+
+def test_excluded_and_oversized_files_are_rejected():
+    matcher = FileMatcher([r".*\.py$"], excludes=["vendor/"], max_file_size=100)
+    assert matcher.accepts("src/app.py", 100)
+    assert not matcher.accepts("src/app.py", 101)
+    assert not matcher.accepts("vendor/lib/app.py", 10)
+    assert not matcher.accepts("src/app.txt", 10)
+    assert not ExcludeRules(["# only a comment"])
@@ -0,0 +1,31 @@
+import subprocess
+from engine import iter_history_blobs
+
+
+def git(repo, *args):
+    subprocess.run(["git", "-C", str(repo), "-c", "user.name=t", "-c", "user.email=t@t", *args], check=True,
+                   capture_output=True)
+
+
+def test_blobs_also_seen_under_a_rejected_name_are_scanned(tmp_path):
+    git(tmp_path, "init", "-q")
+    (tmp_path / "config.py").write_text("password = 'hunter2hunter2'\n")
+    git(tmp_path, "add", ".")
+    git(tmp_path, "commit", "-q", "-m", "config")
+    # The newest tree, walked first, only has the content as x.txt
+    git(tmp_path, "mv", "config.py", "x.txt")
+    (tmp_path / "other.py").write_text("x = 1\n")
+    git(tmp_path, "add", ".")
+    git(tmp_path, "commit", "-q", "-m", "notes")
+    blobs = sorted((path, data) for _, path, data in iter_history_blobs(str(tmp_path), [r".*\.py$"]))
+    assert blobs == [("config.py", b"password = 'hunter2hunter2'\n"), ("other.py", b"x = 1\n")]
+
+
+def test_each_blob_is_read_once_and_large_ones_are_skipped(tmp_path):
+    git(tmp_path, "init", "-q")
+    (tmp_path / "a.py").write_text("same\n")
+    (tmp_path / "b.py").write_text("same\n")
+    (tmp_path / "big.py").write_text("x" * 100)
+    git(tmp_path, "add", ".")
+    git(tmp_path, "commit", "-q", "-m", "files")
+    assert [data for _, _, data in iter_history_blobs(str(tmp_path), [r".*\.py$"], max_size=50)] == [b"same\n"]
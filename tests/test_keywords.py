@@ -0,0 +1,49 @@
+import asyncio
+import argparse
+import pytest
+import detect_secrets
+from engine import KeywordMatcher, parse_keywords
+
+VALUE = "a8Fz3kQ9xLm2"
+
+
+@pytest.fixture
+def matcher(in_root):
+    with open(detect_secrets.KEYWORDS_FILE, "r", encoding="UTF-8") as f:
+        return KeywordMatcher(parse_keywords(f.read()))
+
+
+@pytest.mark.parametrize("line", [
+    f'apiKey: "{VALUE}"',
+    f'"apikey": "{VALUE}"',
+    f"API-KEY = {VALUE}",
+    f'const userPassword = "{VALUE}"',
+    f"DB_PASSWORD={VALUE}",
+    f"pwd={VALUE}",
+    f"passwd: {VALUE}",
+    f"--password {VALUE}",
+])
+def test_keyword_spellings_are_found(matcher, line):
+    assert [value for _, _, value in matcher.find(line)] == [VALUE]
+
+
+@pytest.mark.parametrize("line", [
+    f'passwordHash = "{VALUE}"',
+    f'password_hash = "{VALUE}"',
+    f'bypass = "{VALUE}"',
+    'password = "changeme"',
+    "api_key = ${API_KEY}",
+])
+def test_other_names_and_placeholders_are_skipped(matcher, line):
+    assert list(matcher.find(line)) == []
+
+
+def test_regex_and_keywords_report_camel_case_keys(in_root, monkeypatch):
+    monkeypatch.setattr(detect_secrets, "validation_mode", "none")
+    args = argparse.Namespace(detectors=["regex", "keywords"], entropy_window=0, max_line_length=4096,
+                              rule_timeout=None)
+    scanner = detect_secrets.load_scanner(args)
+    content = f'config = {{\n  apiKey: "{VALUE}",\n  dbPwd: "{VALUE}"\n}}\n'
+    records = asyncio.run(detect_secrets.find_secret_records(scanner, content, "config.js"))
+    assert [(record.line, record.detector, record.match) for record in records] == [
+        (2, "keywords", VALUE), (3, "keywords", VALUE)]
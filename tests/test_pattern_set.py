@@ -0,0 +1,50 @@
+import re
+import time
+import asyncio
+import detect_secrets
+from engine import PatternSet, load_rules, DEFAULT_RULE_TIMEOUT
+
+GREEDY = re.compile(r"api_?key.*['\"]([0-9a-zA-Z]{8,})['\"]", re.IGNORECASE)
+
+
+def test_windowed_matches_are_disjoint_and_within_a_window():
+    pattern_set = PatternSet([(GREEDY, "api key")], max_line_length=200)
+    line = "".join(f"var apiKey{i}='abcdef{i:04d}xyz';" for i in range(80))
+    matches = list(pattern_set.iter_windowed(GREEDY, line, 0, len(line)))
+    spans = [found.span() for found in matches]
+    assert spans == sorted(spans)
+    assert all(end <= next_start for (_, end), (next_start, _) in zip(spans, spans[1:]))
+    assert all(end - start <= 200 for start, end in spans)
+    # findall() on the whole line returns one greedy match; the windows split it
+    assert len(GREEDY.findall(line)) == 1 and len(matches) > 1
+
+
+def test_short_lines_match_like_findall():
+    pattern_set = PatternSet([(GREEDY, "api key")], max_line_length=200)
+    content = "apiKey = 'abcdefgh1234'\nnothing here\n"
+    assert [(line_number, hits[0][2]) for line_number, _, hits in pattern_set.scan(content)] == [
+        (1, GREEDY.findall("apiKey = 'abcdefgh1234'"))]
+
+
+def test_a_pathological_line_is_scanned_within_the_default_budget(in_root):
+    pattern_set = load_rules(detect_secrets.RULES_FILE)
+    assert pattern_set.rule_timeout == DEFAULT_RULE_TIMEOUT
+    # Letters only: rules such as URI-secret backtrack over every window of the line
+    content = "abcdefghij" * 8000 + "\nhttp://example.com\n"
+    start = time.perf_counter()
+    list(pattern_set.scan(content))
+    assert time.perf_counter() - start < 3 * DEFAULT_RULE_TIMEOUT
+
+
+def test_files_with_timed_out_rules_are_not_cacheable(monkeypatch):
+    monkeypatch.setattr(detect_secrets, "validation_mode", "none")
+    content = "apiKey = 'abcdefgh1234'\n"
+    # A budget already spent before the first search
+    timed_out = PatternSet([(GREEDY, "api key")], rule_timeout=-1)
+    assert asyncio.run(detect_secrets.find_secret_records(timed_out, content, "a.js")) == []
+    assert timed_out.timed_out == ["api key"]
+    assert not detect_secrets.complete_scan("a.js")
+
+    complete = PatternSet([(GREEDY, "api key")])
+    assert len(asyncio.run(detect_secrets.find_secret_records(complete, content, "a.js"))) == 1
+    assert detect_secrets.complete_scan("a.js")
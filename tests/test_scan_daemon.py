@@ -0,0 +1,105 @@
+import json
+import asyncio
+import argparse
+import pytest
+import detect_secrets
+from engine import ScanCache
+from scan_client import private_directory, read_token
+from scan_daemon import LoadedRules, ScanService, write_token
+
+
+class RecordingExecutor:
+    def __init__(self):
+        self.shut_down = False
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+def arguments(**options):
+    defaults = {"no_validate": True, "validate_async": False, "cache": None, "validation_concurrency": 2,
+                "validation_ttl": 60, "max_requests": 1}
+    return argparse.Namespace(**{**defaults, **options})
+
+
+def test_replaced_rules_keep_their_workers_until_the_last_request_ends():
+    executor = RecordingExecutor()
+    rules = LoadedRules(None, None, executor)
+    rules.hold()
+    rules.replace()
+    assert not executor.shut_down
+    rules.release()
+    assert executor.shut_down
+
+
+def test_cache_views_of_reloaded_rules_share_one_connection(tmp_path):
+    cache = ScanCache(str(tmp_path / "cache.sqlite"), "old")
+    reloaded = cache.keyed("new")
+    cache.put_records("digest", [])
+    assert reloaded.connection is cache.connection
+    assert reloaded.get_records("digest", "a.py") is None
+    assert cache.get_records("digest", "a.py") == []
+    cache.close()
+
+
+def test_requests_without_the_token_are_refused(tmp_path, monkeypatch):
+    monkeypatch.setattr(detect_secrets, "validation_mode", "inline")
+    token_path = tmp_path / "daemon.token"
+    token = write_token(str(token_path))
+    assert token_path.stat().st_mode & 0o777 == 0o600
+    service = ScanService(arguments(), token)
+    assert asyncio.run(service.handle({"command": "stop"})) == {"errors": ["Invalid token"]}
+    assert not service.stopping.is_set()
+    asyncio.run(service.handle({"command": "stop", "token": token}))
+    assert service.stopping.is_set()
+
+
+def test_the_client_refuses_files_other_users_can_access(tmp_path):
+    token_path = tmp_path / "daemon.token"
+    write_token(str(token_path))
+    assert read_token(str(token_path))
+    token_path.chmod(0o644)
+    with pytest.raises(PermissionError):
+        read_token(str(token_path))
+
+
+def test_the_runtime_directory_is_created_private(tmp_path):
+    directory = tmp_path / "runtime"
+    private_directory(str(directory))
+    assert directory.stat().st_mode & 0o777 == 0o700
+    directory.chmod(0o755)
+    with pytest.raises(PermissionError):
+        private_directory(str(directory))
+
+
+class Connection:
+    """Both ends of a client connection for serve_client, with the request lines already received."""
+
+    def __init__(self, lines):
+        self.lines = list(lines)
+        self.written = b""
+
+    async def readline(self):
+        return self.lines.pop(0) if self.lines else b""
+
+    def write(self, data):
+        self.written += data
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_failed_scans_are_answered_with_an_error(monkeypatch):
+    monkeypatch.setattr(detect_secrets, "validation_mode", "inline")
+    service = ScanService(arguments())
+
+    async def handle(request):
+        raise PermissionError(13, "Permission denied", "/secret/file")
+
+    monkeypatch.setattr(service, "handle", handle)
+    connection = Connection([b'{"command": "scan"}\n'])
+    asyncio.run(service.serve_client(connection, connection))
+    assert json.loads(connection.written) == {"errors": ["Scan failed: [Errno 13] Permission denied: '/secret/file'"]}
@@ -0,0 +1,52 @@
+import os
+import pytest
+from engine import DirectoryWalker, FileMatcher, DEFAULT_PRUNE_DIRS
+
+PATTERNS = [r".*\.py$"]
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for path in ["src/app.py", "src/lib/util.py", "src/lib/notes.txt", "node_modules/pkg/index.py",
+                 ".git/hooks/hook.py", "vendor/dep.py", "generated/out.py", "main.py"]:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text("x = 1\n")
+    (tmp_path / "src/blob.py").write_bytes(b"x\0y")
+    return tmp_path
+
+
+def relative(paths, root):
+    return sorted(os.path.relpath(path, root).replace(os.sep, "/") for path in paths)
+
+
+def test_pruned_and_excluded_directories_are_never_entered(tree):
+    walker = DirectoryWalker(FileMatcher(PATTERNS, excludes=["generated/"]))
+    assert relative(walker.walk(str(tree)), tree) == ["main.py", "src/app.py", "src/lib/util.py"]
+    # The root, src and src/lib only
+    assert walker.directories == 3
+    assert walker.skipped_binary == 1
+
+
+def test_one_worker_walks_in_os_walk_order(tree):
+    expected = []
+    for directory, subdirectories, files in os.walk(tree):
+        subdirectories[:] = [name for name in subdirectories if name not in DEFAULT_PRUNE_DIRS]
+        expected.extend(os.path.join(directory, name) for name in files
+                        if name.endswith(".py") and name != "blob.py")
+    # os.walk and scandir list a directory in the same order
+    assert list(DirectoryWalker(PATTERNS).walk(str(tree))) == expected
+
+
+def test_parallel_workers_find_the_same_files(tree):
+    assert sorted(DirectoryWalker(PATTERNS, workers=4).walk(str(tree))) == sorted(
+        DirectoryWalker(PATTERNS).walk(str(tree)))
+
+
+def test_symlinked_directories_are_followed_once_when_asked(tree):
+    os.symlink(tree / "src", tree / "src/lib/loop")
+    os.symlink(tree / "src/lib", tree / "linked")
+    expected = ["generated/out.py", "main.py", "src/app.py", "src/lib/util.py"]
+    assert relative(DirectoryWalker(PATTERNS).walk(str(tree)), tree) == expected
+    # src/lib is reached through "linked" or "src", whichever is listed first, and the loop back to src ends
+    followed = [os.path.basename(path) for path in DirectoryWalker(PATTERNS, follow_symlinks=True).walk(str(tree))]
+    assert sorted(followed) == ["app.py", "main.py", "out.py", "util.py"]
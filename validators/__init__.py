@@ -1,3 +1,6 @@
 from .validataor import SecretValidator
+from .async_validator import (AsyncValidator, validation_marker, run_validator, VALIDATORS,
+                              PROVIDER_RATE_LIMITS, DEFAULT_VALIDATION_CONCURRENCY, DEFAULT_VALIDATION_TTL)
 
-__all__ = ['SecretValidator', ]
\ No newline at end of file
+__all__ = ['SecretValidator', 'AsyncValidator', 'validation_marker', 'run_validator', 'VALIDATORS',
+           'PROVIDER_RATE_LIMITS', 'DEFAULT_VALIDATION_CONCURRENCY', 'DEFAULT_VALIDATION_TTL', ]
\ No newline at end of file
@@ -0,0 +1,114 @@
+import asyncio
+import base64
+import hashlib
+import json
+import re
+import time
+from engine.github import TokenBucket
+from .validataor import SecretValidator as sv
+
+DEFAULT_VALIDATION_CONCURRENCY = 8
+DEFAULT_VALIDATION_TTL = 60 * 60
+# Requests per second allowed against each provider
+PROVIDER_RATE_LIMITS = {
+    "aws": 10,
+    "github": 10,
+    "google": 10,
+    "slack": 2,
+    "uri": 10,
+}
+# SecretValidator method checking each provider's secrets
+VALIDATORS = {
+    "aws": "validate_aws_keys",
+    "github": "validate_github_token",
+    "google": "validate_google_api_key",
+    "slack": "validate_slack_token",
+    "uri": "validate_uri_with_credentials",
+}
+MARKER_REGEX = re.compile(r"\x00validate:([A-Za-z0-9_=-]+)\x00")
+
+
+def validation_marker(provider, args):
+    """
+    Returns a placeholder for a deferred validation; it carries the request itself,
+    so outputs holding it can be resolved in a later run.
+    """
+    request = json.dumps([provider, list(args)]).encode("utf-8")
+    return f"\x00validate:{base64.urlsafe_b64encode(request).decode('ascii')}\x00"
+
+
+def run_validator(provider, args):
+    """
+    Runs the blocking SecretValidator check for the provider.
+    """
+    return getattr(sv, VALIDATORS[provider])(*args)
+
+
+def secret_hash(provider, args):
+    return hashlib.sha256(json.dumps([provider, list(args)]).encode("utf-8")).hexdigest()
+
+
+class AsyncValidator:
+    """
+    Validates the secrets found by a scan after detection has finished.
+
+    Each unique secret is validated once: requests run concurrently in worker
+    threads (the validators are blocking) under a global concurrency limit and
+    a per-provider rate limit, and results are kept in a TTL cache keyed by
+    the secret hash.
+    """
+
+    def __init__(self, concurrency=DEFAULT_VALIDATION_CONCURRENCY, ttl=DEFAULT_VALIDATION_TTL,
+                 rate_limits=PROVIDER_RATE_LIMITS):
+        self.concurrency = concurrency
+        self.ttl = ttl
+        self.rate_limits = rate_limits
+        self.results = {}
+        self.buckets = {}
+        self.semaphore = None
+        self.validated = 0
+        self.cache_hits = 0
+
+    def _bucket(self, provider):
+        if provider not in self.buckets:
+            self.buckets[provider] = TokenBucket(self.rate_limits.get(provider, 1))
+        return self.buckets[provider]
+
+    async def validate(self, provider, args):
+        """
+        Returns the validation result of one secret, from the TTL cache when possible.
+        """
+        key = secret_hash(provider, args)
+        cached = self.results.get(key)
+        if cached and cached[0] > time.monotonic():
+            self.cache_hits += 1
+            return cached[1]
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+        await self._bucket(provider).acquire()
+        async with self.semaphore:
+            try:
+                result = await asyncio.to_thread(run_validator, provider, args)
+            except Exception as e:
+                result = f"Error: {e}"
+        self.validated += 1
+        self.results[key] = (time.monotonic() + self.ttl, result)
+        return result
+
+    async def resolve(self, outputs):
+        """
+        Validates every unique secret referenced in the outputs in parallel and
+        returns the outputs with the placeholders replaced by the results.
+        """
+        requests = {}
+        for output in outputs:
+            for marker in MARKER_REGEX.finditer(output):
+                requests.setdefault(marker.group(0), marker.group(1))
+        markers = list(requests)
+        decoded = [json.loads(base64.urlsafe_b64decode(requests[marker])) for marker in markers]
+        results = await asyncio.gather(*(self.validate(provider, args) for provider, args in decoded))
+        replacements = dict(zip(markers, results))
+        return [MARKER_REGEX.sub(lambda marker: replacements[marker.group(0)], output) for output in outputs]
+
+    def report(self):
+        return f"Validated {self.validated} unique secrets ({self.cache_hits} cache hits)"